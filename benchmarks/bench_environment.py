@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	bench_environment.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Benchmarks of the evaluation of environments
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+from .common import configure, make_environments, ENVIRONMENTS, LIFETIMES
+from environment import evaluate_all
+
+
+class TimeEnvironment:
+	"""Environment and cue of single time steps and of the blocks of one generation"""
+	params = [ENVIRONMENTS,LIFETIMES]
+	param_names = ["nE","L"]
+
+	def setup(self,nE,L):
+		configure(1000,nE,L)
+		self.environments = make_environments(nE)
+		self.t = np.arange(L)
+
+	def time_evaluate(self,nE,L):
+		for env in self.environments:
+			for t in range(L):
+				env.evaluate(t)
+
+	def time_evaluate_all(self,nE,L):
+		evaluate_all(self.environments,self.t)
+
+	def time_draw(self,nE,L):
+		# time steps outside of the precomputed traces are drawn
+		evaluate_all(self.environments,self.t+10**6)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	bench_generation.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Benchmarks of whole generations, as in the main
+#	loop of iterate_population
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+from .common import configure, make_population, make_environments,\
+			SIZES, ENVIRONMENTS, LIFETIMES, BACKENDS
+from environment import evaluate_all
+
+
+class TimeGeneration:
+	"""One generation: L reactions, breeding and the final reaction of the offspring"""
+	params = [BACKENDS,SIZES[:3],ENVIRONMENTS[:3],LIFETIMES]
+	param_names = ["backend","size","nE","L"]
+	timeout = 300
+
+	def setup(self,backend,size,nE,L):
+		configure(size,nE,L)
+		self.population = make_population(size,backend)
+		self.environments = make_environments(nE)
+		self.t = 0
+
+	def time_generation(self,backend,size,nE,L):
+		E_block, C_block = evaluate_all(self.environments,self.t+np.arange(L))
+		self.population.react_lifetime(E_block,C_block)
+		self.population.breed_constant()
+		self.population.react(E_block[-1],C_block[-1],1)
+		self.t = (self.t + L) % (100*L)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	bench_output.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Benchmarks of the output of gene statistics
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import tempfile
+import shutil
+
+from .common import configure, make_population, make_environments, SIZES, ENVIRONMENTS
+from population import GENE_NAMES
+from output_population import output_population
+from output_store import open_output
+
+
+class TimeOutput:
+	"""Output of the gene statistics of one generation"""
+	params = [["csv","npy"],SIZES,ENVIRONMENTS]
+	param_names = ["output_format","size","nE"]
+	timeout = 300
+
+	def setup(self,output_format,size,nE):
+		configure(size,nE,plot_every=0)
+		self.population = make_population(size,"array")
+		self.environments = make_environments(nE)
+		self.path = tempfile.mkdtemp()+"/"
+		self.output = open_output(self.path,0,self.environments,GENE_NAMES,output_format,10**4)
+		self.generation = 0
+
+	def teardown(self,output_format,size,nE):
+		self.output.close()
+		shutil.rmtree(self.path)
+
+	def time_output_population(self,output_format,size,nE):
+		output_population(self.population,self.output,self.generation,0,self.path,False,0,self.environments)
+		self.generation += 1
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	bench_population.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Benchmarks of the hot paths of a generation:
+#	construction of animals, reaction, breeding and
+#	counting animals per environment
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+from .common import configure, make_population, skip_if, model_constants, Animal,\
+			SIZES, ENVIRONMENTS, BACKENDS
+
+
+class TimeAnimal:
+	"""Construction of animals with random genes"""
+	params = [SIZES]
+	param_names = ["size"]
+	timeout = 300
+
+	def setup(self,size):
+		configure(size)
+
+	def time_animal(self,size):
+		[Animal() for _ in range(size)]
+
+
+class TimeReact:
+	"""One reaction of all animals to an environment and cue"""
+	params = [BACKENDS,SIZES,ENVIRONMENTS]
+	param_names = ["backend","size","nE"]
+	timeout = 300
+
+	def setup(self,backend,size,nE):
+		skip_if((backend == "object") & (size > 10**5))
+		configure(size,nE)
+		self.population = make_population(size,backend)
+		self.E, self.C = np.linspace(-1,1,nE), np.linspace(1,-1,nE)
+
+	def time_react(self,backend,size,nE):
+		self.population.react(self.E,self.C)
+
+	def time_react_evolve_all(self,backend,size,nE):
+		self.population.react(self.E,self.C,1)
+
+
+class TimeReactLifetime:
+	"""Reaction of all animals to the time steps of one life time, for random genes and for
+	populations of fixed (non-plastic) animals only"""
+	params = [BACKENDS,SIZES,["random","fixed"]]
+	param_names = ["backend","size","genes"]
+	timeout = 300
+
+	def setup(self,backend,size,genes):
+		skip_if((backend == "object") & (size > 10**5))
+		configure(size,3)
+		self.population = make_population(size,backend,genes == "fixed")
+		steps = np.linspace(0,1,model_constants["L"])[:,np.newaxis]
+		self.E_block, self.C_block = steps*np.linspace(-1,1,3), steps*np.linspace(1,-1,3)
+
+	def time_react_lifetime(self,backend,size,genes):
+		self.population.react_lifetime(self.E_block,self.C_block)
+
+
+class TimeBreed:
+	"""Breeding a new generation after one life time"""
+	params = [BACKENDS,SIZES,ENVIRONMENTS]
+	param_names = ["backend","size","nE"]
+	number = 1 # every sample breeds a fresh population
+	repeat = 5
+	timeout = 300
+
+	def setup(self,backend,size,nE):
+		skip_if((backend == "object") & (size > 10**5))
+		configure(size,nE)
+		self.population = make_population(size,backend)
+		E, C = np.linspace(-1,1,nE), np.linspace(1,-1,nE)
+		for _ in range(model_constants["L"]):
+			self.population.react(E,C)
+
+	def time_breed_constant(self,backend,size,nE):
+		self.population.breed_constant()
+
+	def time_breed_variable(self,backend,size,nE):
+		self.population.breed_variable()
+
+
+class TimeResampling:
+	"""Breeding a new generation of constant size with each resampling scheme"""
+	params = [BACKENDS,SIZES,["poisson","multinomial","systematic","residual"]]
+	param_names = ["backend","size","resampling"]
+	number = 1 # every sample breeds a fresh population
+	repeat = 5
+	timeout = 300
+
+	def setup(self,backend,size,resampling):
+		skip_if((backend == "object") & (size > 10**5))
+		configure(size,3,resampling=resampling)
+		self.population = make_population(size,backend)
+		E, C = np.linspace(-1,1,3), np.linspace(1,-1,3)
+		for _ in range(model_constants["L"]):
+			self.population.react(E,C)
+
+	def time_breed_constant(self,backend,size,resampling):
+		self.population.breed_constant()
+
+
+class TimePositions:
+	"""Counting the animals in each environment"""
+	params = [BACKENDS,SIZES,ENVIRONMENTS]
+	param_names = ["backend","size","nE"]
+	timeout = 300
+
+	def setup(self,backend,size,nE):
+		skip_if((backend == "object") & (size > 10**5))
+		configure(size,nE)
+		self.population = make_population(size,backend)
+
+	def time_positions(self,backend,size,nE):
+		self.population.positions()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	common.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Set-up shared by all benchmarks: import paths,
+#	model constants and construction of populations
+#	and environments of a given size
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT,"src")]
+
+import animal
+import random_streams
+from animal import Animal
+from population import Population
+from array_population import ArrayPopulation, random_genes
+from environment import Environment
+from constants import model_constants, ModelConstants
+
+SEED = 42
+
+# Parameters swept by the benchmarks
+SIZES = [10**3, 10**4, 10**5, 10**6]
+ENVIRONMENTS = [1, 3, 10, 50]
+LIFETIMES = [1, 5, 20]
+BACKENDS = ["object", "array"]
+
+
+def configure(size=1000,nE=3,L=5,**constants):
+	"""Sets the model constants for a benchmark with nE environments that differ in their offset,
+	and seeds all random streams. All other constants are reset to their defaults, such that no
+	benchmark depends on the ones that ran before."""
+	# the modules hold references to model_constants, so it is reset in place
+	dict.clear(model_constants)
+	dict.update(model_constants,ModelConstants())
+	model_constants.change_constant("population_size",int(size))
+	model_constants.change_constant("environments",[[1E2,0.5,1.0,0.,O] for O in np.linspace(-0.7,0.7,nE)])
+	model_constants.change_constant("environment_names",["Environment "+str(i+1) for i in range(nE)])
+	model_constants.change_constant("L",L)
+	model_constants.change_constant("threads",0)
+	for key in constants:
+		model_constants.change_constant(key,constants[key])
+	random_streams.set_seed(SEED)
+	animal.seed(random_streams.stream_key(random_streams.ANIMAL,0))
+
+
+def make_population(size,backend,fixed=False):
+	"""Returns a population of size animals with random genes. If fixed is True, all animals are
+	non-plastic (s = 0), such that they neither react nor migrate."""
+	rng = random_streams.stream(random_streams.POPULATION,0)
+	genes = None
+	if fixed:
+		genes = random_genes(int(size),rng)
+		genes[:,[1,2,5,6,8]] = 0
+	if backend == "array":
+		return ArrayPopulation(int(size),genes,rng=rng)
+	if fixed:
+		return Population(int(size),[Animal(animal_genes) for animal_genes in genes],rng)
+	return Population(int(size),[Animal() for _ in range(int(size))],rng)
+
+
+def make_environments(nE):
+	"""Returns the environments of the model constants, precomputed for 100 generations"""
+	environments = []
+	for (i,param) in enumerate(model_constants["environments"][:nE]):
+		env = Environment(*param,rng=random_streams.stream(random_streams.ENVIRONMENT,i))
+		env.precompute(0,100*model_constants["L"])
+		environments.append(env)
+	return environments
+
+
+def skip_if(condition):
+	"""Skips a parameter combination (asv convention: setup raises NotImplementedError)"""
+	if condition:
+		raise NotImplementedError()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	run.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Runs the benchmarks and stores their timings, such
+#	that results of different versions can be compared.
+#	The benchmarks follow the conventions of asv
+#	(airspeed velocity), so they can be run by asv, too.
+#
+#	Usage (from the main folder):
+#		python -m benchmarks.run [-b REGEX] [--quick]
+#				[-o results.json] [--compare old.json]
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import subprocess
+import itertools
+import importlib
+import argparse
+import datetime
+import platform
+import inspect
+import json
+import glob
+import os
+import re
+
+from timeit import default_timer as timer
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def discover():
+	"""Returns (name, class, method name) of all benchmarks in the bench_*.py modules"""
+	benchmarks = []
+	for filename in sorted(glob.glob(os.path.join(BENCHMARK_DIR,"bench_*.py"))):
+		module_name = os.path.splitext(os.path.basename(filename))[0]
+		module = importlib.import_module("benchmarks."+module_name)
+		for (class_name,cls) in inspect.getmembers(module,inspect.isclass):
+			if cls.__module__ != module.__name__:
+				continue
+			for method in sorted(name for name in dir(cls) if name.startswith("time_")):
+				benchmarks.append((module_name+"."+class_name+"."+method,cls,method))
+	return benchmarks
+
+
+def run_benchmark(cls,method,params,repeat=None,max_time=1.):
+	"""Returns the minimum time of one call of method for the given parameters, or None if the
+	combination is skipped. Calls are repeated until max_time is spent (at least twice)."""
+	number = getattr(cls,"number",0)
+	repeat = repeat or getattr(cls,"repeat",5)
+	samples = []
+	spent = 0.
+	while (len(samples) < repeat) & ((spent < max_time) | (len(samples) < 2)):
+		benchmark = cls()
+		try:
+			if hasattr(benchmark,"setup"):
+				benchmark.setup(*params)
+		except NotImplementedError:
+			return None
+		function = getattr(benchmark,method)
+		calls = number or 1
+		start = timer()
+		for _ in range(calls):
+			function(*params)
+		elapsed = timer() - start
+		if hasattr(benchmark,"teardown"):
+			benchmark.teardown(*params)
+		samples.append(elapsed/calls)
+		spent += elapsed
+	return min(samples)
+
+
+def parameter_sets(cls,quick=False):
+	"""Returns all parameter combinations of a benchmark class (only the smallest ones if quick is True)"""
+	params = getattr(cls,"params",[])
+	if params and not isinstance(params[0],list):
+		params = [params]
+	if quick:
+		params = [values[:2] for values in params]
+	return list(itertools.product(*params))
+
+
+def commit():
+	"""Returns the hash of the current git commit, if any"""
+	try:
+		with open(os.devnull,"w") as devnull:
+			return subprocess.check_output(["git","rev-parse","--short","HEAD"],cwd=BENCHMARK_DIR,\
+				stderr=devnull).decode().strip()
+	except (OSError,subprocess.CalledProcessError):
+		return "unknown"
+
+
+def compare(old,new,threshold=1.1):
+	"""Prints the ratio of the new to the old timings, marking changes larger than threshold"""
+	print("\n{0:>10} {1:>10} {2:>7}  benchmark".format("old","new","ratio"))
+	for key in sorted(set(old) & set(new)):
+		if (old[key] is None) | (new[key] is None):
+			continue
+		ratio = new[key]/old[key]
+		mark = "-" if ratio < 1/threshold else ("+" if ratio > threshold else " ")
+		print("{0:>10.3e} {1:>10.3e} {2:>7.2f}{3} {4}".format(old[key],new[key],ratio,mark,key))
+
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-b","--bench",default="",help="only run benchmarks whose name matches this regular expression")
+	parser.add_argument("--quick",action="store_true",help="only run the two smallest values of every parameter")
+	parser.add_argument("-o","--output",help="file the timings are stored in (default: benchmarks/results/<commit>.json)")
+	parser.add_argument("--compare",help="timings of an earlier run to compare with")
+	args = parser.parse_args()
+
+	results = {}
+	for (name,cls,method) in discover():
+		if not re.search(args.bench,name):
+			continue
+		for params in parameter_sets(cls,args.quick):
+			key = "{0}({1})".format(name,", ".join(map(str,params)))
+			results[key] = run_benchmark(cls,method,params)
+			if results[key] is not None:
+				print("{0:>10.3e}s  {1}".format(results[key],key))
+
+	output = args.output or os.path.join(BENCHMARK_DIR,"results",commit()+".json")
+	if not os.path.isdir(os.path.dirname(os.path.abspath(output))):
+		os.makedirs(os.path.dirname(os.path.abspath(output)))
+	with open(output,"w") as f:
+		json.dump({"commit":commit(),"date":str(datetime.datetime.today()),"machine":platform.node(),
+			"python":platform.python_version(),"numpy":np.__version__,"results":results},f,indent=1,sort_keys=True)
+	print("\nResults written to {0}".format(output))
+
+	if args.compare:
+		with open(args.compare) as f:
+			compare(json.load(f)["results"],results)
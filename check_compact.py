@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	check_compact.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Checks that the compact precision of the array backend
+#	agrees with double precision: a population in double
+#	and one in compact precision evolve independently from
+#	the same state and random streams. While they follow
+#	the same trajectory, their gene statistics and mean
+#	lifetime payoff must agree within GENE_TOLERANCE and
+#	PAYOFF_TOLERANCE in every generation. Once a random
+#	draw lands on the other side of a float32 rounding,
+#	they split and the compact population is synchronized
+#	again; at most SPLIT_TOLERANCE of the generations may
+#	split.
+#
+#	Usage:
+#		python check_compact.py --generations 50 [options]
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import sys
+sys.path.insert(0, './src')
+
+import numpy as np
+
+from constants import parse_arguments
+from environment import Environment, evaluate_all
+from array_population import ArrayPopulation
+from gene_statistics import GeneStatistics
+import random_streams
+
+# Largest absolute difference of any gene mean or standard deviation in any environment
+GENE_TOLERANCE = 1E-6
+# Largest absolute difference of the mean lifetime payoff
+PAYOFF_TOLERANCE = 1E-6
+# Largest share of generations after which the populations split
+SPLIT_TOLERANCE = 0.1
+# Largest difference of the genes of any animal of populations that did not split (float32 rounding)
+ANIMAL_TOLERANCE = 1E-5
+
+def state_bytes(population):
+	"""Returns the memory of the state arrays of an ArrayPopulation per animal, in bytes"""
+	arrays = [population._genes,population._position,population._insulation,population._mismatch,\
+			population._adjustments,population._migrations,population._primed]
+	return sum(array.nbytes for array in arrays) / float(max(population.size(),1))
+
+
+def compare(double,compact,nE):
+	"""Returns the largest differences of the gene means and standard deviations, and of the mean lifetime payoff"""
+	statistics = [GeneStatistics.of(population,nE) for population in [double,compact]]
+	present = (statistics[0].counts > 1) & (statistics[1].counts > 1)
+	genes = max(np.max(np.abs(statistics[0].mean[present]-statistics[1].mean[present])),\
+			np.max(np.abs(statistics[0].std[present]-statistics[1].std[present])))
+	payoff = abs(np.mean(double.lifetime_payoff())-np.mean(compact.lifetime_payoff()))
+	return genes, payoff
+
+
+if __name__ == '__main__':
+	constants = parse_arguments()
+	constants.change_constant("backend","array")
+	constants.change_constant("precision","double")
+	compact_constants = constants.copy()
+	compact_constants.change_constant("precision","compact")
+
+	random_streams.set_seed(constants["seed"])
+	environments = [Environment(*param,rng=random_streams.stream(random_streams.ENVIRONMENT,i),constants=constants) \
+			for (i,param) in enumerate(constants["environments"])]
+	nE, L = len(environments), constants["L"]
+	population = ArrayPopulation(constants["population_size"],rng=random_streams.stream(random_streams.POPULATION,0),\
+			constants=constants)
+
+	# the compact population continues with the same random streams, but breeds and mutates on its own
+	compact = ArrayPopulation.from_state(population.state(),constants=compact_constants)
+
+	worst, splits, t = np.zeros(2), 0, 0
+	print("generation\tgenes\t\tpayoff\t\tsplit")
+	for j in range(constants["generations"]):
+		E_block, C_block = evaluate_all(environments,t+np.arange(L))
+		for pop in [population,compact]:
+			pop.react_lifetime(E_block,C_block)
+		differences = compare(population,compact,nE)
+		worst = np.maximum(worst,differences)
+
+		for pop in [population,compact]:
+			pop.breed_constant()
+			pop.react(E_block[-1],C_block[-1],1)
+		t += L
+
+		split = (population.size() != compact.size()) or \
+				(np.max(np.abs(population.genes()-compact.genes()),initial=0) > ANIMAL_TOLERANCE)
+		if split:
+			splits += 1
+			compact = ArrayPopulation.from_state(population.state(),constants=compact_constants)
+		print("{0}\t\t{1:.2e}\t{2:.2e}\t{3}".format(j,differences[0],differences[1],"yes" if split else ""))
+
+	print("\nState per animal: {0:.1f} bytes (double), {1:.1f} bytes (compact)".format(state_bytes(population),\
+		state_bytes(compact)))
+	share = splits / float(max(constants["generations"],1))
+	passed = (worst[0] <= GENE_TOLERANCE) & (worst[1] <= PAYOFF_TOLERANCE) & (share <= SPLIT_TOLERANCE)
+	print("Largest differences: genes {0:.2e}, payoffs {1:.2e}, split after {2:.1%} of the generations - {3}".format(\
+		worst[0],worst[1],share,"passed" if passed else "FAILED"))
+	sys.exit(0 if passed else 1)
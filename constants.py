@@ -1,136 +1,267 @@
-#!/usr/bin/env python
-# -*- coding: utf8 -*-
-"""
-#########################################################
-#
-#	constants.py
-#	Author: Dion Häfner (dionhaefner@web.de)
-#	
-#	Defining the constants of the Botero evolution model
-#	and parsing them from command line.
-#	
-#	Usage:
-#		from constants import model_constants
-#	model_constants is then a dict containing all the 
-#	parameters.
-#
-#	Licensed under BSD 2-Clause License
-#
-#########################################################
-"""
-
-# --------------------------
-# SETS AVAILABLE MODEL PARAMETERS, THEIR TYPE, DEFAULT VALUE AND DESCRIPTION
-# Change default values here
-
-_PARAMETERS = [
-		("population_size",int,5000,"number of animals per population"),
-		("generations",int,1000,"number of generations per run"),
-		("L",int,5,"life time of each animal in time steps"),
-		("kd",float,0.02,"constant cost of plasticity"),
-		("ka",float,0.01,"cost of each adaptation"),
-		("tau",float,0.25,"coefficient of lifetime payoff exponential"),
-		("q",float,2.2,"controls expected number of offspring in variable scenario"),
-		("mu",float,1E-3,"mutation rate of the genes"),
-		("environments",float,[[1E2,0.1,0.6,0.,0.],
-					[1E2,.7,1.0,0.,0.5],
-					[1E2,.5,1.0,0.,-0.7]], "parameters of each environment "+
-                                               		            "in the form R P A B O"),
-		("environment_names",str,["moderate",
-						"warm",
-						"cold"],"displayed name of each environment"),
-		("km",float,0.2,"cost of migration"),
-		("limit",str,"m","names of genes that should be limited to [0,1]"),
-		("populations",int,1,"number of identical populations per run"),
-		("plot_every",int,0,"detailed output is plotted every N generations (0 = never)"),
-		("verbose",bool,False,"triggers verbose output to command line")
-
-]
-# --------------------------
-
-import argparse
-import sys
-
-if sys.argv[0] == "main_variable.py":
-	_VARIABLE = True
-else:
-	_VARIABLE = False
-
-# Required arguments when using main_variable.py
-_VARIABLE_PARAMETERS = [
-			("mean_file",str,"","specifies the path to the file containing means of the input genes"),
-			("std_file",str,"","specifies the path to the file containing the std. dev. of the input genes")
-		]
-
-class ModelConstants(dict):
-	"""Implement class for containing constants"""
-	def __init__(self):
-		super(ModelConstants,self).__init__()
-		for param in _PARAMETERS:
-			self[param[0]] = param[2]
-		if _VARIABLE:
-			for param in _VARIABLE_PARAMETERS:
-				self[param[0]] = param[2]
-
-	def __setattr__(self,name,value):
-		raise Exception("Constants are read-only!")
-			
-	def change_constant(self,key,val):
-	# ModelConstant instances' properties should only be changed through this method
-		if key in self:
-			self[key] = val
-		else:
-			raise KeyError("Key {0} is not a valid model constant identifier!".format(key))
-
-
-# Parse parameters from command line
-model_constants = ModelConstants()
-parser = argparse.ArgumentParser()
-
-for key in _PARAMETERS:
-	if key[0] in ["environments"]: # Setting R,P,A,B,O for each environment
-		Nenv = len(key[2])
-		parser.add_argument("--"+key[0],type=key[1],action="append",nargs=5,help=key[3])
-	elif key[0] in ["environment_names","limit"]: # May have arbitrary many arguments
-		parser.add_argument("--"+key[0],type=key[1],action="append",nargs="*",help=key[3])
-	elif key[0] in ["verbose"]: # Flags (true or false, no argument)
-		parser.add_argument("--"+key[0],action="store_true",help=key[3])
-	else: # Ordinary, single arguments (all optional)
-		parser.add_argument("--"+key[0],type=key[1],help=key[3])
-
-# Not includes in _PARAMETERS, needs to be parsed outside of the loop
-for key in ["R","P","A","B","O"]:
-	parser.add_argument("--"+key,type=int,nargs=Nenv,help="Overrides parameter {0} for each environment".format(key))
-
-# Parse required arguments when variable breeding is used
-if _VARIABLE:
-	for key in _VARIABLE_PARAMETERS:
-		parser.add_argument(key[0], type=key[1], help=key[3])
-
-# Store all read arguments in a dict
-args = parser.parse_args().__dict__
-
-# Update model_constants object with read parameters
-for key in _PARAMETERS:
-	if args[key[0]]:
-		model_constants.change_constant(key[0],args[key[0]])
-if _VARIABLE:
-	for key in _VARIABLE_PARAMETERS:
-		if args[key[0]]:
-			model_constants.change_constant(key[0],args[key[0]])
-for i,key in enumerate(["R","P","A","B","O"]):
-	environments = model_constants["environments"]
-	if args[key]:
-		for env in environments:
-			env[i] = args[key][i]
-
-# Print some information
-print("\nRunning model with the following parameters:")
-for key in _PARAMETERS:
-	print("\t{0}: {1}".format(key[0],model_constants[key[0]]))
-print("\n")
-if _VARIABLE:
-	print("Using input files for start genes:")
-	for key in _VARIABLE_PARAMETERS:
-		print("\t{0}: {1}".format(key[0],model_constants[key[0]]))
-	print("\n")
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	constants.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#	
+#	Defining the constants of the Botero evolution model
+#	and parsing them from command line.
+#	
+#	Usage:
+#		from constants import ModelConstants, parse_arguments
+#		constants = parse_arguments()  # in entry points, or
+#		constants = ModelConstants()   # default values
+#	constants is then a dict containing all the 
+#	parameters, which is passed to Environment,
+#	Population and Animal. model_constants holds the
+#	default values used when none are passed.
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+# --------------------------
+# SETS AVAILABLE MODEL PARAMETERS, THEIR TYPE, DEFAULT VALUE AND DESCRIPTION
+# Change default values here
+
+_PARAMETERS = [
+		("population_size",int,5000,"number of animals per population"),
+		("generations",int,1000,"number of generations per run"),
+		("stop_rule",str,"none","stops a population early once its gene means and environment sizes are stationary: when "+
+						"their drift between the halves of the last stop_window generations (drift) or their standard "+
+						"deviation within them (variance) is below stop_tolerance (none = never)"),
+		("stop_window",int,100,"number of generations the stopping rule looks at"),
+		("stop_tolerance",float,1E-2,"largest drift or standard deviation of any gene mean or environment size "+
+						"(as fraction of population_size) of a stationary population"),
+		("stop_min",int,200,"number of generations that are run before a population may stop early"),
+		("saturation_generations",int,0,"a population of variable size that had population_size animals for N "+
+						"generations in a row survived and stops early (0 = never)"),
+		("L",int,5,"life time of each animal in time steps"),
+		("kd",float,0.02,"constant cost of plasticity"),
+		("ka",float,0.01,"cost of each adaptation"),
+		("tau",float,0.25,"coefficient of lifetime payoff exponential"),
+		("q",float,2.2,"controls expected number of offspring in variable scenario"),
+		("mu",float,1E-3,"mutation rate of the genes"),
+		("resampling",str,"poisson","parents of the next generation with constant population size: Poisson numbers of "+
+						"offspring, trimmed or topped up by clones (poisson), or exactly population_size offspring "+
+						"drawn from the lifetime payoffs (multinomial, systematic or residual)"),
+		("environments",float,[[1E2,0.1,0.6,0.,0.],
+					[1E2,.7,1.0,0.,0.5],
+					[1E2,.5,1.0,0.,-0.7]], "parameters of each environment "+
+                                               		            "in the form R P A B O"),
+		("environment_names",str,["moderate",
+						"warm",
+						"cold"],"displayed name of each environment"),
+		("km",float,0.2,"cost of migration"),
+		("migration",str,"full","environments animals may migrate to: any other (full), the neighbours on a ring (ring) "+
+						"or on a 2-D grid (lattice), or as given by a matrix of migration probabilities in a .csv or .npy file"),
+		("limit",str,"m","names of genes that should be limited to [0,1]"),
+		("populations",int,1,"number of identical populations per run"),
+		("survival_width",float,0.,"main_variable.py runs rounds of populations populations until the Wilson "+
+						"interval of the survival probability is at most this wide (0 = a single round)"),
+		("survival_confidence",float,0.95,"confidence level of the interval of the survival probability"),
+		("survival_max",int,1000,"largest number of populations run to estimate the survival probability"),
+		("workers",int,1,"number of processes the populations are distributed over"),
+		("batch",int,0,"number of populations that are simulated at once in one array layout (0 = one at a time)"),
+		("threads",int,0,"number of threads per population with the array backend (0 = all cores)"),
+		("seed",int,0,"base seed of all random number streams (0 = random seed)"),
+		("checkpoint_every",int,0,"the full population state is saved every N generations (0 = never)"),
+		("resume",str,"","output folder of an interrupted run of main_constant.py to resume from its checkpoints"),
+		("output_format",str,"csv","format of the gene statistics: csv (text files) or npy (binary store, "+
+						"convert with export_csv.py)"),
+		("output_every",int,1,"gene statistics are written every N generations (linear spacing), or N times per "+
+						"decade of generations (log spacing)"),
+		("output_spacing",str,"linear","spacing of the generations whose gene statistics are written: linear or log"),
+		("output_buffer",int,0,"the gene statistics of the last N generations are kept in memory and written in full "+
+						"resolution when a population stops early, dies out or ends"),
+		("metrics",str,"none","records the wall time (time), or wall time and allocated memory (memory), of every "+
+						"phase of every generation in pop<k>_metrics.jsonl (none = off)"),
+		("profile_generation",int,0,"profiles generation N with cProfile, written to pop<k>_generation_N.prof (0 = never)"),
+		("plot_every",int,0,"detailed output is plotted every N generations (0 = never)"),
+		("plot_mode",str,"background","plots are rendered immediately (inline), in a background process (background), "+
+						"saved as snapshots to be rendered later by render_snapshots.py (later), or not at all (none)"),
+		("backend",str,"object","population backend: object (one Animal instance per animal) "+
+						"or array (state of all animals in contiguous arrays)"),
+		("precision",str,"double","state of the animals with the array backend: double precision, or compact "+
+						"(float32 genes, insulation and mismatch, int16 counters and positions and bit-packed primed "+
+						"flags) for very large populations, see check_compact.py"),
+		("cache_environment",bool,False,"stores the environment traces in memory-mapped files in the output folder"),
+		("cache",str,"record","run index output/runs.sqlite of populations with constant size: every population is "+
+						"recorded in it (record), populations that were run before with the same parameters, seed and code "+
+						"are taken from it (reuse), or it is not used (off)"),
+		("verbose",bool,False,"triggers verbose output to command line")
+
+]
+# --------------------------
+
+import argparse
+import copy
+import sys
+import ast
+
+# Required arguments when using main_variable.py
+_VARIABLE_PARAMETERS = [
+			("mean_file",str,"","specifies the path to the file containing means of the input genes, "+
+						"or to a population checkpoint (.npz) to start from"),
+			("std_file",str,"","specifies the path to the file containing the std. dev. of the input genes "+
+						"(not needed when starting from a checkpoint)")
+		]
+
+# Parameters that may change when an interrupted run is resumed, since they do not change its results
+_RESUME_PARAMETERS = ["resume","workers","threads","metrics","profile_generation",
+			"plot_every","plot_mode","verbose"]
+
+# Parameter sets of sweep.py
+_SWEEP_PARAMETERS = [
+			("sweep",str,[],"name of a parameter and the values it takes, e.g. --sweep R 1 10 100 "+
+						"(may be given several times, all combinations are run)"),
+			("sweep_file",str,"","csv file holding one parameter set per row, with the parameter names as header"),
+			("search",str,[],"name of a parameter and the interval its tipping point is searched in, optionally "+
+						"followed by log for a logarithmic scale, e.g. --search R 1 1000 log"),
+			("classify",str,[],"class of a population in the tipping point search: gene, above or below, threshold and "+
+						"optionally an environment of the final gene mean, e.g. --classify h above 0.9"),
+			("search_tolerance",float,1E-2,"width of the tipping point interval the search ends at, relative to the "+
+						"initial interval")
+		]
+
+class ModelConstants(dict):
+	"""Implement class for containing constants"""
+	def __init__(self,variable=False,sweep=False):
+		"""Creates constants with the default values, including the input files of main_variable.py
+		if variable is True and the parameter sets of sweep.py if sweep is True"""
+		super(ModelConstants,self).__init__()
+		parameters = list(_PARAMETERS)
+		if variable:
+			parameters += _VARIABLE_PARAMETERS
+		if sweep:
+			parameters += _SWEEP_PARAMETERS
+		for param in parameters:
+			self[param[0]] = copy.deepcopy(param[2])
+
+	def __setattr__(self,name,value):
+		raise Exception("Constants are read-only!")
+			
+	def change_constant(self,key,val):
+	# ModelConstant instances' properties should only be changed through this method
+		if key in self:
+			self[key] = val
+		else:
+			raise KeyError("Key {0} is not a valid model constant identifier!".format(key))
+
+	def copy(self):
+		"""Returns an independent copy of the constants"""
+		constants = ModelConstants()
+		dict.clear(constants)
+		dict.update(constants,copy.deepcopy(dict(self)))
+		return constants
+
+
+def parse_arguments(argv=None,variable=False,sweep=False):
+	"""Returns ModelConstants with the default values, changed by the command line arguments argv
+	(default: sys.argv[1:]). variable and sweep add the arguments of main_variable.py and sweep.py."""
+	constants = ModelConstants(variable,sweep)
+	parser = argparse.ArgumentParser()
+
+	for key in _PARAMETERS:
+		if key[0] in ["environments"]: # Setting R,P,A,B,O for each environment
+			Nenv = len(key[2])
+			parser.add_argument("--"+key[0],type=key[1],action="append",nargs=5,help=key[3])
+		elif key[0] in ["environment_names","limit"]: # May have arbitrary many arguments
+			parser.add_argument("--"+key[0],type=key[1],action="append",nargs="*",help=key[3])
+		elif key[0] in ["verbose","cache_environment"]: # Flags (true or false, no argument)
+			parser.add_argument("--"+key[0],action="store_true",help=key[3])
+		else: # Ordinary, single arguments (all optional)
+			parser.add_argument("--"+key[0],type=key[1],help=key[3])
+
+	# Not includes in _PARAMETERS, needs to be parsed outside of the loop
+	for key in ["R","P","A","B","O"]:
+		parser.add_argument("--"+key,type=float,nargs="+",help="Overrides parameter {0} for each environment".format(key))
+
+	# Parse required arguments when variable breeding is used
+	if variable:
+		for key in _VARIABLE_PARAMETERS:
+			if key[0] == "std_file": # optional when starting from a checkpoint
+				parser.add_argument(key[0], type=key[1], nargs="?", help=key[3])
+			else:
+				parser.add_argument(key[0], type=key[1], help=key[3])
+
+	# Parse parameter sets of sweeps
+	if sweep:
+		parser.add_argument("--sweep",type=str,action="append",nargs="+",help=_SWEEP_PARAMETERS[0][3])
+		parser.add_argument("--sweep_file",type=str,help=_SWEEP_PARAMETERS[1][3])
+		parser.add_argument("--search",type=str,nargs="+",help=_SWEEP_PARAMETERS[2][3])
+		parser.add_argument("--classify",type=str,nargs="+",help=_SWEEP_PARAMETERS[3][3])
+		parser.add_argument("--search_tolerance",type=float,help=_SWEEP_PARAMETERS[4][3])
+
+	# Store all read arguments in a dict
+	args = parser.parse_args(argv).__dict__
+
+	# Update constants with read parameters
+	for key in list(_PARAMETERS)+(_VARIABLE_PARAMETERS if variable else [])+(_SWEEP_PARAMETERS if sweep else []):
+		if args[key[0]] is not None: # also zero values, which may differ from the default
+			constants.change_constant(key[0],args[key[0]])
+	for key in ["environment_names","limit"]: # lists of names arrive as nested lists
+		if args[key]:
+			constants.change_constant(key,[name for names in args[key] for name in names])
+	for i,key in enumerate(["R","P","A","B","O"]):
+		if args[key]:
+			for (j,env) in enumerate(constants["environments"]):
+				env[i] = args[key][min(j,len(args[key])-1)]
+
+	return constants
+
+
+def read_parameters(filename,constants):
+	"""Returns a copy of constants with the model parameters restored from the parameters.txt of a run (filename),
+	except for those that may change when resuming, and the names of the restored parameters that differed"""
+	types = dict((key[0],key[1]) for key in _PARAMETERS)
+	restored, changed = constants.copy(), []
+	with open(filename) as f:
+		for line in f:
+			key, _, text = line.rstrip("\r\n").partition(":\t")
+			if (key not in types) or (key in _RESUME_PARAMETERS):
+				continue
+			value = _parse_value(text,types[key])
+			if value != constants[key]:
+				changed.append(key)
+			restored.change_constant(key,value)
+	return restored, changed
+
+
+def _parse_value(text,kind):
+	"""Parses a value as written to parameters.txt, strings may be written without quotes"""
+	try:
+		value = ast.literal_eval(text)
+	except (ValueError,SyntaxError):
+		if kind is not str:
+			raise
+		return text
+	if (kind is str) and not isinstance(value,(str,list)):
+		return text
+	return value
+
+
+def model_parameters(constants):
+	"""Returns a dict of the model parameters in constants, without the input files of main_variable.py
+	and the parameter sets of sweep.py"""
+	return dict((key[0],constants[key[0]]) for key in _PARAMETERS)
+
+
+def print_constants(constants):
+	"""Prints the parameters of the model and, if given, the input files of main_variable.py"""
+	print("\nRunning model with the following parameters:")
+	for key in _PARAMETERS:
+		print("\t{0}: {1}".format(key[0],constants[key[0]]))
+	print("\n")
+	if "mean_file" in constants:
+		print("Using input files for start genes:")
+		for key in _VARIABLE_PARAMETERS:
+			print("\t{0}: {1}".format(key[0],constants[key[0]]))
+		print("\n")
+
+
+# Default values, used whenever no constants are passed explicitly
+model_constants = ModelConstants()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	export_csv.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Converts the binary gene statistics of runs with
+#	--output_format npy to the csv files of gene means
+#	and standard deviations (e.g. for main_variable.py)
+#
+#	Usage:
+#		python export_csv.py output/<run>/pop1_statistics.npy [...]
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import sys
+sys.path.insert(0, './src')
+
+import argparse
+
+from output_store import export_csv
+
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument("stores",nargs="+",help="binary stores (pop<k>_statistics.npy) to convert, "+
+						"the csv files are written next to them")
+	args = parser.parse_args()
+
+	for store in args.stores:
+		mean_file, std_file = export_csv(store)
+		print("{0} -> {1}, {2}".format(store,mean_file,std_file))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	query_runs.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Lists the populations in the run index whose
+#	parameters are in the given ranges, with their
+#	output folders and final gene means
+#
+#	Usage:
+#		python query_runs.py --range R1 10 100 --range mu 0 0.01
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import sys
+sys.path.insert(0, './src')
+
+import argparse
+import csv
+
+from population import GENE_NAMES
+from run_index import RunIndex, INDEX_FILE
+
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--range",nargs=3,action="append",default=[],metavar=("NAME","LOWER","UPPER"),
+						help="range of a parameter, environment parameters are named R1, P1, ..., R2, ...")
+	parser.add_argument("--index",default=INDEX_FILE,help="run index to query")
+	args = parser.parse_args()
+
+	ranges = dict((name,(float(lower),float(upper))) for (name,lower,upper) in args.range)
+	runs = RunIndex(args.index).query(**ranges)
+
+	# one row per environment of every population, genes in alphabetical order as in the csv output
+	genes = sorted(GENE_NAMES)
+	order = [GENE_NAMES.index(gene) for gene in genes]
+	names = sorted(ranges)
+	writer = csv.writer(sys.stdout)
+	writer.writerow(["path","population","seed"]+names+["environment"]+genes+["size","stop_generation","stop_reason"])
+	for run in runs:
+		for i in range(len(run["sizes"])):
+			writer.writerow([run["path"],run["population"]+1,run["seed"]]+[run["parameters"][name] for name in names]+\
+				[i+1]+run["mean"][i,order].tolist()+[int(run["sizes"][i]),run["stop_generation"],run["stop_reason"]])
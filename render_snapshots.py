@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	render_snapshots.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Renders the plots of runs with --plot_mode later
+#	from the snapshots saved in their output folders
+#
+#	Usage:
+#		python render_snapshots.py output/<run>/ [...]
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import sys
+sys.path.insert(0, './src')
+
+import argparse
+
+try: # Seaborn makes prettier plots, but is not installed in a fresh Anaconda python
+	import seaborn as sns
+	have_seaborn = True
+except ImportError:
+	have_seaborn = False
+
+from plot_worker import render_snapshots
+
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument("folders",nargs="+",help="output folders of runs with --plot_mode later")
+	args = parser.parse_args()
+
+	if have_seaborn: # same style as main_constant.py
+		sns.set('poster')
+		sns.set_palette("deep", desat=.6)
+		sns.set_context(rc={"figure.figsize": (10, 7.5)})
+
+	for folder in args.folders:
+		print("{0}: {1} plots rendered".format(folder,render_snapshots(folder)))
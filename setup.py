@@ -1,28 +1,35 @@
-#!/usr/bin/env python
-# -*- coding: utf8 -*-
-"""
-#########################################################
-#
-#	setup.py
-#	Author: Dion Häfner (dionhaefner@web.de)
-#	
-#	Compiles and builds cython modules of the project.
-#	Needs to be called any time animal.pyx is changed.
-#
-#	Usage:
-#		sudo python setup.py build_ext --inplace
-#
-#	Licensed under BSD 2-Clause License
-#
-#########################################################
-"""
-
-from distutils.core import setup
-from Cython.Build import cythonize
-import numpy
-
-setup(
-    name = "Enhanced Botero model cython functions",
-    ext_modules = cythonize(['src/animal.pyx'],include_path=['./src/']),
-    include_dirs=[numpy.get_include()]
-) 
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	setup.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#	
+#	Compiles and builds cython modules of the project.
+#	Needs to be called any time animal.pyx is changed.
+#
+#	Usage:
+#		sudo python setup.py build_ext --inplace
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+from distutils.core import setup
+from distutils.extension import Extension
+from Cython.Build import cythonize
+import numpy
+
+# the parallel kernels in animal.pyx are compiled with OpenMP
+extensions = [Extension("animal",["src/animal.pyx"],
+                include_dirs=[numpy.get_include()],
+                extra_compile_args=["-fopenmp"],
+                extra_link_args=["-fopenmp"])]
+
+setup(
+    name = "Enhanced Botero model cython functions",
+    ext_modules = cythonize(extensions,include_path=['./src/']),
+    include_dirs=[numpy.get_include()]
+) 
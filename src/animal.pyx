@@ -1,234 +1,548 @@
-# -*- coding: utf8 -*-
-"""
-#########################################################
-#
-#	animal.pyx
-#	Author: Dion Häfner (dionhaefner@web.de)
-#
-#	Implements animal class and methods
-#	(cythonized version of animal.py and genome.py)
-#
-#	YOU WILL NEED TO RUN setup.py AFTER MAKING CHANGES HERE
-#
-#	Licensed under BSD 2-Clause License
-#
-#########################################################
-"""
-
-import numpy as np
-
-from constants import model_constants
-
-# imports from c libraries for speed
-cimport numpy as np
-from libc.math cimport abs as c_abs
-from libc.math cimport log as c_log
-from libc.math cimport exp as c_exp
-from libc.stdlib cimport rand as c_rand
-from libc.stdlib cimport RAND_MAX
-from libc.math cimport fmax as c_max
-from libc.math cimport fmin as c_min
-
-# custom type definitions
-FTYPE = np.double
-DTYPE = np.int
-BTYPE = np.uint8
-ctypedef np.float_t FTYPE_t
-ctypedef np.int_t DTYPE_t
-ctypedef np.uint8_t BTYPE_t
-
-cdef int nE = len(model_constants["environments"])
-
-
-
-cdef class Animal:
-	"""Implements a cython class Animal, that is also available outside of this module"""
-	# properties of Animal, typed as C variables for speed
-	cdef object _constants
-	cdef FTYPE_t h,s,a,I0,I0p,b,bp,m,ma
-	cdef DTYPE_t adjustments
-	cdef DTYPE_t migrations
-	cdef FTYPE_t insulation
-	cdef BTYPE_t primed
-	# public keyword makes the variable accessible to python
-	cdef public FTYPE_t mismatch
-	cdef public DTYPE_t position
-
-	def __init__(self,np.ndarray[double,ndim=1] parent_genes=np.array([]),int position=nE+1):
-		"""Constructor"""
-		self._constants = model_constants
-		if not parent_genes.size: # empty argument -> random genes (default)
-			self.genes = random_genes()
-		else:
-			self.genes = parent_genes
-		if position > nE: # too large argument -> random position (default)
-			position = np.random.randint(nE)
-		self.mismatch = 0
-		self.adjustments = 0
-		self.migrations	= 0
-		self.insulation = self.genes[3]
-		self.position = position
-		r = randnum()
-		if (r <= self.h):
-			self.primed = 0
-		else:
-			self.primed = 1
-
-# PUBLIC METHODS
-
-	cpdef react(self,np.ndarray[double,ndim=1] E,np.ndarray[double,ndim=1] C,BTYPE_t evolve_all=0):
-		"""Animal migrates and reacts to environment E and cue C. If evolve_all is set, reaction takes place for all animals, regardless of gene 'a'."""
-		cdef np.ndarray[DTYPE_t,ndim=1] positions
-		cdef DTYPE_t new_position
-		cdef FTYPE_t new_insulation
-		cdef FTYPE_t r
-
-		r = randnum()
-		if ((r <= self.ma) | evolve_all) & (nE > 1):
-			r = randnum()
-			if (r <= self.m):
-				positions = np.arange(nE)
-				new_position = np.random.choice(positions[positions!=self.position])
-				self.position = new_position
-				self.migrations += 1
-
-		r = randnum()
-		if ((r <= self.a) | evolve_all):
-			if self.primed:
-				new_insulation = scale(self.I0p)+scale(self.bp)*C[self.position]
-			else:
-				new_insulation = scale(self.I0)+scale(self.b)*C[self.position]
-
-			self.insulation = new_insulation
-			self.adjustments += 1
-
-		self.mismatch = self.mismatch + c_abs(self.insulation-E[self.position])
-
-
-	cpdef lifetime_payoff(self,np.ndarray[DTYPE_t] positions):
-		"""Assembles the lifetime payoff of the animal"""
-		cdef FTYPE_t scale_factor
-		cdef FTYPE_t tau = self._constants["tau"]
-		if len(positions) > 1:
-			scale_factor = 1 - positions[self.position] / self._constants["population_size"]
-		else:
-			scale_factor = 1
-		if (self.s <= 0.5):
-			return scale_factor * c_max(c_exp(-tau*self.mismatch) - self._constants["km"] * self.migrations, 0)
-		else:
-			return scale_factor * c_max(c_exp(-tau*self.mismatch) - self._constants["kd"] \
-				- self.adjustments * self._constants["ka"] - self._constants["km"] * self.migrations, 0)
-
-
-	cpdef mutate(self):
-		"""Causes the Animal's genes to mutate"""
-		cdef np.ndarray[FTYPE_t,ndim=1] new_genes = self.genes
-		cdef DTYPE_t k
-		cdef FTYPE_t r, mutation_step
-		cdef FTYPE_t mu = self._constants["mu"]
-
-		for k in [0,1,3,4,7]:
-			r = randnum()
-			if (r<=mu):
-				mutation_step = np.random.normal(loc=0,scale=0.05)
-				new_genes[k] += mutation_step
-
-		if new_genes[1] > 0.5:
-			for k in [2,5,6,8]:
-				r = randnum()
-				if (r<=mu):
-					mutation_step = np.random.normal(loc=0,scale=0.05)
-					new_genes[k] += mutation_step
-		else:
-			new_genes[2], new_genes[5], new_genes[6], new_genes[8] = 0, 0, 0, 0
-
-		return new_genes
-
-
-
-	property gene_dict:
-		"""Allows the genes of the animal to be read from python as a dict by calling animal.gene_dict"""
-		def __get__(self):
-			return {"h":self.h,"s":self.s,"a":self.a,"I0":self.I0,"I0p":self.I0p,"b":self.b,"bp":self.bp,"m":self.m,"ma":self.ma}
-
-	property genes:
-		"""Allows the genes of the animal to be read and written from python as a list by calling animal.genes"""
-		def __get__(self):
-			return np.array([self.h,self.s,self.a,self.I0,self.I0p,self.b,self.bp,self.m,self.ma])
-
-		def __set__(self, object genes):
-			self.set_genes(genes)
-
-	cdef set_genes(self,np.ndarray[double,ndim=1] genes):
-		"""Checks every single gene if it is being limited or not. This may look messy, but is much faster than any loop implementation."""
-
-		if not ("h" in self._constants["limit"]):
-			self.h = genes[0]
-		else:
-			self.h = c_max(0,c_min(1,genes[0]))
-
-		if not ("s" in self._constants["limit"]):
-			self.s = genes[1]
-		else:
-			self.s = c_max(0,c_min(1,genes[1]))
-
-		if not ("a" in self._constants["limit"]):
-			self.a = genes[2]
-		else:
-			self.a = c_max(0,c_min(1,genes[2]))
-
-		if not ("I0" in self._constants["limit"]):
-			self.I0 = genes[3]
-		else:
-			self.I0 = c_max(0,c_min(1,genes[3]))
-
-		if not ("I0p" in self._constants["limit"]):
-			self.I0p = genes[4]
-		else:
-			self.I0p = c_max(0,c_min(1,genes[4]))
-
-		if not ("b" in self._constants["limit"]):
-			self.b = genes[5]
-		else:
-			self.b = c_max(0,c_min(1,genes[5]))
-
-		if not ("bp" in self._constants["limit"]):
-			self.bp = genes[6]
-		else:
-			self.bp = c_max(0,c_min(1,genes[6]))
-
-		if not ("m" in self._constants["limit"]):
-			self.m = genes[7]
-		else:
-			self.m = c_max(0,c_min(1,genes[7]))
-
-		if not ("ma" in self._constants["limit"]):
-			self.ma = genes[8]
-		else:
-			self.ma = c_max(0,c_min(1,genes[8]))
-
-
-# PROTECTED FUNCTIONS
-
-cdef inline double scale(double x):
-	"""Defines the scale function, decreasing gene efficiency for extreme values"""
-	if x < 0:
-		return -1*c_log(c_abs(x)+1)/c_log(3)
-	else:
-		return c_log(c_abs(x)+1)/c_log(3)
-
-
-cdef inline np.ndarray[double,ndim=1] random_genes():
-	"""Returns random values for the 9 genes in the chosen intervals:
-	h: 1, s: [0,1], a: [0,1], I0: [-1,1], I0p: [-1,1], b: [-2,2], bp: [-2,2], m: 0, ma: 0"""
-	cdef np.ndarray[FTYPE_t,ndim=1] rand_numbers, rand_genes
-	rand_numbers = np.array([randnum() for _ in np.arange(9)])
-	rand_genes = [0,1,1,2,2,4,4,0,0]*rand_numbers+[1,0,0,-1,-1,-2,-2,0,0]
-
-	if (rand_genes[1]<=0.5):
-		rand_genes[2], rand_genes[5], rand_genes[6], rand_genes[8] = 0, 0, 0, 0
-	return rand_genes
-
-cdef inline double randnum():
-	"""Returns random numbers at C speed"""
-	return c_rand() / float(RAND_MAX)
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	animal.pyx
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Implements animal class and methods
+#	(cythonized version of animal.py and genome.py)
+#
+#	YOU WILL NEED TO RUN setup.py AFTER MAKING CHANGES HERE
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+from constants import model_constants
+
+# imports from c libraries for speed
+cimport numpy as np
+cimport openmp
+from cython.parallel cimport prange, parallel, threadid
+from libc.math cimport abs as c_abs
+from libc.math cimport log as c_log
+from libc.math cimport exp as c_exp
+from libc.math cimport fmax as c_max
+from libc.math cimport fmin as c_min
+
+# custom type definitions
+FTYPE = np.double
+DTYPE = np.int
+BTYPE = np.uint8
+ctypedef np.float_t FTYPE_t
+ctypedef np.int_t DTYPE_t
+ctypedef np.uint8_t BTYPE_t
+
+# state arrays of the array backend in double precision or compact (float32 and int16, see ArrayPopulation)
+ctypedef fused real_t:
+	float
+	double
+ctypedef fused count_t:
+	np.int16_t
+	np.int64_t
+
+# state of the random number generators of this module (randomly seeded unless seed is called)
+cdef np.uint64_t _key = np.random.SeedSequence().generate_state(1,np.uint64)[0]
+cdef np.uint64_t _counter = 0
+_rng = np.random.default_rng()
+
+# increment of the splitmix64 generator (golden ratio)
+cdef np.uint64_t GOLDEN_GAMMA = 0x9E3779B97F4A7C15ULL
+
+# migration topology (see migration.Topology) as seen by the kernels
+cdef struct Migration:
+	int uniform
+	np.int64_t *indptr
+	np.int64_t *targets
+	double *cumulative
+	np.int64_t *counts # number of animals in each environment, updated on migration (NULL = not tracked)
+
+# environment of all time steps of a lifetime, sorted per environment, for summing the mismatch of fixed animals
+cdef struct Lifetime:
+	int steps
+	double *sorted # shape (nE,steps)
+	double *cumulative # shape (nE,steps+1), partial sums of sorted
+
+
+
+cdef class Animal:
+	"""Implements a cython class Animal, that is also available outside of this module"""
+	# properties of Animal, typed as C variables for speed
+	cdef object _constants
+	cdef int nE
+	cdef FTYPE_t h,s,a,I0,I0p,b,bp,m,ma
+	cdef DTYPE_t adjustments
+	cdef DTYPE_t migrations
+	cdef FTYPE_t insulation
+	cdef BTYPE_t primed
+	# public keyword makes the variable accessible to python
+	cdef public FTYPE_t mismatch
+	cdef public DTYPE_t position
+
+	def __init__(self,np.ndarray[double,ndim=1] parent_genes=np.array([]),int position=-1,constants=None):
+		"""Constructor, takes the genes, the position and the ModelConstants of the animal (default: model_constants)"""
+		self._constants = constants if constants is not None else model_constants
+		self.nE = len(self._constants["environments"])
+		if not parent_genes.size: # empty argument -> random genes (default)
+			self.genes = random_genes()
+		else:
+			self.genes = parent_genes
+		if (position < 0) | (position >= self.nE): # invalid argument -> random position (default)
+			position = _rng.integers(self.nE)
+		self.mismatch = 0
+		self.adjustments = 0
+		self.migrations	= 0
+		self.insulation = self.genes[3]
+		self.position = position
+		r = randnum()
+		if (r <= self.h):
+			self.primed = 0
+		else:
+			self.primed = 1
+
+# PUBLIC METHODS
+
+	cpdef react(self,np.ndarray[double,ndim=1] E,np.ndarray[double,ndim=1] C,BTYPE_t evolve_all=0,topology=None):
+		"""Animal migrates and reacts to environment E and cue C. If evolve_all is set, reaction takes place for all animals, regardless of gene 'a'.
+		Migration targets are drawn from topology (see migration.Topology, default: any other environment)."""
+		cdef Migration migration
+		set_migration(&migration,topology,NULL)
+		self.react_to(&E[0],&C[0],evolve_all,&migration)
+
+	cdef void react_to(self,double *E,double *C,BTYPE_t evolve_all,Migration *migration):
+		"""Implements react on C arrays"""
+		cdef DTYPE_t new_position
+		cdef FTYPE_t new_insulation
+
+		# random numbers are only drawn if they can make a difference (genes a and ma are 0 for non-plastic animals)
+		if (self.nE > 1) and (evolve_all or ((self.ma > 0) and (randnum() <= self.ma))):
+			if (randnum() <= self.m):
+				new_position = migration_target(self.position,randnum(),self.nE,migration)
+				if new_position >= 0:
+					if migration.counts != NULL:
+						migration.counts[self.position] -= 1
+						migration.counts[new_position] += 1
+					self.position = new_position
+					self.migrations += 1
+
+		if evolve_all or ((self.a > 0) and (randnum() <= self.a)):
+			if self.primed:
+				new_insulation = scale(self.I0p)+scale(self.bp)*C[self.position]
+			else:
+				new_insulation = scale(self.I0)+scale(self.b)*C[self.position]
+
+			self.insulation = new_insulation
+			self.adjustments += 1
+
+		self.mismatch = self.mismatch + c_abs(self.insulation-E[self.position])
+
+
+	cpdef lifetime_payoff(self,np.ndarray[DTYPE_t] positions):
+		"""Assembles the lifetime payoff of the animal"""
+		cdef FTYPE_t scale_factor
+		cdef FTYPE_t tau = self._constants["tau"]
+		if len(positions) > 1:
+			scale_factor = 1 - positions[self.position] / self._constants["population_size"]
+		else:
+			scale_factor = 1
+		if (self.s <= 0.5):
+			return scale_factor * c_max(c_exp(-tau*self.mismatch) - self._constants["km"] * self.migrations, 0)
+		else:
+			return scale_factor * c_max(c_exp(-tau*self.mismatch) - self._constants["kd"] \
+				- self.adjustments * self._constants["ka"] - self._constants["km"] * self.migrations, 0)
+
+
+	cpdef mutate(self):
+		"""Causes the Animal's genes to mutate"""
+		cdef np.ndarray[FTYPE_t,ndim=1] new_genes = self.genes
+		mutate_genes(&new_genes[0],self._constants["mu"])
+		return new_genes
+
+
+
+	property gene_dict:
+		"""Allows the genes of the animal to be read from python as a dict by calling animal.gene_dict"""
+		def __get__(self):
+			return {"h":self.h,"s":self.s,"a":self.a,"I0":self.I0,"I0p":self.I0p,"b":self.b,"bp":self.bp,"m":self.m,"ma":self.ma}
+
+	property genes:
+		"""Allows the genes of the animal to be read and written from python as a list by calling animal.genes"""
+		def __get__(self):
+			return np.array([self.h,self.s,self.a,self.I0,self.I0p,self.b,self.bp,self.m,self.ma])
+
+		def __set__(self, object genes):
+			self.set_genes(genes)
+
+	property state:
+		"""Allows the state of the animal (insulation, mismatch, adjustments, migrations, primed) to be read and written from python, e.g. for checkpoints"""
+		def __get__(self):
+			return (self.insulation,self.mismatch,self.adjustments,self.migrations,self.primed)
+
+		def __set__(self, object state):
+			self.insulation,self.mismatch,self.adjustments,self.migrations,self.primed = state
+
+	cdef set_genes(self,np.ndarray[double,ndim=1] genes):
+		"""Sets the genes, limiting those named in constants["limit"] to [0,1]"""
+		cdef BTYPE_t limit[9]
+		limit_mask(self._constants,limit)
+		self.assign_genes(&genes[0],limit)
+
+	cdef inline void assign_genes(self,double *genes,BTYPE_t *limit):
+		"""Sets the genes, limiting gene k to [0,1] if limit[k] is set"""
+		self.h = clamp(genes[0],limit[0])
+		self.s = clamp(genes[1],limit[1])
+		self.a = clamp(genes[2],limit[2])
+		self.I0 = clamp(genes[3],limit[3])
+		self.I0p = clamp(genes[4],limit[4])
+		self.b = clamp(genes[5],limit[5])
+		self.bp = clamp(genes[6],limit[6])
+		self.m = clamp(genes[7],limit[7])
+		self.ma = clamp(genes[8],limit[8])
+
+
+# PUBLIC FUNCTIONS
+
+def react_animals(np.ndarray animals,E,C,np.int64_t[::1] counts,topology=None,bint evolve_all=0):
+	"""Lets every Animal of animals migrate and react to environment E and cue C, as in Animal.react,
+	and keeps the number of animals in each environment (counts) up to date. E and C may also be blocks
+	of shape (steps,nE), then every Animal lives through all steps in one pass."""
+	cdef Animal animal
+	cdef double[:,::1] E_view = np.ascontiguousarray(np.atleast_2d(E),dtype=np.float64)
+	cdef double[:,::1] C_view = np.ascontiguousarray(np.atleast_2d(C),dtype=np.float64)
+	cdef Py_ssize_t s, steps = E_view.shape[0]
+	cdef Migration migration
+
+	if (animals.shape[0] == 0) or (steps == 0):
+		return
+	set_migration(&migration,topology,&counts[0])
+	for animal in animals:
+		for s in range(steps):
+			animal.react_to(&E_view[s,0],&C_view[s,0],evolve_all,&migration)
+
+
+def settle_animals(np.ndarray animals,E_block,int num_envs):
+	"""Adds the mismatch of all time steps of E_block (shape (steps,nE)) at once to every Animal of animals that
+	can neither react nor migrate (a <= 0, and ma <= 0 or a single environment), since its insulation and position
+	stay the same. Returns the other animals, which have to react step by step."""
+	cdef Animal animal
+	cdef Lifetime lifetime
+	cdef np.ndarray sorted_E, cumulative
+	cdef np.ndarray active = np.zeros(animals.shape[0],dtype=bool)
+	cdef Py_ssize_t i = 0
+
+	sorted_E, cumulative = set_lifetime(&lifetime,E_block)
+	for animal in animals:
+		if (animal.a > 0) or ((animal.ma > 0) and (num_envs > 1)):
+			active[i] = True
+		else:
+			animal.mismatch += lifetime_mismatch(animal.insulation,animal.position,&lifetime)
+		i += 1
+	return animals[active]
+
+
+def make_offspring(np.ndarray parents,np.int64_t[::1] index,constants=None,bint mutate=True):
+	"""Returns an array holding one new Animal for every entry of index, which is born by the Animal
+	parents[index[i]], i.e. Animal(parent.mutate(),parent.position,constants) (or Animal(parent.genes,...)
+	if mutate is False). All offspring are created in one call, drawing the same random numbers."""
+	cdef Py_ssize_t i
+	cdef Py_ssize_t n = index.shape[0]
+	cdef Animal parent, child
+	cdef double genes[9]
+	cdef BTYPE_t limit[9]
+	cdef FTYPE_t mu
+	cdef int num_envs
+	cdef np.ndarray offspring = np.empty(n,dtype=object)
+
+	if constants is None:
+		constants = model_constants
+	mu = constants["mu"]
+	num_envs = len(constants["environments"])
+	limit_mask(constants,limit)
+
+	for i in range(n):
+		parent = parents[index[i]]
+		genes[0], genes[1], genes[2] = parent.h, parent.s, parent.a
+		genes[3], genes[4], genes[5] = parent.I0, parent.I0p, parent.b
+		genes[6], genes[7], genes[8] = parent.bp, parent.m, parent.ma
+		if mutate:
+			mutate_genes(genes,mu)
+
+		child = Animal.__new__(Animal)
+		child._constants = constants
+		child.nE = num_envs
+		child.assign_genes(genes,limit)
+		child.position = parent.position
+		child.insulation = child.I0
+		child.mismatch = 0
+		child.adjustments = 0
+		child.migrations = 0
+		child.primed = randnum() > child.h
+		offspring[i] = child
+
+	return offspring
+
+
+def seed(np.uint64_t key):
+	"""Seeds the random number generators used by all animals of this process with a 64 bit key
+	(see random_streams.stream_key)"""
+	global _key, _counter, _rng
+	_key = key
+	_counter = 0
+	_rng = np.random.Generator(np.random.Philox(key=key))
+
+
+def get_random_state():
+	"""Returns the state of the random number generators of this module as a dict"""
+	return {"key":_key,"counter":_counter,"rng":_rng.bit_generator.state}
+
+
+def set_random_state(state):
+	"""Restores the random number generators of this module from a dict returned by get_random_state"""
+	global _key, _counter, _rng
+	_key = state["key"]
+	_counter = state["counter"]
+	_rng = np.random.Generator(getattr(np.random,state["rng"]["bit_generator"])())
+	_rng.bit_generator.state = state["rng"]
+
+
+# PARALLEL KERNELS
+# These operate on the state arrays of an ArrayPopulation and release the GIL,
+# such that a single population can make use of all cores. Random numbers are
+# drawn from a counter-based generator, indexed by the animal and the draw, so
+# results do not depend on the number of threads.
+
+cdef enum:
+	# maximum number of random numbers drawn per animal and call
+	DRAWS_PER_REACT = 4
+
+def react_population(real_t[:,::1] genes, count_t[::1] position, real_t[::1] insulation, real_t[::1] mismatch,
+			count_t[::1] adjustments, count_t[::1] migrations, BTYPE_t[::1] primed,
+			double[:,::1] E, double[:,::1] C, np.uint64_t key, np.uint64_t call, bint evolve_all=0, int num_threads=0,
+			topology=None, np.int64_t[::1] index=None):
+	"""Lets every animal of a population (given by its state arrays) live through the time steps of the environment
+	and cue blocks E and C (shape (steps,nE)), migrating and reacting in every step as in Animal.react, using num_threads
+	threads (0 = all). All steps of an animal run in one pass, while its state is kept in registers. The random numbers
+	of step s are determined by the key of the population's stream and the number of the call (call+s), such that
+	the result equals steps calls with single steps. Migration targets are drawn from topology (see migration.Topology,
+	default: any other environment). If index is given, only these animals react, with the same random numbers.
+	The state arrays are either all double precision, or compact (float32 with int16 counters and positions and
+	a bit-packed primed flag). Every step is computed in double precision in both cases."""
+	cdef Py_ssize_t i, j, s
+	cdef bint subset = index is not None
+	cdef Py_ssize_t n = index.shape[0] if subset else genes.shape[0]
+	cdef Py_ssize_t steps = E.shape[0]
+	cdef int num_envs = E.shape[1]
+	cdef np.uint64_t[::1] call_keys = np.empty(steps,dtype=np.uint64)
+	cdef np.uint64_t c
+	cdef np.int64_t pos, new_position, adjusted, migrated
+	cdef double ins, mis
+	cdef real_t *g
+	cdef bint packed = real_t is float
+	cdef Migration migration
+
+	if (n == 0) or (steps == 0):
+		return
+	if num_threads <= 0:
+		num_threads = openmp.omp_get_max_threads()
+	set_migration(&migration,topology,NULL)
+	for s in range(steps):
+		call_keys[s] = mix64(key + (call+s)*GOLDEN_GAMMA)
+
+	with nogil:
+		for j in prange(n,schedule='static',num_threads=num_threads):
+			if subset:
+				i = index[j]
+			else:
+				i = j
+			g = &genes[i,0]
+			c = i*DRAWS_PER_REACT
+			pos = position[i]
+			ins = insulation[i]
+			mis = mismatch[i]
+			adjusted = adjustments[i]
+			migrated = migrations[i]
+
+			for s in range(steps):
+				# random numbers are only drawn if they can make a difference (genes a and ma are 0 for non-plastic animals)
+				if (num_envs > 1) and (evolve_all or ((g[8] > 0) and (counter_uniform(call_keys[s],c) <= g[8]))):
+					if (counter_uniform(call_keys[s],c+1) <= g[7]):
+						new_position = migration_target(pos,counter_uniform(call_keys[s],c+2),num_envs,&migration)
+						if new_position >= 0:
+							pos = new_position
+							migrated = migrated + 1
+
+				if evolve_all or ((g[2] > 0) and (counter_uniform(call_keys[s],c+3) <= g[2])):
+					if is_primed(&primed[0],i,packed):
+						ins = scale(g[4])+scale(g[6])*C[s,pos]
+					else:
+						ins = scale(g[3])+scale(g[5])*C[s,pos]
+					adjusted = adjusted + 1
+
+				mis = mis + c_abs(ins-E[s,pos])
+
+			position[i] = pos
+			insulation[i] = ins
+			mismatch[i] = mis
+			adjustments[i] = adjusted
+			migrations[i] = migrated
+
+
+def settle_population(real_t[::1] insulation, count_t[::1] position, real_t[::1] mismatch, np.int64_t[::1] index,
+			E_block, int num_threads=0):
+	"""Adds the mismatch of all time steps of E_block (shape (steps,nE)) at once to the animals index of a population
+	(given by its state arrays), which can neither react nor migrate, using num_threads threads (0 = all)"""
+	cdef Py_ssize_t j
+	cdef Py_ssize_t n = index.shape[0]
+	cdef Lifetime lifetime
+	cdef np.ndarray sorted_E, cumulative
+
+	if n == 0:
+		return
+	if num_threads <= 0:
+		num_threads = openmp.omp_get_max_threads()
+	sorted_E, cumulative = set_lifetime(&lifetime,E_block)
+
+	with nogil:
+		for j in prange(n,schedule='static',num_threads=num_threads):
+			mismatch[index[j]] += lifetime_mismatch(insulation[index[j]],position[index[j]],&lifetime)
+
+
+# PROTECTED FUNCTIONS
+
+cdef inline double scale(double x) nogil:
+	"""Defines the scale function, decreasing gene efficiency for extreme values"""
+	if x < 0:
+		return -1*c_log(c_abs(x)+1)/c_log(3)
+	else:
+		return c_log(c_abs(x)+1)/c_log(3)
+
+
+cdef inline bint is_primed(BTYPE_t *primed, Py_ssize_t i, bint packed) nogil:
+	"""Returns the primed flag of animal i, stored in one byte per animal or packed into bits as by np.packbits"""
+	if packed:
+		return (primed[i >> 3] >> (7 - (i & 7))) & 1
+	return primed[i]
+
+
+cdef void set_migration(Migration *migration, object topology, np.int64_t *counts):
+	"""Points migration to the arrays of topology (None = uniform) and the number of animals in each environment"""
+	migration.uniform = (topology is None) or topology.uniform
+	if not migration.uniform:
+		migration.indptr = <np.int64_t *>np.PyArray_DATA(topology.indptr)
+		migration.targets = <np.int64_t *>np.PyArray_DATA(topology.targets)
+		migration.cumulative = <double *>np.PyArray_DATA(topology.cumulative)
+	migration.counts = counts
+
+
+cdef inline np.int64_t migration_target(np.int64_t position, double u, int num_envs, Migration *migration) nogil:
+	"""Returns the environment an animal at position migrates to, given a uniform random number u,
+	or -1 if it stays"""
+	cdef np.int64_t low, high, middle
+	if migration.uniform:
+		# uniformly choose one of the other environments
+		return (position + 1 + <np.int64_t>(u*(num_envs-1))) % num_envs
+
+	low, high = migration.indptr[position], migration.indptr[position+1]
+	if low == high:
+		return -1
+	# first target whose cumulative probability exceeds u
+	high -= 1
+	while low < high:
+		middle = (low+high) // 2
+		if migration.cumulative[middle] > u:
+			high = middle
+		else:
+			low = middle + 1
+	if migration.targets[low] == position:
+		return -1
+	return migration.targets[low]
+
+
+cdef tuple set_lifetime(Lifetime *lifetime, object E_block):
+	"""Points lifetime to the sorted environment of every time step of E_block (shape (steps,nE)) and its partial sums.
+	Returns the arrays, which have to be kept alive as long as lifetime is used."""
+	sorted_E = np.ascontiguousarray(np.sort(np.asarray(E_block,dtype=np.float64).T,axis=1))
+	cumulative = np.ascontiguousarray(np.concatenate((np.zeros((sorted_E.shape[0],1)),np.cumsum(sorted_E,axis=1)),axis=1))
+	lifetime.steps = sorted_E.shape[1]
+	lifetime.sorted = <double *>np.PyArray_DATA(sorted_E)
+	lifetime.cumulative = <double *>np.PyArray_DATA(cumulative)
+	return sorted_E, cumulative
+
+
+cdef inline double lifetime_mismatch(double insulation, np.int64_t position, Lifetime *lifetime) nogil:
+	"""Returns the sum of |insulation-E| over all time steps of lifetime in environment position, in closed form
+	from the number k of environment values below insulation: insulation*(2k-steps) - 2*sum(below) + sum(all)"""
+	cdef int steps = lifetime.steps
+	cdef double *values = lifetime.sorted + position*steps
+	cdef double *cumulative = lifetime.cumulative + position*(steps+1)
+	cdef int low = 0, high = steps, middle
+	while low < high:
+		middle = (low+high) // 2
+		if values[middle] < insulation:
+			low = middle + 1
+		else:
+			high = middle
+	return insulation*(2*low-steps) - 2*cumulative[low] + cumulative[steps]
+
+
+cdef inline double clamp(double x, BTYPE_t limit):
+	"""Limits x to [0,1] if limit is set"""
+	if limit:
+		return c_max(0,c_min(1,x))
+	return x
+
+
+cdef void limit_mask(object constants, BTYPE_t *limit):
+	"""Sets limit[k] for every gene k (in the order of Animal.genes) named in constants["limit"]"""
+	cdef int k
+	for (k,name) in enumerate(["h","s","a","I0","I0p","b","bp","m","ma"]):
+		limit[k] = name in constants["limit"]
+
+
+cdef void mutate_genes(double *genes, FTYPE_t mu):
+	"""Mutates the genes of one animal in place: every gene mutates with probability mu by a normally
+	distributed step, genes only relevant to plastic animals (s > 0.5) are zero otherwise"""
+	cdef int k
+	for k in (0,1,3,4,7):
+		if (randnum()<=mu):
+			genes[k] += _rng.normal(loc=0,scale=0.05)
+
+	if genes[1] > 0.5:
+		for k in (2,5,6,8):
+			if (randnum()<=mu):
+				genes[k] += _rng.normal(loc=0,scale=0.05)
+	else:
+		genes[2], genes[5], genes[6], genes[8] = 0, 0, 0, 0
+
+
+cdef inline np.ndarray[double,ndim=1] random_genes():
+	"""Returns random values for the 9 genes in the chosen intervals:
+	h: 1, s: [0,1], a: [0,1], I0: [-1,1], I0p: [-1,1], b: [-2,2], bp: [-2,2], m: 0, ma: 0"""
+	cdef np.ndarray[FTYPE_t,ndim=1] rand_numbers, rand_genes
+	rand_numbers = np.array([randnum() for _ in np.arange(9)])
+	rand_genes = [0,1,1,2,2,4,4,0,0]*rand_numbers+[1,0,0,-1,-1,-2,-2,0,0]
+
+	if (rand_genes[1]<=0.5):
+		rand_genes[2], rand_genes[5], rand_genes[6], rand_genes[8] = 0, 0, 0, 0
+	return rand_genes
+
+cdef inline double randnum():
+	"""Returns random numbers at C speed"""
+	global _counter
+	_counter += 1
+	return counter_uniform(_key,_counter)
+
+cdef inline np.uint64_t mix64(np.uint64_t z) nogil:
+	"""Finalizer of the splitmix64 generator, maps every 64 bit integer to a pseudo-random one"""
+	z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL
+	z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL
+	return z ^ (z >> 31)
+
+cdef inline double counter_uniform(np.uint64_t key, np.uint64_t counter) nogil:
+	"""Returns the uniform random number in [0,1) with the given counter from the stream given by key.
+	This is the counter-th output of a splitmix64 generator started at key."""
+	return (mix64(key + (counter+1)*GOLDEN_GAMMA) >> 11) * (1.0/9007199254740992.0)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	array_population.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Implements ArrayPopulation class, a population backend
+#	that stores the state of all animals in contiguous
+#	arrays instead of single Animal instances
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+from constants import model_constants # Import model constants
+from population import GENE_NAMES
+from animal import react_population, settle_population
+from migration import migration_topology
+from reproduction import resample
+import random_streams
+
+
+class ArrayPopulation:
+	def __init__(self,size,genes=None,positions=None,rng=None,constants=None):
+		"""Takes a population size and optionally an array of shape (size,9) containing the genes and
+		an array containing the position of every animal. Omitted genes or positions are drawn randomly
+		from rng, the random stream of the population (see random_streams). constants are the
+		ModelConstants of the population (default: model_constants)."""
+		if not isinstance(size,int):
+			raise TypeError('First argument must be of type int.')
+		self._constants = constants if constants is not None else model_constants
+		self._nE = len(self._constants["environments"])
+		self._topology = migration_topology(self._constants)
+		self._limit = limit_mask(self._constants["limit"])
+		self._float, self._int = state_types(self._constants["precision"])
+		self._packed = self._constants["precision"] == "compact"
+		if (self._nE > np.iinfo(self._int).max) or (self._constants["L"] >= np.iinfo(self._int).max):
+			raise ValueError("Too many environments or time steps for {0} precision!".format(self._constants["precision"]))
+		self._rng = rng if rng is not None else random_streams.default_stream()
+		self._key = self._rng.integers(2**64,dtype=np.uint64)
+		self._calls = 0
+
+		if genes is None:
+			genes = random_genes(size,self._rng)
+		genes = np.array(genes,dtype=np.float64,ndmin=2)
+		if positions is None:
+			positions = self._rng.integers(self._nE,size=size)
+		positions = np.array(positions,dtype=np.int64,ndmin=1)
+
+		if (genes.shape != (size,9)) | (positions.shape != (size,)):
+			raise ValueError('The size parameter must be equal to the number of genes and positions given.')
+
+		self._set_animals(self._clamp(genes),positions)
+
+	@classmethod
+	def from_state(cls,state,rng=None,constants=None):
+		"""Creates a population from a dict returned by state(). If rng is given, the population continues
+		with this random stream, otherwise the stored random state is restored."""
+		population = cls(len(state["genes"]),state["genes"],state["position"],rng,constants)
+		population._insulation[:] 	= state["insulation"]
+		population._mismatch[:] 	= state["mismatch"]
+		population._adjustments[:] 	= state["adjustments"]
+		population._migrations[:] 	= state["migrations"]
+		population._set_primed(state["primed"])
+		population._positions 		= np.array(state["counts"],dtype=np.int64)
+		random_state = state["random_state"]
+		if (rng is None) & ("key" in random_state):
+			population._rng.bit_generator.state = random_state["population"]
+			population._key = np.uint64(random_state["key"])
+			population._calls = random_state["calls"]
+		return population
+
+	def state(self):
+		"""Returns the full state of the population as a dict, e.g. for checkpoints"""
+		return {"genes":self._genes,"position":self._position,"insulation":self._insulation,
+			"mismatch":self._mismatch,"adjustments":self._adjustments,"migrations":self._migrations,
+			"primed":self._primed_flags(),"counts":self._positions,
+			"random_state":{"population":self._rng.bit_generator.state,"key":self._key,"calls":self._calls}}
+
+	def genes(self):
+		"""Returns an array of shape (size,9) containing the genes of every animal"""
+		return self._genes
+
+	def animal_positions(self):
+		"""Returns an array containing the position of every animal"""
+		return self._position
+
+	def size(self):
+		"""Returns the current size of the population"""
+		return self._size
+
+	def react(self,E,C,evolve_all=False):
+		"""Calculates the insulation of each animal in the Population based on cue C and environment E.
+		The number of animals in each environment is updated as they migrate."""
+		react_population(self._genes,self._position,self._insulation,self._mismatch,self._adjustments,\
+			self._migrations,self._primed,_block(E),_block(C),self._key,self._calls,evolve_all,\
+			self._constants["threads"],self._topology)
+		self._calls += 1
+		if self._nE > 1:
+			self._positions = self.positions()
+
+	def react_lifetime(self,E_block,C_block):
+		"""Lets every animal live through all time steps of E_block and C_block (shape (steps,nE)), as steps calls of
+		react. Animals that can neither react nor migrate keep their insulation and position, so their mismatch of all
+		steps is added at once. The other animals live through all steps in a single pass of the react kernel."""
+		E_block, C_block = _block(E_block), _block(C_block)
+		active = (self._genes[:,2] > 0) | ((self._genes[:,8] > 0) & (self._nE > 1))
+		settle_population(self._insulation,self._position,self._mismatch,np.flatnonzero(~active),E_block,\
+			self._constants["threads"])
+		react_population(self._genes,self._position,self._insulation,self._mismatch,self._adjustments,\
+			self._migrations,self._primed,E_block,C_block,self._key,self._calls,False,self._constants["threads"],\
+			self._topology,np.flatnonzero(active))
+		self._calls += len(E_block)
+		if self._nE > 1:
+			self._positions = self.positions()
+
+	def lifetime_payoff(self):
+		"""Assembles the lifetime payoff of every animal"""
+		constants = self._constants
+		payoff = np.exp(-constants["tau"]*self._mismatch) - constants["km"]*self._migrations
+		plastic = self._genes[:,1] > 0.5
+		payoff[plastic] -= constants["kd"] + constants["ka"]*self._adjustments[plastic]
+		return self._scale_factor() * np.maximum(payoff,0)
+
+	def breed_constant(self):
+		"""Iterates the entire Population to a new generation, calculating the number of offspring of each animal with CONSTANT population size"""
+		lifetime_payoff = self.lifetime_payoff()
+		mean_payoff 	= np.mean(lifetime_payoff)
+
+		if (mean_payoff == 0):
+			raise RuntimeError("Mean payoff of population decreased to 0. Check your parameters!")
+		else:
+			payoff_factor = lifetime_payoff/mean_payoff
+
+		population_size = self._constants["population_size"]
+		if self._constants["resampling"] != "poisson":
+			# exactly population_size offspring
+			parents = resample(self._constants["resampling"],lifetime_payoff,population_size,self._rng)
+			if self._constants["verbose"]:
+				print("\n\nAnimals per environment: {0}".format(self._positions))
+				print("Mean payoff: {0:.2f}".format(mean_payoff))
+			self._set_animals(self._mutate(parents),self._position[parents])
+			return
+
+		offspring = self._rng.poisson(lam=payoff_factor)
+		parents = np.repeat(np.arange(self._size),offspring)
+
+		N = len(parents)
+		if self._constants["verbose"]:
+			print("\n\nAnimals per environment: {0}".format(self._positions))
+			print("Population size: {0}\tMean payoff: {1:.2f}".format(N,mean_payoff))
+		if (N > population_size):
+			parents = parents[self._rng.choice(N,population_size,replace=False)]
+
+		genes = self._mutate(parents)
+		positions = self._position[parents]
+
+		if (N < population_size): # clone random offspring without mutation
+			clones = self._rng.choice(N,population_size - N)
+			genes = np.concatenate((genes,genes[clones]))
+			positions = np.concatenate((positions,positions[clones]))
+
+		self._set_animals(genes,positions)
+
+	def breed_variable(self):
+		"""Iterates the entire Population to a new generation, calculating the number of offspring of each animal with VARIABLE population size"""
+		lifetime_payoff = self.lifetime_payoff()
+		max_payoff 	= 1/self._constants["q"]
+		payoff_factor 	= lifetime_payoff/max_payoff
+		offspring 	= self._rng.poisson(lam=payoff_factor)
+		parents 	= np.repeat(np.arange(self._size),offspring)
+
+		N = len(parents)
+		if N == 0: # all animals are dead
+			self._set_animals(np.empty((0,9)),np.empty(0))
+			return
+
+		population_size = self._constants["population_size"]
+		if self._constants["verbose"]:
+			print("\n\nAnimals per environment: {0}".format(self._positions))
+			print("Population size: {0}".format(N))
+		if (N > population_size):
+			parents = parents[self._rng.choice(N,population_size,replace=False)]
+
+		self._set_animals(self._mutate(parents),self._position[parents])
+
+	def positions(self):
+		"""Returns the number of animals in each environment"""
+		return np.bincount(self._position,minlength=self._nE)
+
+	def _scale_factor(self):
+		"""Returns the factor of the lifetime payoff of every animal due to crowding of its environment"""
+		if self._nE > 1:
+			return 1 - self._positions[self._position] / float(self._constants["population_size"])
+		return 1
+
+	def _mutate(self,parents):
+		"""Returns the mutated and clamped genes of the offspring of the given parent indices"""
+		genes = self._genes[parents]
+		mu = self._constants["mu"]
+		mutating = self._rng.random(genes.shape) <= mu
+
+		mutating[:,_CONDITIONAL_GENES] = False
+		genes[mutating] += self._rng.normal(loc=0,scale=0.05,size=np.count_nonzero(mutating))
+
+		# genes only relevant to plastic animals mutate if s > 0.5, and are zero otherwise
+		plastic = genes[:,1] > 0.5
+		mutating = self._rng.random((len(parents),len(_CONDITIONAL_GENES))) <= mu
+		mutating &= plastic[:,np.newaxis]
+		conditional = genes[:,_CONDITIONAL_GENES]
+		conditional[mutating] += self._rng.normal(loc=0,scale=0.05,size=np.count_nonzero(mutating))
+		conditional[~plastic] = 0
+		genes[:,_CONDITIONAL_GENES] = conditional
+
+		return self._clamp(genes)
+
+	def _clamp(self,genes):
+		"""Limits the genes given in constants["limit"] to [0,1]"""
+		genes[:,self._limit] = np.clip(genes[:,self._limit],0,1)
+		return genes
+
+	def _set_animals(self,genes,positions):
+		"""Replaces all animals by newborn ones with the given genes and positions"""
+		self._size 		= len(genes)
+		self._genes 		= np.ascontiguousarray(genes,dtype=self._float)
+		self._position 		= np.ascontiguousarray(positions,dtype=self._int)
+		self._insulation 	= self._genes[:,3].copy()
+		self._mismatch 		= np.zeros(self._size,dtype=self._float)
+		self._adjustments 	= np.zeros(self._size,dtype=self._int)
+		self._migrations 	= np.zeros(self._size,dtype=self._int)
+		self._set_primed(self._rng.random(self._size) > self._genes[:,0])
+		self._positions 	= self.positions()
+
+	def _set_primed(self,primed):
+		"""Stores the primed flag of every animal, packed into bits in compact precision"""
+		primed = np.asarray(primed,dtype=np.uint8)
+		self._primed = np.packbits(primed) if self._packed else np.ascontiguousarray(primed)
+
+	def _primed_flags(self):
+		"""Returns the primed flag of every animal, one byte per animal"""
+		return np.unpackbits(self._primed,count=self._size) if self._packed else self._primed
+
+
+def _block(E):
+	"""Returns the environment or cue of one time step (shape (nE,)) or of several (shape (steps,nE))
+	as a contiguous array of shape (steps,nE)"""
+	return np.ascontiguousarray(np.atleast_2d(E),dtype=np.float64)
+
+
+# Genes that are forced to zero for non-plastic animals (a, b, bp, ma)
+_CONDITIONAL_GENES = [2,5,6,8]
+
+
+def random_genes(size,rng):
+	"""Returns an array of shape (size,9) of random genes in the chosen intervals:
+	h: 1, s: [0,1], a: [0,1], I0: [-1,1], I0p: [-1,1], b: [-2,2], bp: [-2,2], m: 0, ma: 0"""
+	rand_genes = np.array([0,1,1,2,2,4,4,0,0])*rng.random((size,9)) + np.array([1,0,0,-1,-1,-2,-2,0,0])
+	rand_genes[np.ix_(rand_genes[:,1] <= 0.5,_CONDITIONAL_GENES)] = 0
+	return rand_genes
+
+
+def state_types(precision):
+	"""Returns the floating point and integer types of the state arrays in the given precision"""
+	if precision == "double":
+		return np.float64, np.int64
+	if precision == "compact":
+		return np.float32, np.int16
+	raise ValueError("Unknown precision {0}!".format(precision))
+
+
+def limit_mask(limit):
+	"""Returns a boolean mask of the genes that are limited to [0,1]"""
+	if isinstance(limit,str):
+		limit = [limit]
+	names = []
+	for entry in limit: # command line arguments arrive as nested lists
+		if isinstance(entry,str):
+			names.append(entry)
+		else:
+			names.extend(entry)
+	return np.array([gene in names for gene in GENE_NAMES])
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	batch_population.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Implements BatchPopulation class, which simulates
+#	many independent replicates of a population in one
+#	array layout (sorted by replicate), such that every
+#	step is a single call for all replicates
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+from constants import model_constants # Import model constants
+from array_population import ArrayPopulation
+from gene_statistics import GeneStatistics
+from reproduction import resample
+
+
+class BatchPopulation(ArrayPopulation):
+	def __init__(self,replicates,genes=None,positions=None,replica=None,rng=None,constants=None):
+		"""Takes the number of replicates and optionally arrays holding the genes (shape (size,9)), position
+		and replicate of every animal, sorted by replicate. If no genes are given, every replicate starts with
+		population_size random animals. rng is the random stream of the whole batch."""
+		constants = constants if constants is not None else model_constants
+		self._replicates = int(replicates)
+		if replica is None:
+			if genes is not None:
+				raise ValueError('The replicate of every animal must be given along with its genes.')
+			replica = np.repeat(np.arange(self._replicates),constants["population_size"])
+		self._replica = np.ascontiguousarray(replica,dtype=np.int64)
+		self._alive = np.ones(self._replicates,dtype=bool)
+		ArrayPopulation.__init__(self,len(self._replica),genes,positions,rng,constants)
+
+	@classmethod
+	def tiled(cls,state,replicates,rng=None,constants=None):
+		"""Creates replicates copies of the population given by a dict returned by state() of a
+		Population or ArrayPopulation, e.g. from a checkpoint"""
+		size = len(state["genes"])
+		tile = lambda x: np.tile(np.asarray(x),(replicates,)+(1,)*(np.ndim(x)-1))
+		population = cls(replicates,tile(state["genes"]),tile(state["position"]),\
+				np.repeat(np.arange(replicates),size),rng,constants)
+		population._insulation[:] 	= tile(state["insulation"])
+		population._mismatch[:] 	= tile(state["mismatch"])
+		population._adjustments[:] 	= tile(state["adjustments"])
+		population._migrations[:] 	= tile(state["migrations"])
+		population._set_primed(tile(state["primed"]))
+		return population
+
+	def replicates(self):
+		"""Returns the number of replicates"""
+		return self._replicates
+
+	def alive(self):
+		"""Returns a boolean array telling which replicates are still alive"""
+		return self._alive.copy()
+
+	def stop(self,replicates):
+		"""Removes the given replicates from the batch, their animals have no offspring"""
+		self._alive[np.asarray(replicates,dtype=np.int64)] = False
+
+	def sizes(self):
+		"""Returns the number of animals of every replicate"""
+		return np.bincount(self._replica,minlength=self._replicates)
+
+	def positions(self):
+		"""Returns the number of animals in each environment as an array of shape (replicates,nE)"""
+		return np.bincount(self._replica*self._nE+self._position,\
+				minlength=self._replicates*self._nE).reshape(self._replicates,self._nE)
+
+	def statistics(self):
+		"""Returns the number of animals in each environment, and the gene means and standard deviations
+		in each environment, as arrays of shape (replicates,nE) and (replicates,nE,9)"""
+		statistics = GeneStatistics(self._replicates*self._nE)
+		statistics.add(self._genes,self._replica*self._nE+self._position)
+		shape = (self._replicates,self._nE)
+		return statistics.counts.reshape(shape), statistics.mean.reshape(shape+(9,)),\
+				statistics.std.reshape(shape+(9,))
+
+	def replicate(self,r):
+		"""Returns a view of replicate r, which provides genes() and animal_positions()"""
+		start, end = np.searchsorted(self._replica,[r,r+1])
+		return _Replicate(self._genes[start:end],self._position[start:end])
+
+	def breed_constant(self):
+		"""Iterates all replicates to a new generation with CONSTANT population size. Replicates whose mean
+		payoff decreased to 0 are removed, their indices are returned."""
+		lifetime_payoff = self.lifetime_payoff()
+		sizes = self.sizes()
+		mean_payoff = np.bincount(self._replica,weights=lifetime_payoff,minlength=self._replicates)\
+				/ np.maximum(sizes,1)
+		failed = np.flatnonzero(self._alive & (mean_payoff == 0))
+		self._alive[failed] = False
+
+		population_size = self._constants["population_size"]
+		if self._constants["verbose"]:
+			print("\n\nAnimals per environment: {0}".format(self._positions))
+			print("Mean payoff: {0}".format(mean_payoff))
+		if self._constants["resampling"] != "poisson":
+			# exactly population_size offspring in every replicate
+			starts = np.concatenate(([0],np.cumsum(sizes)))
+			parents = [starts[r] + resample(self._constants["resampling"],lifetime_payoff[starts[r]:starts[r+1]],\
+					population_size,self._rng) for r in np.flatnonzero(self._alive)]
+			parents = np.concatenate(parents+[np.zeros(0,dtype=np.int64)])
+			self._set_animals(self._mutate(parents),self._position[parents],self._replica[parents])
+			return failed
+
+		payoff_factor = np.zeros(self._size)
+		alive = self._alive[self._replica]
+		payoff_factor[alive] = lifetime_payoff[alive] / mean_payoff[self._replica[alive]]
+		offspring = self._rng.poisson(lam=payoff_factor)
+		parents = self._trim(np.repeat(np.arange(self._size),offspring))
+
+		genes = self._mutate(parents)
+		positions = self._position[parents]
+		replica = self._replica[parents]
+
+		# replicates without any offspring fail as well
+		N = np.bincount(replica,minlength=self._replicates)
+		empty = np.flatnonzero(self._alive & (N == 0))
+		self._alive[empty] = False
+		failed = np.union1d(failed,empty)
+
+		# clone random offspring of the same replicate without mutation
+		missing = np.where(self._alive,population_size - N,0)
+		if np.any(missing > 0):
+			clone_replica = np.repeat(np.arange(self._replicates),np.maximum(missing,0))
+			starts = np.cumsum(N) - N
+			clones = starts[clone_replica] + (self._rng.random(len(clone_replica))*N[clone_replica]).astype(np.int64)
+			order = np.argsort(np.concatenate((replica,clone_replica)),kind="stable")
+			genes = np.concatenate((genes,genes[clones]))[order]
+			positions = np.concatenate((positions,positions[clones]))[order]
+			replica = np.concatenate((replica,clone_replica))[order]
+
+		self._set_animals(genes,positions,replica)
+		return failed
+
+	def breed_variable(self):
+		"""Iterates all replicates to a new generation with VARIABLE population size. Replicates that
+		have no offspring died out, their indices are returned."""
+		lifetime_payoff = self.lifetime_payoff()
+		max_payoff 	= 1/self._constants["q"]
+		payoff_factor 	= lifetime_payoff/max_payoff
+		payoff_factor[~self._alive[self._replica]] = 0 # stopped replicates have no offspring
+		offspring 	= self._rng.poisson(lam=payoff_factor)
+		parents 	= self._trim(np.repeat(np.arange(self._size),offspring))
+
+		died = np.flatnonzero(self._alive & (np.bincount(self._replica[parents],minlength=self._replicates) == 0))
+		self._alive[died] = False
+
+		if self._constants["verbose"]:
+			print("\n\nAnimals per environment: {0}".format(self._positions))
+			print("Population sizes: {0}".format(np.bincount(self._replica[parents],minlength=self._replicates)))
+		self._set_animals(self._mutate(parents),self._position[parents],self._replica[parents])
+		return died
+
+	def _trim(self,parents):
+		"""Returns the parents (sorted by replicate) of at most population_size randomly chosen offspring per replicate"""
+		population_size = self._constants["population_size"]
+		replica = self._replica[parents]
+		N = np.bincount(replica,minlength=self._replicates)
+		if np.all(N <= population_size):
+			return parents
+		order = np.lexsort((self._rng.random(len(parents)),replica))
+		rank = np.arange(len(parents)) - (np.cumsum(N) - N)[replica[order]]
+		return parents[order[rank < population_size]]
+
+	def _scale_factor(self):
+		"""Returns the factor of the lifetime payoff of every animal due to crowding of its environment in its replicate"""
+		if self._nE > 1:
+			return 1 - self._positions[self._replica,self._position] / float(self._constants["population_size"])
+		return 1
+
+	def _set_animals(self,genes,positions,replica=None):
+		"""Replaces all animals by newborn ones with the given genes, positions and replicates"""
+		if replica is not None:
+			self._replica = np.ascontiguousarray(replica,dtype=np.int64)
+		ArrayPopulation._set_animals(self,genes,positions)
+
+
+class _Replicate:
+	"""Genes and positions of the animals of one replicate, as needed for plots"""
+	def __init__(self,genes,positions):
+		self._genes = genes
+		self._positions = positions
+
+	def genes(self):
+		return self._genes
+
+	def animal_positions(self):
+		return self._positions
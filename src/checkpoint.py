@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	checkpoint.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Writes and reads binary checkpoints (.npz) holding
+#	the full state of a population, such that runs can
+#	be resumed or started from an exact population
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import json
+import os
+
+from constants import model_constants
+from population import Population
+from array_population import ArrayPopulation
+import random_streams
+
+
+def save_checkpoint(filename,population,generation,t,environments,rows=()):
+	"""Writes the state of population at the start of the given generation and time t, together with
+	the parameters of the environments, the base seed and the rows of gene statistics that are not
+	written yet (see output_store.DecimatedWriter.buffered), to filename"""
+	state = population.state()
+	state["random_state"] = json.dumps(state["random_state"],default=_to_json)
+	state["environments"] = np.array([[env.R,env.P,env.A,env.B,env.O] for env in environments])
+	state["generation"], state["t"] = generation, t
+	state["seed"] = str(random_streams.get_seed())
+	if len(rows) > 0:
+		for (i,name) in enumerate(["generation","mean","std","sizes"]):
+			state["output_"+name] = np.array([row[i] for row in rows])
+
+	# write to a temporary file first, such that a crash never leaves a broken checkpoint behind
+	with open(filename+".tmp","wb") as f:
+		np.savez(f,**state)
+	os.replace(filename+".tmp",filename)
+
+
+def load_checkpoint(filename,rng=None,backend=None,constants=None):
+	"""Reads a checkpoint and returns the population (of the given backend, default: constants["backend"]),
+	the generation and time it was written at, and the parameters of the environments.
+	If rng is given, the population continues with this random stream instead of the stored one."""
+	if constants is None:
+		constants = model_constants
+	if backend is None:
+		backend = constants["backend"]
+
+	with np.load(filename) as data:
+		state = dict((key,data[key]) for key in data.files)
+	state["random_state"] = json.loads(str(state["random_state"]))
+
+	if backend == "array":
+		population = ArrayPopulation.from_state(state,rng,constants)
+	else:
+		population = Population.from_state(state,rng,constants)
+
+	return population, int(state["generation"]), state["t"].item(), state["environments"].tolist()
+
+
+def checkpoint_seed(filename):
+	"""Returns the base seed of the random streams stored in a checkpoint"""
+	with np.load(filename) as data:
+		return int(str(data["seed"]))
+
+
+def checkpoint_output(filename):
+	"""Returns the rows of gene statistics stored in a checkpoint, as (generation, mean, std, sizes)"""
+	with np.load(filename) as data:
+		if "output_generation" not in data.files:
+			return []
+		return list(zip(data["output_generation"].tolist(),data["output_mean"],data["output_std"],data["output_sizes"]))
+
+
+def _to_json(obj):
+	"""Converts NumPy arrays and scalars in random states to JSON"""
+	return obj.tolist()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	convergence.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Implements Convergence class, which keeps a window of
+#	the gene means and environment sizes of the last
+#	generations and tells when they became stationary, or
+#	when a population of variable size is saturated, such
+#	that a run may stop early
+#
+#	Usage:
+#		convergence = Convergence.of(constants,variable)
+#		reason = convergence.update(j,mean,sizes)
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import collections
+import json
+
+# Rules for stopping early
+RULES = ["none","drift","variance"]
+
+
+class Convergence:
+	def __init__(self,rule="none",window=100,tolerance=1E-2,min_generations=0,population_size=1,saturation=0):
+		"""Takes the stopping rule (a key of RULES), the number of generations in the window, the tolerance
+		of the rule and the number of generations that are run in any case. The sizes of the environments
+		are compared as fractions of population_size. If saturation > 0, a population stops as well once it
+		had population_size animals for saturation generations in a row."""
+		if rule not in RULES:
+			raise ValueError("Unknown stopping rule {0}!".format(rule))
+		if window < 2:
+			raise ValueError("The window of the stopping rule must hold at least 2 generations!")
+		self.rule = rule
+		self.tolerance = tolerance
+		self.min_generations = min_generations
+		self.saturation = saturation
+		self._population_size = float(population_size)
+		self._window = collections.deque(maxlen=window)
+		self._saturated = 0
+
+	@classmethod
+	def of(cls,constants,variable=False):
+		"""Returns the Convergence given by the model constants. Only populations of VARIABLE size saturate."""
+		return cls(constants["stop_rule"],constants["stop_window"],constants["stop_tolerance"],\
+				constants["stop_min"],constants["population_size"],constants["saturation_generations"] if variable else 0)
+
+	def update(self,j,mean,sizes):
+		"""Adds the gene means (shape (nE,9), NaN in empty environments) and the number of animals in each
+		environment of generation j. Returns the reason the run may stop at generation j (converged or
+		saturated), or None."""
+		sizes = np.asarray(sizes,dtype=np.float64)
+		if self.saturation > 0:
+			self._saturated = self._saturated+1 if np.sum(sizes) >= self._population_size else 0
+			if self._saturated >= self.saturation:
+				return "saturated"
+		if self.rule == "none":
+			return None
+		mean = np.where(sizes[:,np.newaxis] > 0,mean,0)
+		self._window.append(np.concatenate((mean.ravel(),sizes/self._population_size)))
+		if (j < self.min_generations) or (len(self._window) < self._window.maxlen):
+			return None
+		return "converged" if self.distance() < self.tolerance else None
+
+	def distance(self):
+		"""Returns the largest drift (difference of the means over the older and the newer half of the window)
+		or standard deviation within the window of all gene means and environment sizes"""
+		window = np.array(self._window)
+		if self.rule == "drift":
+			half = len(window)//2
+			return np.max(np.abs(np.mean(window[-half:],axis=0) - np.mean(window[:half],axis=0)))
+		return np.max(np.std(window,axis=0))
+
+
+def write_stop(filename,generation,reason):
+	"""Records the generation a population stopped at, and why (generations, converged, saturated or died out)"""
+	with open(filename,"w") as f:
+		json.dump({"generation":int(generation),"reason":reason},f)
+
+
+def read_stop(filename):
+	"""Returns the generation and reason written by write_stop"""
+	with open(filename) as f:
+		stop = json.load(f)
+	return stop["generation"], stop["reason"]
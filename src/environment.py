@@ -1,45 +1,157 @@
-#!/usr/bin/env python
-# -*- coding: utf8 -*-
-"""
-#########################################################
-#
-#	environment.py
-#	Author: Dion Häfner (dionhaefner@web.de)
-#	
-#	Implementing Environment class and methods
-#	
-#	Licensed under BSD 2-Clause License
-#
-#########################################################
-"""
-
-import numpy as np
-
-from constants import model_constants
-import numbers
-
-
-class Environment:
-	def __init__(self,R,P,A,B,O,name=""):
-		"""Creates an Environment instance with given properties"""
-		if (all(isinstance(x,numbers.Number) for x in [R,P,A,B,O])):
-			self.R = max(0,R)
-			self.P = max(0,min(P,1))
-			self.A = A
-			self.B = B
-			self.O = O
-			self.name = name
-			self._constants = model_constants
-		else:
-			raise TypeError('First five arguments must be numeric.')
-
-	def evaluate(self,t):
-		"""Returns environment value E and cue C for given time t"""
-		epsilon = np.random.normal(0,float(1)/3)
-		E = self.A * np.sin(2 * np.pi / self._constants["L"] / self.R * t) + self.B * epsilon + self.O
-		mu, sigma = self.P*(E-self.O), float(1-self.P)/3
-		if (sigma <= 0):
-			C = mu
-		else:
-			C = np.random.normal(mu,sigma)
-		return E,C
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	environment.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#	
+#	Implementing Environment class and methods
+#	
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+from constants import model_constants
+import random_streams
+import numbers
+import os
+
+# Number of time steps of a block of the trace, which are drawn at once
+TRACE_BLOCK = 4096
+
+
+class Environment:
+	def __init__(self,R,P,A,B,O,name="",rng=None,constants=None):
+		"""Creates an Environment instance with given properties, drawing from the random stream rng.
+		constants are the ModelConstants of the model (default: model_constants)."""
+		if (all(isinstance(x,numbers.Number) for x in [R,P,A,B,O])):
+			self.R = max(0,R)
+			self.P = max(0,min(P,1))
+			self.A = A
+			self.B = B
+			self.O = O
+			self.name = name
+			self._constants = constants if constants is not None else model_constants
+			self._trace = None
+			self._rng = rng if rng is not None else random_streams.default_stream()
+			# every block of the trace is drawn from its own counter range of a Philox generator with this key
+			self._key = self._rng.integers(2**64,size=2,dtype=np.uint64)
+			self._block = None
+		else:
+			raise TypeError('First five arguments must be numeric.')
+
+	def evaluate(self,t):
+		"""Returns environment value E and cue C for given time t"""
+		E, C = self.evaluate_many(np.array([t]))
+		return E[0],C[0]
+
+	def evaluate_many(self,t):
+		"""Returns arrays of environment values E and cues C for an array of times t.
+		Times covered by a precomputed trace are read from it, all others are drawn (see _draw)."""
+		t = np.asarray(t,dtype=float)
+		if self._trace is None:
+			return self._draw(t)
+
+		index = np.rint(t - self._trace[0,0]).astype(int)
+		covered = (index >= 0) & (index < self._trace.shape[1])
+		if covered.all():
+			return self._trace[1,index], self._trace[2,index]
+		E, C = self._draw(t)
+		E[covered], C[covered] = self._trace[1,index[covered]], self._trace[2,index[covered]]
+		return E,C
+
+	def precompute(self,t_start,t_end,filename=None):
+		"""Computes the trace of E and C for all time steps in [t_start,t_end), such that later evaluations in this
+		range read it instead of drawing it again. If filename is given, the trace is stored in a memory-mapped .npy
+		file, or read from it if it already contains the same time steps and was drawn with the same parameters,
+		seed and random stream (stored in a companion _parameters.npz file). Otherwise, the trace is kept in memory."""
+		t = t_start + np.arange(int(t_end - t_start),dtype=float)
+		key = self._cache_key()
+
+		if filename is not None and os.path.isfile(filename) and self._cached(filename,key):
+			trace = np.load(filename,mmap_mode='r')
+			if (trace.shape == (3,len(t))) and (len(t) == 0 or trace[0,0] == t_start):
+				self._trace = trace
+				return
+
+		if filename is not None:
+			trace = np.lib.format.open_memmap(filename,mode='w+',dtype=np.float64,shape=(3,len(t)))
+		else:
+			trace = np.empty((3,len(t)))
+		trace[0] = t
+		for start in range(0,len(t),TRACE_BLOCK):
+			trace[1:,start:start+TRACE_BLOCK] = self._draw(t[start:start+TRACE_BLOCK])
+
+		if filename is not None:
+			trace.flush()
+			# written last, such that an interrupted trace is never reused
+			np.savez(_parameter_file(filename),**key)
+		self._trace = trace
+
+	def _cache_key(self):
+		"""Returns everything a trace depends on besides its time steps"""
+		return {"parameters":np.array([self.R,self.P,self.A,self.B,self.O,self._constants["L"],TRACE_BLOCK],dtype=float),\
+				"seed":np.array(str(random_streams.get_seed())),"stream":self._key}
+
+	def _cached(self,filename,key):
+		"""Returns whether the trace stored in filename was drawn with the given cache key"""
+		if not os.path.isfile(_parameter_file(filename)):
+			return False
+		with np.load(_parameter_file(filename)) as stored:
+			return all(name in stored and np.array_equal(stored[name],key[name]) for name in key)
+
+	def _draw(self,t):
+		"""Returns E and C for an array of times t, taken from the blocks of TRACE_BLOCK time steps that hold them.
+		Every time step has the same values however it is evaluated, so the trace never has to be kept as a whole."""
+		step = np.rint(t).astype(np.int64)
+		block = step // TRACE_BLOCK
+		E, C = np.empty(t.shape), np.empty(t.shape)
+		for b in np.unique(block):
+			where = (block == b)
+			E_block, C_block = self._draw_block(b)
+			E[where], C[where] = E_block[step[where]-b*TRACE_BLOCK], C_block[step[where]-b*TRACE_BLOCK]
+		return E,C
+
+	def _draw_block(self,b):
+		"""Returns E and C of block b of the trace, drawing it unless it is the last block drawn"""
+		if (self._block is None) or (self._block[0] != b):
+			rng = np.random.Generator(np.random.Philox(key=self._key,counter=[0,0,0,int(b) % 2**64]))
+			t = b*TRACE_BLOCK + np.arange(TRACE_BLOCK,dtype=float)
+			epsilon = rng.normal(0,float(1)/3,size=t.shape)
+			E = self.A * np.sin(2 * np.pi / self._constants["L"] / self.R * t) + self.B * epsilon + self.O
+			mu, sigma = self.P*(E-self.O), float(1-self.P)/3
+			if (sigma <= 0):
+				C = mu
+			else:
+				C = rng.normal(mu,sigma)
+			self._block = (b,E,C)
+		return self._block[1], self._block[2]
+
+	def __getstate__(self):
+		"""Memory-mapped traces are passed on by their file name (e.g. to worker processes) instead of being copied"""
+		state = self.__dict__.copy()
+		state["_block"] = None
+		if isinstance(self._trace,np.memmap):
+			state["_trace"] = self._trace.filename
+		return state
+
+	def __setstate__(self,state):
+		self.__dict__.update(state)
+		if isinstance(self._trace,str):
+			self._trace = np.load(self._trace,mmap_mode='r')
+
+def _parameter_file(filename):
+	"""Returns the file the cache key of the trace in filename is stored in"""
+	return os.path.splitext(filename)[0]+"_parameters.npz"
+
+
+def evaluate_all(environments,t):
+	"""Returns arrays E and C of shape (len(t),len(environments)) for a list of environments and an array of times t"""
+	E, C = np.empty((len(t),len(environments))), np.empty((len(t),len(environments)))
+	for (i,env) in enumerate(environments):
+		E[:,i], C[:,i] = env.evaluate_many(t)
+	return E,C
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	gene_statistics.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Implements GeneStatistics class, which accumulates
+#	the number of animals and the mean and variance of
+#	every gene in each environment in grouped passes
+#	over the gene array, without per-environment copies
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+# Number of animals whose genes are converted to double precision at once
+CHUNK_SIZE = 2**20
+
+
+class GeneStatistics:
+	def __init__(self,nE,nG=9,extrema=False):
+		"""Takes the number of environments and genes. If extrema is True, the minimum and
+		maximum of every gene in each environment are accumulated as well."""
+		self.counts 	= np.zeros(nE,dtype=np.int64)
+		self._mean 	= np.zeros((nE,nG))
+		self._m2 	= np.zeros((nE,nG))
+		self._extrema 	= extrema
+		if extrema:
+			self.minimum = np.full((nE,nG),np.inf)
+			self.maximum = np.full((nE,nG),-np.inf)
+
+	@classmethod
+	def of(cls,population,nE,extrema=False):
+		"""Returns the statistics of all animals of a Population or ArrayPopulation"""
+		statistics = cls(nE,extrema=extrema)
+		statistics.add(population.genes(),population.animal_positions())
+		return statistics
+
+	def add(self,genes,positions):
+		"""Adds animals given by an array of shape (size,nG) of genes and the position of every animal.
+		The batch is reduced with weighted bincounts and merged into the totals by the pairwise
+		update of Chan et al., such that populations may also be added in chunks. Large batches
+		are split into chunks of CHUNK_SIZE animals."""
+		nG = self._mean.shape[1]
+		genes, positions = np.asarray(genes).reshape(-1,nG), np.asarray(positions)
+		for start in range(0,max(len(genes),1),CHUNK_SIZE):
+			self._add_chunk(genes[start:start+CHUNK_SIZE],positions[start:start+CHUNK_SIZE])
+
+	def _add_chunk(self,genes,positions):
+		nE, nG = self._mean.shape
+		genes = np.asarray(genes,dtype=np.float64)
+		positions = np.asarray(positions,dtype=np.int64)
+
+		counts = np.bincount(positions,minlength=nE)
+		present = counts > 0
+		mean = self._grouped_sum(genes,positions)
+		mean[present] /= counts[present,np.newaxis]
+		m2 = self._grouped_sum((genes-mean[positions])**2,positions)
+
+		total = self.counts + counts
+		delta = mean - self._mean
+		weight = np.zeros(nE)
+		weight[present] = counts[present] / total[present].astype(np.float64)
+		self._m2 += m2 + delta**2 * (self.counts*weight)[:,np.newaxis]
+		self._mean += delta * weight[:,np.newaxis]
+		self.counts = total
+
+		if self._extrema and len(positions):
+			order = np.argsort(positions,kind="stable")
+			starts = np.concatenate(([0],np.cumsum(counts)[:-1]))[present]
+			sorted_genes = genes[order]
+			self.minimum[present] = np.minimum(self.minimum[present],np.minimum.reduceat(sorted_genes,starts))
+			self.maximum[present] = np.maximum(self.maximum[present],np.maximum.reduceat(sorted_genes,starts))
+
+	@property
+	def mean(self):
+		"""Array of shape (nE,nG) holding the gene means (NaN in empty environments)"""
+		mean = self._mean.copy()
+		mean[self.counts == 0] = np.nan
+		return mean
+
+	@property
+	def variance(self):
+		"""Array of shape (nE,nG) holding the sample variance of the genes (NaN for less than two animals)"""
+		variance = np.full(self._m2.shape,np.nan)
+		valid = self.counts > 1
+		variance[valid] = self._m2[valid] / (self.counts[valid,np.newaxis]-1)
+		return variance
+
+	@property
+	def std(self):
+		"""Array of shape (nE,nG) holding the sample standard deviation of the genes"""
+		return np.sqrt(self.variance)
+
+	def _grouped_sum(self,values,positions):
+		"""Sums values of shape (size,nG) over all animals in the same environment, using a single bincount"""
+		nE, nG = self._mean.shape
+		index = positions[:,np.newaxis]*nG + np.arange(nG)
+		return np.bincount(index.ravel(),weights=values.ravel(),minlength=nE*nG).reshape(nE,nG)
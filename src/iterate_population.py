@@ -1,88 +1,273 @@
-#!/usr/bin/env python
-# -*- coding: utf8 -*-
-"""
-#########################################################
-#
-#   iterate_population.py
-#   Author: Dion Häfner (dionhaefner@web.de)
-#   
-#   Main controller for a given population
-#   
-#   Licensed under BSD 2-Clause License
-#
-#########################################################
-"""
-
-# Import third party libraries
-import numpy as np 
-import time
-import sys
-
-# Import other parts of the project
-from animal import Animal
-from population import Population
-from environment import Environment
-from constants import model_constants
-from output_population import output_population, plot_size
-
-
-def iterate_population(k,population,environments,f1,f2,path,t=0,variable=False):
-    """ 
-    MAIN CONTROLLER
-    Inputs:
-        k: population counter,  population: the Population instance to be iterated,
-        environments: Environment instances to be operated on,
-        f1: pointer to output file for gene means,  f2: for gene standard deviations,
-        path: path to the output files  t: initial time,   
-        variable: variable population size
-    """
-
-    constants = model_constants
-    nE = len(environments)
-
-    for j in np.arange(constants["generations"]):
-        # MAIN TIME STEP LOOP
-        start = time.clock()
-
-        output_population(population,f1,f2,j,k,path,False,t,environments)
-
-        for _ in range(constants["L"]):
-            E, C = np.empty(nE), np.empty(nE)
-
-            for (i,env) in enumerate(environments):
-                E[i], C[i] = env.evaluate(t)
-
-            population.react(E,C)
-            t = t+1
-
-        if variable:
-            population.breed_variable()
-        else:
-            population.breed_constant()
-
-        if population.size() == 0:
-            print("Population died out!\n\n")
-            return None, None, j
-
-        population.react(E,C,1)
-
-        end = time.clock()
-        if constants["verbose"]:
-            print("Computation time: {0:.2e}s".format(end-start))
-
-	    # Print progress bar
-        percent = float(j+1) / constants["generations"]
-        hashes = '#' * int(round(percent * 20))
-        spaces = ' ' * (20 - len(hashes))
-        sys.stdout.write("\rProgress population {2} of {3}: [{0}] {1:.1f}%".format(hashes + spaces, percent * 100,k+1,constants["populations"]))
-        sys.stdout.flush()
-
-
-    # Final outputs for each population
-    final_mean, final_std = output_population(population,f1,f2,j,k,path,True,t,environments)
-    f1.close()
-    f2.close()
-
-    plot_size(path,path+"pop"+str(k+1)+"_mean_genes.csv",k)
-
-    return final_mean, final_std, j
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#   iterate_population.py
+#   Author: Dion Häfner (dionhaefner@web.de)
+#   
+#   Main controller for a given population
+#   
+#   Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+# Import third party libraries
+import numpy as np 
+from timeit import default_timer as timer
+import sys
+import os
+import cProfile
+
+# Import other parts of the project
+from animal import Animal
+from population import Population
+from environment import Environment, evaluate_all
+from constants import model_constants
+from output_population import output_population, output_batch, plot_situation, plot_size
+from checkpoint import save_checkpoint
+from metrics import Metrics, phase
+from convergence import Convergence, write_stop
+
+
+def _dump_profile(profile,filename):
+    """Stops a running profile and writes it to filename; returns None"""
+    if profile is not None:
+        profile.disable()
+        profile.dump_stats(filename)
+
+
+def iterate_population(k,population,environments,output,path,t=0,variable=False,start_generation=0,plotter=None,constants=None):
+    """ 
+    MAIN CONTROLLER
+    Inputs:
+        k: population counter,  population: the Population instance to be iterated,
+        environments: Environment instances to be operated on,
+        output: writer of the gene statistics (see output_store),
+        path: path to the output files  t: initial time,   
+        variable: variable population size,  start_generation: first generation (when resuming),
+        plotter: Plotter the plots are handed to (default: render immediately),
+        constants: ModelConstants of the run (default: model_constants)
+    """
+
+    if constants is None:
+        constants = model_constants
+    nE = len(environments)
+    checkpoint_file = path+"pop"+str(k+1)+"_checkpoint.npz"
+    stop_file = path+"pop"+str(k+1)+"_stop.json"
+    convergence = Convergence.of(constants,variable)
+    stopped = None
+
+    # per-phase metrics of every generation, and an optional profile of a single generation
+    if constants["metrics"] in ["time","memory"]:
+        metrics = Metrics(path+"pop"+str(k+1)+"_metrics.jsonl",constants["metrics"] == "memory",start_generation).activate()
+    else:
+        metrics = Metrics().activate()
+    profile, profile_file = None, None
+
+    try:
+        for j in np.arange(start_generation,constants["generations"]):
+            # MAIN TIME STEP LOOP
+            start = timer()
+            animals = population.size()
+
+            if (constants["profile_generation"] > 0) and (j == constants["profile_generation"]):
+                profile, profile_file = cProfile.Profile(), path+"pop"+str(k+1)+"_generation_"+str(j)+".prof"
+                profile.enable()
+
+            if (constants["checkpoint_every"] > 0) and (j % constants["checkpoint_every"] == 0) and (j != start_generation):
+                with phase("checkpoint"):
+                    # all output up to here must be on disk, since it is kept when resuming, or in the checkpoint
+                    output.flush()
+                    metrics.flush()
+                    save_checkpoint(checkpoint_file,population,j,t,environments,output.buffered())
+
+            with phase("output"):
+                mean, std, nPerPos = output_population(population,output,j,k,path,False,t,environments,plotter,constants)
+                stopped = convergence.update(j,mean,nPerPos)
+
+            if stopped:
+                # the statistics of generation j are the final ones
+                metrics.end_generation(j,animals)
+                print("\nPopulation {0} {1} at generation {2}!\n".format(k+1,stopped,j))
+                break
+
+            with phase("environment"):
+                # environment and cue of all time steps of this generation
+                E_block, C_block = evaluate_all(environments,t+np.arange(constants["L"]))
+
+            with phase("react"):
+                population.react_lifetime(E_block,C_block)
+                t = t+constants["L"]
+
+            with phase("breed"):
+                if variable:
+                    population.breed_variable()
+                else:
+                    population.breed_constant()
+
+            if population.size() == 0:
+                print("Population died out!\n\n")
+                write_stop(stop_file,j,"died out")
+                metrics.end_generation(j,animals)
+                output.close()
+                return None, None, j, None
+
+            with phase("evolve"):
+                population.react(E_block[-1],C_block[-1],1)
+
+            metrics.end_generation(j,animals)
+            profile = _dump_profile(profile,profile_file)
+
+            end = timer()
+            if constants["verbose"]:
+                print("Computation time: {0:.2e}s".format(end-start))
+
+            # Print progress bar
+            percent = float(j+1) / constants["generations"]
+            hashes = '#' * int(round(percent * 20))
+            spaces = ' ' * (20 - len(hashes))
+            sys.stdout.write("\rProgress population {2} of {3}: [{0}] {1:.1f}%".format(hashes + spaces, percent * 100,k+1,constants["populations"]))
+            sys.stdout.flush()
+    finally:
+        # the profiled generation may end early, or the loop may break, return or fail in it
+        _dump_profile(profile,profile_file)
+        metrics.close()
+
+
+    # Final outputs for each population
+    if stopped:
+        final_mean, final_std, final_sizes = mean, std, nPerPos
+        plot_situation(t,population,environments,path+'timeseries/pop'+str(k+1)+'_genes_'+str(j)+'.png',plotter,constants)
+        write_stop(stop_file,j,stopped)
+    else:
+        final_mean, final_std, final_sizes = output_population(population,output,j,k,path,True,t,environments,plotter,constants)
+        write_stop(stop_file,j,"generations")
+
+    # the final population may be used as starting point of main_variable.py
+    if constants["checkpoint_every"] > 0:
+        save_checkpoint(path+"pop"+str(k+1)+"_final.npz",population,j if stopped else constants["generations"],t,environments)
+        if os.path.isfile(checkpoint_file):
+            os.remove(checkpoint_file)
+
+    plot_size(path,output.sizes(),k,plotter,constants)
+    output.close()
+
+    return final_mean, final_std, j, final_sizes
+
+
+def iterate_batch(ks,population,environments,outputs,path,t=0,variable=False,plotter=None,constants=None):
+    """
+    MAIN CONTROLLER of a BatchPopulation, which simulates the populations ks at once
+    Inputs:
+        ks: population counter of every replicate,  population: the BatchPopulation instance to be iterated,
+        outputs: writer of the gene statistics of every replicate (see output_store),
+        other inputs as in iterate_population
+    Returns the final gene means and standard deviations of every replicate (None if it died out, or with
+    CONSTANT population size if its mean payoff decreased to 0), the generation every replicate ended at,
+    and the final number of animals in each environment of every replicate.
+    """
+
+    if constants is None:
+        constants = model_constants
+    R = population.replicates()
+    final_gen = np.full(R,constants["generations"]-1)
+    final_mean, final_std, final_sizes = [None]*R, [None]*R, [None]*R
+    convergence = [Convergence.of(constants,variable) for r in range(R)]
+    stop_file = lambda r: path+"pop"+str(ks[r]+1)+"_stop.json"
+    name = "batch"+str(ks[0]+1)
+
+    if constants["metrics"] in ["time","memory"]:
+        metrics = Metrics(path+name+"_metrics.jsonl",constants["metrics"] == "memory").activate()
+    else:
+        metrics = Metrics().activate()
+    profile, profile_file = None, None
+
+    try:
+        for j in np.arange(constants["generations"]):
+            # MAIN TIME STEP LOOP
+            start = timer()
+            animals = population.size()
+
+            if (constants["profile_generation"] > 0) and (j == constants["profile_generation"]):
+                profile, profile_file = cProfile.Profile(), path+name+"_generation_"+str(j)+".prof"
+                profile.enable()
+
+            with phase("output"):
+                mean, std, nPerPos = output_batch(population,outputs,j,ks,path,False,t,environments,plotter,constants)
+                stopped = [(r,convergence[r].update(j,mean[r],nPerPos[r])) for r in np.flatnonzero(population.alive())]
+                stopped = [(r,reason) for (r,reason) in stopped if reason]
+
+            # the statistics of generation j are the final ones of stopped replicates, which are removed from the batch
+            for (r,reason) in stopped:
+                print("\nPopulation {0} {1} at generation {2}!\n".format(ks[r]+1,reason,j))
+                final_gen[r] = j
+                final_mean[r], final_std[r], final_sizes[r] = mean[r], std[r], nPerPos[r]
+                plot_situation(t,population.replicate(r),environments,path+'timeseries/pop'+str(ks[r]+1)+'_genes_'+str(j)+'.png',\
+                    plotter,constants)
+                plot_size(path,outputs[r].sizes(),ks[r],plotter,constants)
+                outputs[r].close()
+                write_stop(stop_file(r),j,reason)
+            population.stop([r for (r,_) in stopped])
+
+            if not np.any(population.alive()):
+                metrics.end_generation(j,animals)
+                break
+
+            with phase("environment"):
+                E_block, C_block = evaluate_all(environments,t+np.arange(constants["L"]))
+
+            with phase("react"):
+                population.react_lifetime(E_block,C_block)
+                t = t+constants["L"]
+
+            with phase("breed"):
+                if variable:
+                    ended = population.breed_variable()
+                else:
+                    ended = population.breed_constant()
+
+            for r in ended:
+                print("\nPopulation {0} died out!\n".format(ks[r]+1))
+                final_gen[r] = j
+                outputs[r].close()
+                write_stop(stop_file(r),j,"died out")
+
+            if not np.any(population.alive()):
+                metrics.end_generation(j,animals)
+                break
+
+            with phase("evolve"):
+                population.react(E_block[-1],C_block[-1],1)
+
+            metrics.end_generation(j,animals)
+            profile = _dump_profile(profile,profile_file)
+
+            end = timer()
+            if constants["verbose"]:
+                print("Computation time: {0:.2e}s".format(end-start))
+
+            # Print progress bar
+            percent = float(j+1) / constants["generations"]
+            hashes = '#' * int(round(percent * 20))
+            spaces = ' ' * (20 - len(hashes))
+            sys.stdout.write("\rProgress populations {2} to {3} of {4}: [{0}] {1:.1f}%".format(hashes + spaces, percent * 100,\
+                ks[0]+1,ks[-1]+1,constants["populations"]))
+            sys.stdout.flush()
+    finally:
+        # the profiled generation may end early, or the loop may break, return or fail in it
+        _dump_profile(profile,profile_file)
+        metrics.close()
+
+
+    # Final outputs for each living replicate
+    if np.any(population.alive()):
+        mean, std, sizes = output_batch(population,outputs,j,ks,path,True,t,environments,plotter,constants)
+        for r in np.flatnonzero(population.alive()):
+            final_mean[r], final_std[r], final_sizes[r] = mean[r], std[r], sizes[r]
+            plot_size(path,outputs[r].sizes(),ks[r],plotter,constants)
+            outputs[r].close()
+            write_stop(stop_file(r),j,"generations")
+
+    return final_mean, final_std, final_gen, final_sizes
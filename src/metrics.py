@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	metrics.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Records wall time, allocated memory and animals per
+#	second of every phase of every generation, and writes
+#	them to a JSON lines file next to the run output
+#
+#	Usage:
+#		metrics = Metrics(filename).activate()
+#		with phase("react"): ...
+#		metrics.end_generation(j,animals)
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import contextlib
+import json
+import os
+
+from timeit import default_timer as timer
+
+try:
+	import tracemalloc
+except ImportError: # Python 2
+	tracemalloc = None
+
+
+class Metrics:
+	def __init__(self,filename=None,memory=False,start_generation=0):
+		"""Appends the metrics of every generation from start_generation on to filename, discarding rows of later
+		generations that are already in it, e.g. of a failed attempt (nothing is recorded without a filename).
+		If memory is True, the memory allocated in every phase is traced as well, which slows down the run."""
+		if filename and os.path.isfile(filename):
+			_truncate(filename,start_generation)
+		self._file = open(filename,"a") if filename else None
+		self._memory = memory and (self._file is not None) and (tracemalloc is not None)
+		if self._memory and not tracemalloc.is_tracing():
+			tracemalloc.start()
+		self._phases = {}
+		self._nested = []
+
+	def activate(self):
+		"""Makes this the instance that phase() records to and returns it"""
+		global _active
+		_active = self
+		return self
+
+	@contextlib.contextmanager
+	def phase(self,name):
+		"""Context manager that records the enclosed code as phase name. Time spent in nested phases
+		is only counted for the innermost phase."""
+		if self._file is None:
+			yield
+			return
+
+		if self._memory:
+			memory_start = tracemalloc.get_traced_memory()[0]
+			if hasattr(tracemalloc,"reset_peak"):
+				tracemalloc.reset_peak()
+		self._nested.append(0.)
+		start = timer()
+		try:
+			yield
+		finally:
+			elapsed = timer() - start
+			nested = self._nested.pop()
+			if self._nested:
+				self._nested[-1] += elapsed
+
+			record = self._phases.setdefault(name,{"time":0.,"calls":0})
+			record["time"] += elapsed - nested
+			record["calls"] += 1
+			if self._memory:
+				current, peak = tracemalloc.get_traced_memory()
+				record["allocated"] = record.get("allocated",0) + current - memory_start
+				record["peak"] = max(record.get("peak",0),peak - memory_start)
+
+	def end_generation(self,generation,animals):
+		"""Writes the metrics of all phases of this generation, given the number of animals in it"""
+		if self._file is None:
+			return
+		for record in self._phases.values():
+			if record["time"] > 0:
+				record["animals_per_second"] = animals*record["calls"]/record["time"]
+		line = {"generation":int(generation),"animals":int(animals),
+			"time":sum(record["time"] for record in self._phases.values()),"phases":self._phases}
+		self._file.write(json.dumps(line,sort_keys=True)+"\n")
+		self._phases = {}
+
+	def flush(self):
+		if self._file is not None:
+			self._file.flush()
+
+	def close(self):
+		"""Closes the file and stops recording"""
+		global _active
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+		if _active is self:
+			_active = Metrics()
+
+
+def _truncate(filename,generation):
+	"""Removes all rows of generation >= generation from a metrics file, and a row that was not written completely"""
+	with open(filename) as f:
+		lines = [line for line in f if line.endswith("\n") and json.loads(line)["generation"] < generation]
+	with open(filename,"w") as f:
+		f.writelines(lines)
+
+
+def phase(name):
+	"""Records the enclosed code as phase name of the active Metrics instance (if any)"""
+	return _active.phase(name)
+
+
+_active = Metrics()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	migration.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Implements Topology class, which holds the probability
+#	of migrating from each environment to every other one
+#	as sparse rows, such that the migration targets of all
+#	animals are drawn in the population kernels
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+# Topologies that are given by their name, all others are read from a file
+TOPOLOGIES = ["full","ring","lattice"]
+
+
+class Topology:
+	def __init__(self,matrix,uniform=False):
+		"""Takes a matrix of shape (nE,nE) holding the (relative) probability of migrating from environment i
+		to environment j. Animals stay in an environment without any target, or if they draw their own
+		environment (a diagonal entry). If uniform is set,
+		the targets are drawn uniformly from all other environments without looking up the rows."""
+		matrix = np.array(matrix,dtype=np.float64,ndmin=2)
+		if (matrix.ndim != 2) | (matrix.shape[0] != matrix.shape[1]):
+			raise ValueError("Migration matrix must be square, got shape {0}!".format(matrix.shape))
+		if np.any(matrix < 0) | np.any(~np.isfinite(matrix)):
+			raise ValueError("Migration matrix must hold non-negative probabilities!")
+
+		self.nE = matrix.shape[0]
+		self.uniform = bool(uniform)
+		rows = [np.flatnonzero(row) for row in matrix]
+		self.indptr = np.concatenate(([0],np.cumsum([len(row) for row in rows]))).astype(np.int64)
+		self.targets = np.ascontiguousarray(np.concatenate(rows+[np.zeros(0)]),dtype=np.int64)
+		# cumulative probabilities within every row, for drawing targets by bisection
+		cumulative = [np.cumsum(matrix[i,row])/np.sum(matrix[i,row]) for (i,row) in enumerate(rows)]
+		self.cumulative = np.ascontiguousarray(np.concatenate(cumulative+[np.zeros(0)]),dtype=np.float64)
+
+	@classmethod
+	def full(cls,nE):
+		"""Migration to any other environment with equal probability"""
+		return cls(np.ones((nE,nE))-np.eye(nE),uniform=True)
+
+	@classmethod
+	def ring(cls,nE):
+		"""Migration to the two neighbouring environments on a ring"""
+		matrix = np.zeros((nE,nE))
+		for i in range(nE):
+			matrix[i,(i-1) % nE] = matrix[i,(i+1) % nE] = 1
+		np.fill_diagonal(matrix,0)
+		return cls(matrix)
+
+	@classmethod
+	def lattice(cls,nE):
+		"""Migration to the (up to four) neighbouring environments on a 2-D grid with ceil(sqrt(nE)) columns,
+		which is filled row by row"""
+		columns = int(np.ceil(np.sqrt(nE)))
+		matrix = np.zeros((nE,nE))
+		for i in range(nE):
+			row, column = divmod(i,columns)
+			for j in [i-columns,i+columns]+[i+step for step in [-1,1] if 0 <= column+step < columns]:
+				if (0 <= j < nE) & (j != i):
+					matrix[i,j] = 1
+		return cls(matrix)
+
+	@classmethod
+	def read(cls,filename):
+		"""Reads a migration matrix from a .npy file or a comma separated text file"""
+		if filename.endswith(".npy"):
+			return cls(np.load(filename))
+		return cls(np.loadtxt(filename,delimiter=",",ndmin=2))
+
+	def matrix(self):
+		"""Returns the migration probabilities as a dense matrix of shape (nE,nE)"""
+		matrix = np.zeros((self.nE,self.nE))
+		for i in range(self.nE):
+			start, end = self.indptr[i], self.indptr[i+1]
+			matrix[i,self.targets[start:end]] = np.diff(np.concatenate(([0],self.cumulative[start:end])))
+		return matrix
+
+
+def migration_topology(constants):
+	"""Returns the Topology given by constants["migration"] for the environments of constants"""
+	nE = len(constants["environments"])
+	name = constants["migration"]
+	if name in TOPOLOGIES:
+		return getattr(Topology,name)(nE)
+	topology = Topology.read(name)
+	if topology.nE != nE:
+		raise ValueError("Migration matrix {0} is given for {1} environments, but there are {2}!".format(name,topology.nE,nE))
+	return topology
@@ -1,158 +1,128 @@
-#!/usr/bin/env python
-# -*- coding: utf8 -*-
-"""
-#########################################################
-#
-#   output_population.py
-#   Author: Dion Häfner (dionhaefner@web.de)
-#
-#   Responsible for output and plotting
-#
-#   Licensed under BSD 2-Clause License
-#
-#########################################################
-"""
-
-# Import third-party libraries
-import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
-import warnings
-
-# Seaborn makes prettier plots, but is not installed in a fresh Anaconda python
-try:
-    import seaborn as sns
-    have_seaborn = True
-except ImportError:
-    have_seaborn = False
-
-# Import other parts of the project
-from animal import Animal
-from population import Population
-from environment import Environment
-from constants import model_constants
-
-
-def output_population(population,f1,f2,j,k,path,force_plot,t,env):
-    """
-    Outputs state of the Population. Inputs:
-        population: instance of Population to be output,
-        f1: file handle for mean gene file, f2: file handle for standard dev. of genes
-        j: current generation counter, k: current population counter,
-        path: output path, timeseries: whether complex output should be saved,
-        t: current time step, env: list of environments
-    """
-    constants = model_constants
-    animals = np.array(population.animals())
-    positions = np.array(list(map(lambda x: x.position, animals)))
-
-    nE = len(constants["environments"])
-    genes = [list(map(lambda x: x.gene_dict, animals[positions==i])) for i in range(nE)]
-    nPerPos = np.array([len(genes[i]) for i in range(nE)])
-    data = [pd.DataFrame(genes[i]) for i in range(nE)]
-    mean = [pd.DataFrame(data[i].mean()).transpose() for i in range(nE)]
-    std = [pd.DataFrame(data[i].std()).transpose() for i in range(nE)]
-
-
-    for i in range(nE):
-        f1.write(str(j)+","+str(i+1)+",")
-        f2.write(str(j)+","+str(i+1)+",")
-
-        if nPerPos[i] == 0:
-            f1.write("0,0,0,0,0,0,0,0,0")
-            f2.write("0,0,0,0,0,0,0,0,0")
-        else:
-            mean[i].to_csv(f1, header=False, index=False, line_terminator='')
-            std[i].to_csv(f2, header=False, index=False, line_terminator='')
-
-        f1.write(","+str(nPerPos[i]))
-        f2.write(","+str(nPerPos[i]))
-
-        f1.write("\n")
-        f2.write("\n")
-
-    filename = path+'timeseries/pop'+str(k+1)+'_genes_'+str(j)+'.png'
-    if force_plot:
-        plot_situation(t,data,nPerPos,env,filename)
-    elif constants["plot_every"] > 0:
-        if (j % constants["plot_every"]) == 0:
-            plot_situation(t,data,nPerPos,env,filename)
-
-    return mean, std
-
-
-def plot_situation(t,data,nPerPos,env,filename):
-    constants = model_constants
-    if constants["verbose"]:
-    	print("\nPlotting ...")
-
-    nE = len(constants["environments"])
-
-    plt.figure(figsize=(20,15))
-    ax = plt.subplot2grid((5,nE),(0,0),colspan=nE)
-    if have_seaborn:
-        palette = sns.color_palette("Set2", 3)
-        names = np.array(constants["environment_names"])
-        if (len(names) != nE):
-            warnings.warn("Environment parameter and name arrays have different lengths!\
-                Disregarding names.")
-            names = ["Environment "+str(q) for q in np.arange(nE)+1]
-        pos_data = pd.DataFrame({'env': names, 'val': nPerPos})
-        sns.barplot('env','val',data=pos_data,ax=ax,palette=palette,order=names)
-    else:
-        ax.bar(np.array(constants["environment_names"]),nPerPos,0.7)
-    ax.set_xlabel("")
-    ax.set_ylabel("")
-    ax.set_ylim(0,constants["population_size"])
-
-    for i in range(nE):
-        if (nPerPos[i] > 0):
-            ax = plt.subplot2grid((5,nE),(1,i),rowspan=2)
-
-            if have_seaborn:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    sns.violinplot(data=data[i],ax=ax,scale='width')
-            else:
-                data[i].boxplot(ax=ax)
-
-            ax.set_ylim(-2,2)
-
-            ax1 = plt.subplot2grid((5,nE),(3,i),rowspan=2)
-            scale = 5*constants["L"]*env[i].R
-            if t <= constants["L"]*constants["generations"]:
-
-                t0 = np.arange(max(0,t-scale/2),min(constants["L"]*constants["generations"],max(t+scale/2,scale)))
-            else:
-                t0 = np.arange(t-scale/2,t+scale/2)
-            ax1.plot(t0,np.array(list(map(env[i].evaluate,t0)))[:,0],color=palette[i])
-            ax1.scatter(t,env[i].evaluate(t)[0],s=250,color=palette[i],marker='*')
-            ax1.set_ylim(-2,2)
-            ax1.set_xlim(t0[0],t0[-1])
-
-    plt.suptitle("The situation at $t = $"+str(t),fontsize=25)
-    plt.subplots_adjust(top=0.95)
-    plt.savefig(filename)
-    plt.close()
-
-
-def plot_size(path,fi,k):
-    constants = model_constants
-    nE = 0
-    f = open(fi)
-    for (i,row) in enumerate(f):
-        if i == 0:
-            nE = int(row)
-        if row[0]=="n":
-            data = np.genfromtxt(fi,skip_header=i+1,delimiter=",")
-            break
-
-    sizes = data[:,-1].reshape(-1,nE)
-
-    plt.figure()
-    for i in range(nE):
-        plt.plot(sizes[:,i],alpha=0.7,label="Environment "+str(i+1))
-        plt.legend()
-        plt.ylim(0,5000)
-    plt.savefig(str(path)+"sizes_"+str(int(k)+1)+".png",bbox_inches='tight')
-    plt.close()
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#   output_population.py
+#   Author: Dion Häfner (dionhaefner@web.de)
+#
+#   Responsible for output and plotting
+#
+#   Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+# Import third-party libraries
+import numpy as np
+import warnings
+
+# Import other parts of the project
+from animal import Animal
+from population import Population, GENE_NAMES
+from gene_statistics import GeneStatistics
+from environment import Environment
+from constants import model_constants
+from plot_worker import Plotter
+from metrics import phase
+
+
+def output_population(population,output,j,k,path,force_plot,t,env,plotter=None,constants=None):
+    """
+    Outputs state of the Population. Inputs:
+        population: instance of Population to be output,
+        output: writer of the gene statistics (see output_store)
+        j: current generation counter, k: current population counter,
+        path: output path, force_plot: whether the situation should be plotted in any case,
+        t: current time step, env: list of environments,
+        plotter: Plotter the plots are handed to (default: render immediately),
+        constants: ModelConstants of the run (default: model_constants)
+    Returns the gene means and standard deviations and the number of animals in each environment.
+    """
+    if constants is None:
+        constants = model_constants
+    nPerPos, mean, std = population_statistics(population,constants)
+    output.write(j,mean,std,nPerPos)
+
+    filename = path+'timeseries/pop'+str(k+1)+'_genes_'+str(j)+'.png'
+    with phase("plot"):
+        if force_plot:
+            plot_situation(t,population,env,filename,plotter,constants)
+        elif constants["plot_every"] > 0:
+            if (j % constants["plot_every"]) == 0:
+                plot_situation(t,population,env,filename,plotter,constants)
+
+    return mean, std, nPerPos
+
+
+def output_batch(population,outputs,j,ks,path,force_plot,t,env,plotter=None,constants=None):
+    """
+    Outputs state of every living replicate of a BatchPopulation to its writer in outputs,
+    with the plots of replicate r named after population ks[r] (other inputs as in output_population).
+    Returns the gene means and standard deviations and the number of animals in each environment of all replicates.
+    """
+    if constants is None:
+        constants = model_constants
+    nPerPos, mean, std = population.statistics()
+    alive = np.flatnonzero(population.alive())
+    for r in alive:
+        outputs[r].write(j,mean[r],std[r],nPerPos[r])
+
+    with phase("plot"):
+        if force_plot or ((constants["plot_every"] > 0) and (j % constants["plot_every"] == 0)):
+            for r in alive:
+                filename = path+'timeseries/pop'+str(ks[r]+1)+'_genes_'+str(j)+'.png'
+                plot_situation(t,population.replicate(r),env,filename,plotter,constants)
+
+    return mean, std, nPerPos
+
+
+def population_statistics(population,constants=None):
+    """Returns the number of animals in each environment and arrays of shape (nE,9)
+    holding the gene means and standard deviations in each environment"""
+    if constants is None:
+        constants = model_constants
+    statistics = GeneStatistics.of(population,len(constants["environments"]))
+    return statistics.counts, statistics.mean, statistics.std
+
+
+def plot_situation(t,population,env,filename,plotter=None,constants=None):
+    """Hands a snapshot of the population and the environments around time t to plotter"""
+    if constants is None:
+        constants = model_constants
+    if constants["verbose"]:
+        print("\nPlotting ...")
+
+    nE = len(constants["environments"])
+    names = np.array(constants["environment_names"]).ravel()
+    if (len(names) != nE):
+        warnings.warn("Environment parameter and name arrays have different lengths!\
+            Disregarding names.")
+        names = np.array(["Environment "+str(q) for q in np.arange(nE)+1])
+
+    trace_t, trace_E, E_t = [], [], []
+    for i in range(nE):
+        scale = 5*constants["L"]*env[i].R
+        if t <= constants["L"]*constants["generations"]:
+            t0 = np.arange(max(0,t-scale/2),min(constants["L"]*constants["generations"],max(t+scale/2,scale)))
+        else:
+            t0 = np.arange(t-scale/2,t+scale/2)
+        trace_t.append(t0)
+        trace_E.append(env[i].evaluate_many(t0)[0])
+        E_t.append(env[i].evaluate(t)[0])
+
+    snapshot = {"t":t,"genes":np.array(population.genes()),"gene_names":np.array(GENE_NAMES),
+        "positions":np.array(population.animal_positions()),"names":names,
+        "population_size":constants["population_size"],"trace_t":np.concatenate(trace_t),
+        "trace_E":np.concatenate(trace_E),"trace_bounds":np.cumsum([len(t0) for t0 in trace_t])[:-1],"E_t":np.array(E_t)}
+    (plotter or Plotter()).plot("situation",snapshot,filename)
+
+
+def plot_size(path,sizes,k,plotter=None,constants=None):
+    """Hands the number of animals in each environment over time to plotter, given as the generations
+    and an array of shape (rows,nE) (as returned by sizes() of the writers in output_store)"""
+    if constants is None:
+        constants = model_constants
+    generations, sizes = sizes
+    snapshot = {"generations":np.array(generations),"sizes":np.array(sizes),"population_size":constants["population_size"]}
+    (plotter or Plotter()).plot("sizes",snapshot,str(path)+"sizes_"+str(int(k)+1)+".png")
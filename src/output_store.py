@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	output_store.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Writers for the gene statistics of every generation:
+#	csv text files, or a binary store that appends to a
+#	preallocated, memory-mapped .npy file. The binary
+#	store can be converted to csv files by export_csv.py.
+#	Long runs may write only every Nth or logarithmically
+#	spaced generations, keeping the last generations in a
+#	ring buffer that is written when the run ends
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import collections
+import json
+import os
+
+# Largest number of rows read for plotting the environment sizes (up to twice as many are kept)
+PLOT_ROWS = 5000
+
+
+def open_output(path,k,environments,genes,output_format="csv",generations=0,start_generation=0,every=1,spacing="linear",buffer=0):
+	"""Returns the writer for the gene statistics of population k in path. Inputs:
+		environments: Environment instances,  genes: names of the genes in the order they are written,
+		output_format: csv or npy,  generations: number of generations the binary store is preallocated for,
+		start_generation: continue existing output at this generation, discarding all later rows (when resuming),
+		every, spacing, buffer: decimation of the written generations and size of the ring buffer (see DecimatedWriter)
+	"""
+	if every < 1:
+		raise ValueError("Output must be written at least every generation, got {0}!".format(every))
+	rows = np.count_nonzero(written(np.arange(generations+1),every,spacing)) + buffer
+	prefix = path+"pop"+str(k+1)
+	if output_format == "npy":
+		writer = BinaryWriter(prefix+"_statistics.npy",environments,genes,rows,start_generation)
+	elif output_format == "csv":
+		writer = CSVWriter(prefix+"_mean_genes.csv",prefix+"_std_genes.csv",environments,genes,start_generation)
+	else:
+		raise ValueError("Unknown output format {0}!".format(output_format))
+	if (every == 1) and (spacing == "linear") and (buffer == 0):
+		return writer
+	return DecimatedWriter(writer,every,spacing,buffer)
+
+
+def written(generation,every=1,spacing="linear"):
+	"""Tells whether the statistics of generation (a number or an array) are written: every Nth generation (linear),
+	or whenever its position on a logarithmic axis with every generations per decade changes (log)"""
+	generation = np.asarray(generation)
+	if spacing == "linear":
+		return generation % every == 0
+	elif spacing == "log":
+		with np.errstate(divide="ignore",invalid="ignore"):
+			step = np.floor(every*np.log10(generation.astype(np.float64)))
+			return (generation == 0) | (step > np.floor(every*np.log10(generation-1.)))
+	else:
+		raise ValueError("Unknown output spacing {0}!".format(spacing))
+
+
+class CSVWriter:
+	def __init__(self,mean_file,std_file,environments,genes,start_generation=0):
+		"""Writes the gene statistics to a file of gene means and a file of gene standard deviations.
+		The genes are written in alphabetical order, as expected by main_variable.py."""
+		self._mean_file = mean_file
+		self._order = [list(genes).index(gene) for gene in sorted(genes)]
+
+		if (start_generation > 0) and os.path.isfile(mean_file) and os.path.isfile(std_file):
+			_truncate_csv(mean_file,start_generation)
+			_truncate_csv(std_file,start_generation)
+			self._f1, self._f2 = open(mean_file,'a'), open(std_file,'a')
+		else:
+			self._f1, self._f2 = open(mean_file,'w'), open(std_file,'w')
+			header = csv_header(environments,genes)
+			self._f1.write(header)
+			self._f2.write(header)
+
+	def write(self,generation,mean,std,sizes):
+		"""Appends one row per environment, given arrays of shape (nE,genes) of gene means and
+		standard deviations and the number of animals in each environment"""
+		zeros = ",".join(["0"]*len(self._order))
+		for i in range(len(sizes)):
+			start = "{0},{1},".format(generation,i+1)
+			end = ",{0}\n".format(int(sizes[i]))
+			if sizes[i] == 0:
+				self._f1.write(start+zeros+end)
+				self._f2.write(start+zeros+end)
+			else:
+				self._f1.write(start+",".join(map(str,mean[i,self._order].tolist()))+end)
+				self._f2.write(start+",".join(map(str,std[i,self._order].tolist()))+end)
+
+	def sizes(self):
+		"""Returns the generations and an array of shape (rows,nE) holding the number of animals in each environment,
+		of at most 2*PLOT_ROWS evenly spaced rows and the last one"""
+		self.flush()
+		return read_sizes(self._mean_file)
+
+	def buffered(self):
+		"""Returns the rows that are not written yet (none)"""
+		return []
+
+	def flush(self):
+		self._f1.flush()
+		self._f2.flush()
+
+	def close(self):
+		self._f1.close()
+		self._f2.close()
+
+
+class BinaryWriter:
+	def __init__(self,filename,environments,genes,rows,start_generation=0):
+		"""Appends the gene statistics to a memory-mapped .npy file of shape (rows,nE,2*genes+2). Every row holds
+		the generation, the gene means, the gene standard deviations and the number of animals in each
+		environment; unused rows have generation -1. The environments and gene names are written to a .json file
+		next to it."""
+		self._filename = filename
+
+		if (start_generation > 0) and os.path.isfile(filename):
+			self._data = np.lib.format.open_memmap(filename,mode="r+")
+			generation = self._data[:,0,0]
+			self._row = np.count_nonzero((generation >= 0) & (generation < start_generation))
+			self._clear(self._row)
+		else:
+			self._data = np.lib.format.open_memmap(filename,mode="w+",dtype=np.float64,\
+						shape=(max(rows,1),len(environments),2*len(genes)+2))
+			self._row = 0
+			self._clear(0)
+			metadata = {"genes":list(genes),"environments":[[env.R,env.P,env.A,env.B,env.O] for env in environments]}
+			with open(_metadata_file(filename),"w") as f:
+				json.dump(metadata,f)
+
+	def write(self,generation,mean,std,sizes):
+		"""Appends one row, given arrays of shape (nE,genes) of gene means and standard deviations
+		and the number of animals in each environment"""
+		if self._row == len(self._data):
+			self._grow()
+		row = self._data[self._row]
+		row[:,0] = generation
+		row[:,1:-1] = np.concatenate((mean,std),axis=1)
+		row[:,-1] = sizes
+		self._row += 1
+
+	def sizes(self):
+		"""Returns the generations and an array of shape (rows,nE) holding the number of animals in each environment,
+		of at most PLOT_ROWS evenly spaced rows and the last one"""
+		stride = max(1,-(-self._row // PLOT_ROWS))
+		rows = np.unique(np.append(np.arange(0,self._row,stride),max(self._row-1,0)))[:self._row]
+		data = self._data[rows]
+		return np.array(data[:,0,0]), np.array(data[:,:,-1])
+
+	def buffered(self):
+		"""Returns the rows that are not written yet (none)"""
+		return []
+
+	def flush(self):
+		self._data.flush()
+
+	def close(self):
+		self._data.flush()
+		del self._data
+
+	def _clear(self,start):
+		"""Marks all rows from start on as unused"""
+		self._data[start:] = np.nan
+		self._data[start:,:,0] = -1
+
+	def _grow(self):
+		"""Doubles the number of rows of the store"""
+		old = self._data
+		old.flush()
+		rows = len(old)
+		data = np.lib.format.open_memmap(self._filename+".tmp",mode="w+",dtype=old.dtype,shape=(2*rows,)+old.shape[1:])
+		data[:rows] = old
+		data.flush()
+		del data, old, self._data
+		os.replace(self._filename+".tmp",self._filename)
+		self._data = np.lib.format.open_memmap(self._filename,mode="r+")
+		self._clear(rows)
+
+
+class DecimatedWriter:
+	def __init__(self,writer,every=1,spacing="linear",buffer=0):
+		"""Passes the gene statistics of every Nth generation (linear), or of logarithmically spaced generations with
+		every generations per decade (log), on to writer (see written). The statistics of the last buffer generations
+		are kept in a ring buffer and written in full resolution when the sizes are read or the writer is closed, i.e.
+		when the population stops early, dies out or ends. The last generation is always kept, since it holds the
+		final statistics."""
+		self._writer = writer
+		self._every = every
+		self._spacing = spacing
+		self._rows = collections.deque(maxlen=max(buffer,1))
+
+	def write(self,generation,mean,std,sizes):
+		"""Adds one row to the ring buffer, the oldest row leaves it and is written if its generation is due"""
+		if len(self._rows) == self._rows.maxlen:
+			row = self._rows.popleft()
+			if written(row[0],self._every,self._spacing):
+				self._writer.write(*row)
+		self._rows.append((generation,np.array(mean),np.array(std),np.array(sizes)))
+
+	def sizes(self):
+		"""Returns the generations and an array of shape (rows,nE) holding the number of animals in each environment"""
+		self._write_buffer()
+		return self._writer.sizes()
+
+	def buffered(self):
+		"""Returns the rows of the ring buffer, which are not written yet. They are saved with checkpoints,
+		such that a resumed run writes the same rows as an uninterrupted one."""
+		return list(self._rows)
+
+	def restore(self,rows):
+		"""Refills the ring buffer with rows returned by buffered (when resuming)"""
+		self._rows.extend(rows)
+
+	def flush(self):
+		"""Writes all rows that left the ring buffer to disk, the ring buffer is kept"""
+		self._writer.flush()
+
+	def close(self):
+		self._write_buffer()
+		self._writer.close()
+
+	def _write_buffer(self):
+		"""Writes all rows of the ring buffer"""
+		while self._rows:
+			self._writer.write(*self._rows.popleft())
+		self._writer.flush()
+
+
+def read_store(filename):
+	"""Reads a binary store and returns the written rows as arrays of shape (rows,nE) of generations and sizes and
+	of shape (rows,nE,genes) of gene means and standard deviations, together with the gene names and environment parameters"""
+	data = np.load(filename,mmap_mode="r")
+	with open(_metadata_file(filename)) as f:
+		metadata = json.load(f)
+	data = np.array(data[data[:,0,0] >= 0])
+	nG = len(metadata["genes"])
+	return data[:,:,0], data[:,:,1:nG+1], data[:,:,nG+1:-1], data[:,:,-1], metadata["genes"], metadata["environments"]
+
+
+def read_sizes(filename,max_rows=PLOT_ROWS):
+	"""Reads a csv file of gene statistics line by line and returns the generations and an array of shape (rows,nE)
+	holding the number of animals in each environment. Whenever 2*max_rows rows were kept, every other one is
+	dropped, such that the memory is bounded and the kept rows are evenly spaced. The last row is always kept."""
+	nE, header, stride, count = 0, True, 1, 0
+	generations, sizes, row, last = [], [], [], None
+	with open(filename) as f:
+		for (i,line) in enumerate(f):
+			if i == 0:
+				nE = int(line)
+			if header:
+				header = line[0] != "n"
+				continue
+			row.append(float(line.rsplit(",",1)[1]))
+			if len(row) < nE:
+				continue
+			last = (int(float(line.split(",",1)[0])),row)
+			if count % stride == 0:
+				generations.append(last[0])
+				sizes.append(row)
+				if len(sizes) == 2*max_rows:
+					generations, sizes, stride = generations[::2], sizes[::2], 2*stride
+			row = []
+			count += 1
+	if (count > 0) and ((count-1) % stride != 0):
+		generations.append(last[0])
+		sizes.append(last[1])
+	return np.array(generations,dtype=np.int64), np.array(sizes,dtype=np.float64).reshape(-1,nE)
+
+
+def export_csv(filename,mean_file=None,std_file=None):
+	"""Converts the binary store filename to a file of gene means and a file of gene standard deviations
+	in the csv format. By default, they are written next to the store."""
+	prefix = filename[:-len("_statistics.npy")] if filename.endswith("_statistics.npy") else os.path.splitext(filename)[0]
+	if mean_file is None:
+		mean_file = prefix+"_mean_genes.csv"
+	if std_file is None:
+		std_file = prefix+"_std_genes.csv"
+
+	generation, mean, std, sizes, genes, environments = read_store(filename)
+	writer = CSVWriter(mean_file,std_file,[_Parameters(*param) for param in environments],genes)
+	for row in range(len(generation)):
+		writer.write(int(generation[row,0]),mean[row],std[row],sizes[row])
+	writer.close()
+	return mean_file, std_file
+
+
+def csv_header(environments,genes):
+	"""Returns the header of the csv files: number of environments, environment parameters and column names"""
+	header = "{0}\n\n".format(len(environments))
+	for (i,env) in enumerate(environments):
+		header += "R{4},P{4},A{4},B{4},O{4}\n{0},{1},{2},{3},{5}\n".format(env.R,env.P,env.A,env.B,i,env.O)
+	header += "\nn,environment,"+",".join(sorted(genes))+",size\n"
+	return header
+
+
+def _truncate_csv(filename,generation):
+	"""Removes all rows of generation >= generation from a csv file of gene means or standard deviations"""
+	with open(filename) as f:
+		lines = f.readlines()
+
+	header = len(lines)
+	for (i,line) in enumerate(lines):
+		if line.startswith("n"):
+			header = i
+			break
+
+	with open(filename,"w") as f:
+		f.writelines(lines[:header+1])
+		f.writelines(line for line in lines[header+1:] if int(float(line.split(",")[0])) < generation)
+
+
+def _metadata_file(filename):
+	return os.path.splitext(filename)[0]+".json"
+
+
+class _Parameters:
+	"""Holds the parameters of an environment read from a binary store"""
+	def __init__(self,R,P,A,B,O):
+		self.R, self.P, self.A, self.B, self.O = R, P, A, B, O
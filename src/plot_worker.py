@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	plot_worker.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Renders the plots of a run from snapshots of their
+#	data, either directly, in a background worker fed by
+#	a bounded queue, or later from snapshot files
+#	(see render_snapshots.py)
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import multiprocessing
+import threading
+import traceback
+import warnings
+import glob
+import os
+
+# Maximum number of snapshots waiting to be rendered
+QUEUE_SIZE = 4
+
+
+class Plotter:
+	def __init__(self,mode="inline",path="",queue_size=QUEUE_SIZE):
+		"""Renders plots given by the name of a renderer and a snapshot (dict of arrays) of their data. Modes:
+			inline: render immediately,
+			background: render in a worker process (a thread inside of daemonic pool workers), which is fed
+				by a queue holding at most queue_size snapshots, such that the simulation continues meanwhile,
+			later: only save the snapshots to path/snapshots/, to be rendered by render_snapshots.py,
+			none: discard all plots
+		"""
+		self._mode = mode
+		self._path = path
+		if mode == "background":
+			self._start_worker(queue_size)
+		elif mode == "later":
+			if not os.path.isdir(path+"snapshots/"):
+				os.makedirs(path+"snapshots/")
+		elif mode not in ["inline","none"]:
+			raise ValueError("Unknown plot mode {0}!".format(mode))
+
+	def plot(self,renderer,snapshot,filename):
+		"""Renders the snapshot with renderer (a key of RENDERERS) to filename, a path below the output path"""
+		if self._mode == "background":
+			self._queue.put((renderer,snapshot,filename)) # blocks while the queue is full
+		elif self._mode == "later":
+			name = os.path.splitext(os.path.basename(filename))[0]
+			np.savez(self._path+"snapshots/"+name+".npz",renderer=renderer,\
+				filename=os.path.relpath(filename,self._path),**snapshot)
+		elif self._mode == "inline":
+			render(renderer,snapshot,filename)
+
+	def close(self):
+		"""Waits until all plots are rendered"""
+		if self._mode == "background":
+			self._queue.put(None)
+			self._worker.join()
+			self._mode = "inline"
+
+	def _start_worker(self,queue_size):
+		if multiprocessing.current_process().daemon: # pool workers may not have child processes
+			try:
+				import queue
+			except ImportError: # Python 2
+				import Queue as queue
+			self._queue = queue.Queue(queue_size)
+			self._worker = threading.Thread(target=_work,args=(self._queue,))
+		else:
+			self._queue = multiprocessing.Queue(queue_size)
+			self._worker = multiprocessing.Process(target=_work,args=(self._queue,))
+		self._worker.daemon = True
+		self._worker.start()
+
+
+def render(renderer,snapshot,filename):
+	"""Renders the snapshot with renderer to filename"""
+	RENDERERS[renderer](filename,**snapshot)
+
+
+def render_snapshots(path):
+	"""Renders all snapshots saved in path/snapshots/ and returns the number of rendered plots"""
+	files = sorted(glob.glob(os.path.join(path,"snapshots","*.npz")))
+	for snapshot_file in files:
+		with np.load(snapshot_file) as data:
+			snapshot = dict((key,data[key]) for key in data.files)
+		renderer, filename = str(snapshot.pop("renderer")), str(snapshot.pop("filename"))
+		render(renderer,snapshot,os.path.join(path,filename))
+	return len(files)
+
+
+def plot_situation(filename,t,genes,gene_names,positions,names,population_size,trace_t,trace_E,trace_bounds,E_t):
+	"""Plots the number of animals and the distribution of their genes in each environment,
+	and the environments around time t"""
+	import pandas as pd
+	from matplotlib.gridspec import GridSpec
+	Figure, FigureCanvasAgg = _figure()
+	sns = _seaborn()
+
+	nE = len(names)
+	counts = np.bincount(positions,minlength=nE)
+	order = np.argsort(positions,kind="stable")
+	data = [pd.DataFrame(group,columns=gene_names) for group in np.split(genes[order],np.cumsum(counts)[:-1])]
+	trace_t, trace_E = np.split(trace_t,trace_bounds), np.split(trace_E,trace_bounds)
+
+	if sns is not None:
+		palette = sns.color_palette("Set2",nE)
+	else:
+		palette = ["C"+str(i) for i in range(nE)]
+
+	fig = Figure(figsize=(20,15))
+	FigureCanvasAgg(fig)
+	grid = GridSpec(5,nE,figure=fig)
+
+	ax = fig.add_subplot(grid[0,:])
+	if sns is not None:
+		pos_data = pd.DataFrame({'env': names, 'val': counts})
+		sns.barplot(x='env',y='val',data=pos_data,ax=ax,palette=palette,order=list(names))
+	else:
+		ax.bar(np.arange(nE),counts,0.7,tick_label=names)
+	ax.set_xlabel("")
+	ax.set_ylabel("")
+	ax.set_ylim(0,population_size)
+
+	for i in range(nE):
+		if (counts[i] > 0):
+			ax = fig.add_subplot(grid[1:3,i])
+
+			if sns is not None:
+				with warnings.catch_warnings():
+					warnings.simplefilter("ignore")
+					sns.violinplot(data=data[i],ax=ax,scale='width')
+			else:
+				data[i].boxplot(ax=ax)
+
+			ax.set_ylim(-2,2)
+
+			ax1 = fig.add_subplot(grid[3:5,i])
+			ax1.plot(trace_t[i],trace_E[i],color=palette[i])
+			ax1.scatter(t,E_t[i],s=250,color=palette[i],marker='*')
+			ax1.set_ylim(-2,2)
+			ax1.set_xlim(trace_t[i][0],trace_t[i][-1])
+
+	fig.suptitle("The situation at $t = $"+str(t),fontsize=25)
+	fig.subplots_adjust(top=0.95)
+	fig.savefig(filename)
+
+
+def plot_environment(filename,t,E,C):
+	"""Plots environment E and cue C over time"""
+	Figure, FigureCanvasAgg = _figure()
+	fig = Figure()
+	FigureCanvasAgg(fig)
+	ax = fig.add_subplot(1,1,1)
+	ax.plot(t,E,label='E')
+	ax.plot(t,C,'.',label='C')
+	ax.legend()
+	ax.set_ylim(-2,2)
+	fig.savefig(filename,bbox_inches='tight')
+
+
+def plot_size(filename,sizes,population_size,generations=None):
+	"""Plots the number of animals in each environment over the generations, given an array of shape (rows,nE)
+	(default generations: one row per generation)"""
+	Figure, FigureCanvasAgg = _figure()
+	fig = Figure()
+	FigureCanvasAgg(fig)
+	ax = fig.add_subplot(1,1,1)
+	if generations is None:
+		generations = np.arange(len(sizes))
+	for i in range(sizes.shape[1]):
+		ax.plot(generations,sizes[:,i],alpha=0.7,label="Environment "+str(i+1))
+	ax.legend()
+	ax.set_ylim(0,population_size)
+	fig.savefig(filename,bbox_inches='tight')
+
+
+# matplotlib, pandas and seaborn are only imported by the renderers, such that processes
+# that never render a plot (e.g. pool workers) start fast
+def _figure():
+	"""Returns the Figure class and the Agg canvas. Figures are drawn without pyplot,
+	such that they may be rendered in a thread."""
+	from matplotlib.figure import Figure
+	from matplotlib.backends.backend_agg import FigureCanvasAgg
+	return Figure, FigureCanvasAgg
+
+
+def _seaborn():
+	"""Returns the seaborn module, or None if it is not installed (seaborn makes prettier plots,
+	but is not installed in a fresh Anaconda python)"""
+	try:
+		import seaborn
+		return seaborn
+	except ImportError:
+		return None
+
+
+def _work(queue):
+	"""Renders snapshots from queue until it receives None"""
+	while True:
+		job = queue.get()
+		if job is None:
+			break
+		try:
+			render(*job)
+		except Exception:
+			warnings.warn("Plot {0} failed:\n{1}".format(job[2],traceback.format_exc()))
+
+
+RENDERERS = {"situation": plot_situation, "environment": plot_environment, "sizes": plot_size}
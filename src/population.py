@@ -1,119 +1,175 @@
-#!/usr/bin/env python
-# -*- coding: utf8 -*-
-"""
-#########################################################
-#
-#	population.py
-#	Author: Dion Häfner (dionhaefner@web.de)
-#	
-#	Implements Population class
-#	
-#	Licensed under BSD 2-Clause License
-#
-#########################################################
-"""
-
-import numbers
-import numpy as np
-import time
-
-from constants import model_constants # Import model constants
-from animal import Animal
-
-
-class Population:
-	def __init__(self,size,animals):
-		"""Takes a population size and a list of Animal as input"""
-		if (isinstance(size,int) & (all(isinstance(x,Animal) for x in animals))):
-			if (size == len(animals)):
-				self._animals 	= np.array(animals)
-				self._size = size
-				self._constants	= model_constants
-				self._positions = self.positions()
-			else:
-				raise ValueError('The size parameter must be equal to the length of the list of animals.')
-		else:
-			raise TypeError('First argument must be of type int, second of type list of Animal.')
-
-	def animals(self):
-		"""Returns the ndarray of animals"""
-		return self._animals
-
-	def size(self):
-		"""Returns the current size of the population"""
-		return self._size
-
-	def react(self,E,C,evolve_all=False):
-		"""Calculates the insulation of each Animal in the Population based on cue C and environment E"""
-		for animal in self._animals:
-			animal.react(E,C,evolve_all)
-
-	def breed_constant(self):
-		"""Iterates the entire Population to a new generation, calculating the number of offspring of each Animal with CONSTANT population size"""
-		calc_payoff 	= np.vectorize(lambda x: x.lifetime_payoff(self._positions))
-		lifetime_payoff = calc_payoff(self._animals)
-		mean_payoff 	= np.mean(lifetime_payoff)
-
-		if (mean_payoff == 0):
-			raise RuntimeError("Mean payoff of population decreased to 0. Check your parameters!")
-		else:
-			payoff_factor = lifetime_payoff/mean_payoff
-
-		offspring = np.random.poisson(lam=payoff_factor)
-		born_animals = np.repeat(self._animals,offspring)
-		mutate_pop = np.vectorize(lambda x: Animal(x.mutate(),x.position))
-		new_animals = mutate_pop(born_animals)
-
-		N = len(new_animals)
-		if self._constants["verbose"]:
-			print("\n\nAnimals per environment: {0}".format(self._positions))
-			print("Population size: {0}\tMean payoff: {1:.2f}".format(N,mean_payoff))
-		if (N > self._constants["population_size"]):
-			new_animals = np.random.choice(new_animals,self._constants["population_size"]\
-							,replace=False)
-		elif (N < self._constants["population_size"]):
-			clone_candidates = np.random.choice(new_animals,\
-						self._constants["population_size"] - N)
-			clones = [Animal(x.genes,x.position) for x in clone_candidates]
-			new_animals = np.append(new_animals,clones)
-
-		self._animals 	= new_animals
-		self._positions = self.positions()
-
-
-	def breed_variable(self):
-		"""Iterates the entire Population to a new generation, calculating the number of offspring of each Animal with VARIABLE population size"""
-		nE = len(self._constants["environments"])
-		calc_payoff 	= np.vectorize(lambda x: x.lifetime_payoff(self._positions))
-		lifetime_payoff = calc_payoff(self._animals)
-		max_payoff 	= 1/self._constants["q"] #(1-1/nE)/self._constants["q"]
-		payoff_factor 	= lifetime_payoff/max_payoff
-		offspring 	= np.random.poisson(lam=payoff_factor)
-		born_animals 	= np.repeat(self._animals,offspring)
-
-		try: # check if all animals are dead yet
-			born_animals[0]
-		except IndexError:
-			self._size = 0
-			return
-
-		mutate_pop = np.vectorize(lambda x: Animal(x.mutate(),x.position))
-		new_animals = mutate_pop(born_animals)
-
-		N = len(new_animals)
-		if self._constants["verbose"]:
-			print("\n\nAnimals per environment: {0}".format(self._positions))
-			print("Population size: {0}".format(N))
-		if (N > self._constants["population_size"]):
-			new_animals = np.random.choice(new_animals,self._constants["population_size"]\
-							,replace=False)
-
-		self._animals = new_animals
-		self._size = len(new_animals)
-		self._positions	= self.positions()
-
-	def positions(self):
-		"""Returns the number of animals in each environment"""
-		fun = np.vectorize(lambda x: x.position)
-		pos = fun(self._animals)
-		return np.bincount(pos,minlength=len(self._constants["environments"]))
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	population.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#	
+#	Implements Population class
+#	
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numbers
+import numpy as np
+import time
+
+from constants import model_constants # Import model constants
+import animal as animal_module
+from animal import Animal
+from migration import migration_topology
+from reproduction import resample
+import random_streams
+
+# Names of the genes, in the order used by Animal.genes
+GENE_NAMES = ["h","s","a","I0","I0p","b","bp","m","ma"]
+
+
+class Population:
+	def __init__(self,size,animals,rng=None,constants=None):
+		"""Takes a population size, a list of Animal and optionally the random stream and the ModelConstants
+		of the population (default: model_constants) as input"""
+		if (isinstance(size,int) & (all(isinstance(x,Animal) for x in animals))):
+			if (size == len(animals)):
+				self._animals 	= np.array(animals)
+				self._size = size
+				self._constants	= constants if constants is not None else model_constants
+				self._rng = rng if rng is not None else random_streams.default_stream()
+				self._topology = migration_topology(self._constants)
+				self._positions = self.positions()
+			else:
+				raise ValueError('The size parameter must be equal to the length of the list of animals.')
+		else:
+			raise TypeError('First argument must be of type int, second of type list of Animal.')
+
+	@classmethod
+	def from_state(cls,state,rng=None,constants=None):
+		"""Creates a population from a dict returned by state(). If rng is given, the population continues
+		with this random stream, otherwise the stored random state is restored."""
+		genes = np.asarray(state["genes"],dtype=np.float64) # checkpoints of the array backend may be compact
+		animals = [Animal(animal_genes,position,constants) for (animal_genes,position) in zip(genes,state["position"])]
+		for (i,animal) in enumerate(animals):
+			animal.state = (state["insulation"][i],state["mismatch"][i],state["adjustments"][i],\
+					state["migrations"][i],state["primed"][i])
+		population = cls(len(animals),animals,rng,constants)
+		population._positions = np.array(state["counts"],dtype=np.int64)
+		random_state = state["random_state"]
+		if (rng is None) & ("animal" in random_state):
+			population._rng.bit_generator.state = random_state["population"]
+			animal_module.set_random_state(random_state["animal"])
+		return population
+
+	def state(self):
+		"""Returns the full state of the population as a dict, e.g. for checkpoints"""
+		animal_states = np.array([animal.state for animal in self._animals]).reshape(-1,5)
+		return {"genes":self.genes(),"position":self.animal_positions(),"insulation":animal_states[:,0],
+			"mismatch":animal_states[:,1],"adjustments":animal_states[:,2].astype(int),
+			"migrations":animal_states[:,3].astype(int),"primed":animal_states[:,4].astype(np.uint8),
+			"counts":self._positions,
+			"random_state":{"population":self._rng.bit_generator.state,"animal":animal_module.get_random_state()}}
+
+	def animals(self):
+		"""Returns the ndarray of animals"""
+		return self._animals
+
+	def genes(self):
+		"""Returns an array of shape (size,9) containing the genes of every Animal"""
+		return np.array([animal.genes for animal in self._animals]).reshape(-1,9)
+
+	def animal_positions(self):
+		"""Returns an array containing the position of every Animal"""
+		return np.array([animal.position for animal in self._animals],dtype=int)
+
+	def size(self):
+		"""Returns the current size of the population"""
+		return self._size
+
+	def react(self,E,C,evolve_all=False):
+		"""Calculates the insulation of each Animal in the Population based on cue C and environment E.
+		The number of animals in each environment is updated as they migrate."""
+		animal_module.react_animals(self._animals,E,C,self._positions,self._topology,evolve_all)
+
+	def react_lifetime(self,E_block,C_block):
+		"""Lets every Animal live through all time steps of E_block and C_block (shape (steps,nE)), as steps calls of
+		react. Animals that can neither react nor migrate keep their insulation and position, so their mismatch of all
+		steps is added at once. The other animals live through all steps in a single pass."""
+		active = animal_module.settle_animals(self._animals,E_block,len(self._constants["environments"]))
+		animal_module.react_animals(active,E_block,C_block,self._positions,self._topology)
+
+	def breed_constant(self):
+		"""Iterates the entire Population to a new generation, calculating the number of offspring of each Animal with CONSTANT population size"""
+		calc_payoff 	= np.vectorize(lambda x: x.lifetime_payoff(self._positions))
+		lifetime_payoff = calc_payoff(self._animals)
+		mean_payoff 	= np.mean(lifetime_payoff)
+
+		if (mean_payoff == 0):
+			raise RuntimeError("Mean payoff of population decreased to 0. Check your parameters!")
+		else:
+			payoff_factor = lifetime_payoff/mean_payoff
+
+		population_size = self._constants["population_size"]
+		if self._constants["resampling"] != "poisson":
+			# exactly population_size offspring
+			parents = resample(self._constants["resampling"],lifetime_payoff,population_size,self._rng)
+			if self._constants["verbose"]:
+				print("\n\nAnimals per environment: {0}".format(self._positions))
+				print("Mean payoff: {0:.2f}".format(mean_payoff))
+			self._animals = animal_module.make_offspring(self._animals,parents,self._constants)
+			self._positions = self.positions()
+			return
+
+		offspring = self._rng.poisson(lam=payoff_factor)
+		parents = np.repeat(np.arange(len(self._animals)),offspring)
+
+		N = len(parents)
+		if self._constants["verbose"]:
+			print("\n\nAnimals per environment: {0}".format(self._positions))
+			print("Population size: {0}\tMean payoff: {1:.2f}".format(N,mean_payoff))
+		if (N > population_size): # only the surviving offspring are born
+			parents = parents[self._rng.choice(N,population_size,replace=False)]
+		new_animals = animal_module.make_offspring(self._animals,parents,self._constants)
+
+		if (N < population_size):
+			clone_candidates = self._rng.choice(N,\
+						self._constants["population_size"] - N)
+			clones = animal_module.make_offspring(new_animals,clone_candidates,self._constants,mutate=False)
+			new_animals = np.append(new_animals,clones)
+
+		self._animals 	= new_animals
+		self._positions = self.positions()
+
+
+	def breed_variable(self):
+		"""Iterates the entire Population to a new generation, calculating the number of offspring of each Animal with VARIABLE population size"""
+		nE = len(self._constants["environments"])
+		calc_payoff 	= np.vectorize(lambda x: x.lifetime_payoff(self._positions))
+		lifetime_payoff = calc_payoff(self._animals)
+		max_payoff 	= 1/self._constants["q"] #(1-1/nE)/self._constants["q"]
+		payoff_factor 	= lifetime_payoff/max_payoff
+		offspring 	= self._rng.poisson(lam=payoff_factor)
+		parents 	= np.repeat(np.arange(len(self._animals)),offspring)
+
+		if len(parents) == 0: # all animals are dead
+			self._size = 0
+			return
+
+		new_animals = animal_module.make_offspring(self._animals,parents,self._constants)
+
+		N = len(new_animals)
+		if self._constants["verbose"]:
+			print("\n\nAnimals per environment: {0}".format(self._positions))
+			print("Population size: {0}".format(N))
+		if (N > self._constants["population_size"]):
+			new_animals = self._rng.choice(new_animals,self._constants["population_size"]\
+							,replace=False)
+
+		self._animals = new_animals
+		self._size = len(new_animals)
+		self._positions	= self.positions()
+
+	def positions(self):
+		"""Returns the number of animals in each environment"""
+		return np.bincount(self.animal_positions(),minlength=len(self._constants["environments"])).astype(np.int64)
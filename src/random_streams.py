@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	random_streams.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Provides independent, reproducible random number
+#	streams for populations, environments and animals,
+#	all derived from a single base seed
+#
+#	Usage:
+#		set_seed(seed) once per process, then
+#		rng = stream(POPULATION,k) for NumPy draws or
+#		key = stream_key(ANIMAL,k) for the animal module
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import itertools
+
+# Kinds of streams, every stream is identified by its kind and an index
+POPULATION, ENVIRONMENT, ANIMAL, DEFAULT, BATCH = 0, 1, 2, 3, 4
+
+_seed = None
+_default_index = itertools.count()
+
+
+def set_seed(seed=0):
+	"""Sets the base seed all streams are derived from (0 = draw a random base seed) and returns it"""
+	global _seed
+	if not seed:
+		seed = np.random.SeedSequence().entropy
+	_seed = int(seed)
+	return _seed
+
+
+def get_seed():
+	"""Returns the base seed, drawing a random one if none is set yet"""
+	if _seed is None:
+		set_seed()
+	return _seed
+
+
+def stream(kind,*index):
+	"""Returns the NumPy Generator of the stream given by kind and index, e.g. stream(POPULATION,k).
+	The Philox bit generator is counter-based, such that different streams are independent."""
+	return np.random.Generator(np.random.Philox(_sequence(kind,*index)))
+
+
+def stream_key(kind,*index):
+	"""Returns the 64 bit key of the stream given by kind and index, used by the counter-based
+	generators in the animal module"""
+	return _sequence(kind,*index).generate_state(1,np.uint64)[0]
+
+
+def default_stream():
+	"""Returns a new stream for objects that are created without an explicit one"""
+	return stream(DEFAULT,next(_default_index))
+
+
+def _sequence(kind,*index):
+	"""Returns the SeedSequence of the stream given by kind and index"""
+	return np.random.SeedSequence(get_seed(),spawn_key=(kind,)+tuple(int(i) for i in index))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	reproduction.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Resampling schemes that draw exactly n parents from
+#	the lifetime payoffs of a population, returning the
+#	sorted parent index of every offspring
+#
+#	Usage:
+#		parents = resample("systematic",payoff,n,rng)
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+
+def multinomial(weights,n,rng):
+	"""Draws n parents independently, each with a probability proportional to its weight"""
+	return _parents(rng.multinomial(n,_probabilities(weights)))
+
+
+def systematic(weights,n,rng):
+	"""Draws n parents at the equidistant points (u+k)/n, k = 0,...,n-1, of the cumulative weights,
+	for a single uniform random number u. Every animal has floor(n*p) or ceil(n*p) offspring."""
+	cumulative = np.cumsum(_probabilities(weights))
+	cumulative[-1] = 1
+	# number of points below the cumulative weight of every animal
+	below = np.minimum(np.floor(n*cumulative - rng.random()).astype(np.int64) + 1,n)
+	return _parents(np.diff(below,prepend=0))
+
+
+def residual(weights,n,rng):
+	"""Gives every animal floor(n*p) offspring and draws the remaining ones by multinomial resampling
+	of the residual weights"""
+	expected = n*_probabilities(weights)
+	counts = np.floor(expected).astype(np.int64)
+	remaining = n - np.sum(counts)
+	if remaining > 0:
+		counts += rng.multinomial(remaining,_probabilities(expected - counts))
+	return _parents(counts)
+
+
+# Available resampling schemes
+SCHEMES = {"multinomial": multinomial, "systematic": systematic, "residual": residual}
+
+
+def resample(scheme,weights,n,rng):
+	"""Returns the sorted indices of n parents, drawn from the animals with the given (non-negative) weights
+	by scheme (a key of SCHEMES), using the random stream rng"""
+	try:
+		function = SCHEMES[scheme]
+	except KeyError:
+		raise ValueError("Unknown resampling scheme {0}!".format(scheme))
+	return function(np.asarray(weights,dtype=np.float64),int(n),rng)
+
+
+def _probabilities(weights):
+	total = np.sum(weights)
+	if total <= 0:
+		raise RuntimeError("Total weight of the population is 0, no parents can be drawn!")
+	return weights/total
+
+
+def _parents(counts):
+	"""Returns the index of every offspring, given the number of offspring of every animal"""
+	return np.repeat(np.arange(len(counts),dtype=np.int64),counts)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	run_index.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Implements RunIndex class, an SQLite database of all
+#	populations that were run with constant population
+#	size. Every population is keyed by a hash of the model
+#	parameters, the seed, its number and the code, such
+#	that its final results can be reused by later runs
+#
+#	Usage:
+#		index = RunIndex()
+#		cached = index.lookup(run_key(constants,seed,k))
+#		runs = index.query(R1=(10,100),mu=(0,1E-2))
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import sqlite3
+import hashlib
+import datetime
+import json
+import glob
+import os
+
+from constants import model_parameters
+from migration import TOPOLOGIES
+
+# Index of all runs, shared by main_constant.py and sweep.py
+INDEX_FILE = "./output/runs.sqlite"
+
+# Parameters that do not change the results of a population
+IGNORED_PARAMETERS = ["workers","threads","checkpoint_every","resume","output_format","output_every","output_spacing",
+			"output_buffer","metrics","profile_generation","plot_every","plot_mode","cache","cache_environment",
+			"environment_names","verbose"]
+
+_code_version = None
+
+
+def code_version():
+	"""Returns a hash of the source files of the model"""
+	global _code_version
+	if _code_version is None:
+		import constants
+		source = os.path.dirname(os.path.abspath(__file__))
+		files = sorted(glob.glob(os.path.join(source,"*.py"))+glob.glob(os.path.join(source,"*.pyx")))
+		digest = hashlib.sha256()
+		for filename in files+[os.path.splitext(constants.__file__)[0]+".py"]:
+			with open(filename,"rb") as f:
+				digest.update(f.read().replace(b"\r\n",b"\n"))
+		_code_version = digest.hexdigest()[:16]
+	return _code_version
+
+
+def run_key(constants,seed,k):
+	"""Returns the key of population k with the given constants and base seed. Without batches, populations
+	do not depend on each other, so the number of populations is not part of the key. A migration matrix
+	read from a file is keyed by its contents, such that editing the file changes the key."""
+	parameters = key_parameters(constants)
+	if constants["batch"] == 0:
+		del parameters["populations"]
+	if constants["migration"] not in TOPOLOGIES:
+		with open(constants["migration"],"rb") as f:
+			parameters["migration_matrix"] = hashlib.sha256(f.read()).hexdigest()
+	content = json.dumps([parameters,int(seed),int(k),code_version()],sort_keys=True)
+	return hashlib.sha256(content.encode("utf8")).hexdigest()
+
+
+def key_parameters(constants):
+	"""Returns the parameters of constants that determine the results of a population"""
+	return dict((name,value) for (name,value) in model_parameters(constants).items() if name not in IGNORED_PARAMETERS)
+
+
+class RunIndex:
+	def __init__(self,filename=INDEX_FILE):
+		"""Opens the index in filename, which is created if it does not exist. Every call opens its own
+		connection, such that the index may be shared by worker processes."""
+		self._filename = filename
+		directory = os.path.dirname(filename)
+		if directory and not os.path.isdir(directory):
+			os.makedirs(directory)
+		with self._connect() as connection:
+			# seeds are stored as text, since random seeds exceed the 64 bit integers of SQLite
+			connection.execute("CREATE TABLE IF NOT EXISTS runs (key TEXT PRIMARY KEY, population INTEGER, seed TEXT, "+
+				"version TEXT, path TEXT, created TEXT, mean TEXT, std TEXT, sizes TEXT, repeated INTEGER, "+
+				"stop_generation INTEGER, stop_reason TEXT)")
+			connection.execute("CREATE TABLE IF NOT EXISTS parameters (key TEXT, name TEXT, value REAL, text TEXT)")
+			connection.execute("CREATE INDEX IF NOT EXISTS parameter_values ON parameters (name, value)")
+
+	def lookup(self,key):
+		"""Returns the run of the given key as a dict (see query), or None if it was never run"""
+		runs = self._select("SELECT * FROM runs WHERE key = ?",[key])
+		return runs[0] if runs else None
+
+	def record(self,key,k,constants,seed,path,mean,std,repeated,sizes,stop=(None,None)):
+		"""Records the final gene means and standard deviations (shape (nE,9)), whether it had to be repeated,
+		the final sizes and the stop generation and reason of population k, whose outputs were written to path"""
+		with self._connect() as connection:
+			connection.execute("DELETE FROM runs WHERE key = ?",[key])
+			connection.execute("DELETE FROM parameters WHERE key = ?",[key])
+			connection.execute("INSERT INTO runs VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",[key,int(k),str(int(seed)),code_version(),\
+				os.path.abspath(path),datetime.datetime.today().isoformat(),_to_text(mean),_to_text(std),_to_text(sizes),\
+				int(repeated),stop[0],stop[1]])
+			connection.executemany("INSERT INTO parameters VALUES (?,?,?,?)",\
+				[(key,name,value,text) for (name,value,text) in _flatten(key_parameters(constants))])
+
+	def query(self,**ranges):
+		"""Returns all runs whose parameters are in the given (lower, upper) ranges (inclusive), e.g. R1=(10,100).
+		Environment parameters are named after their environment (R1, P1, ..., R2, ...). Every run is a dict of
+		its key, population, seed, code version, output path, creation time, final gene means, standard deviations
+		and sizes, whether it was repeated, its stop generation and reason, and its parameters."""
+		sql, arguments = "SELECT * FROM runs", []
+		for (name,(lower,upper)) in sorted(ranges.items()):
+			sql += (" WHERE" if not arguments else " AND")+" key IN (SELECT key FROM parameters WHERE name = ? AND value BETWEEN ? AND ?)"
+			arguments += [name,lower,upper]
+		runs = self._select(sql+" ORDER BY created, population",arguments)
+		for run in runs:
+			rows = self._select("SELECT name, value, text FROM parameters WHERE key = ?",[run["key"]])
+			run["parameters"] = dict((row["name"],row["value"] if row["text"] is None else row["text"]) for row in rows)
+		return runs
+
+	def _select(self,sql,arguments):
+		with self._connect() as connection:
+			connection.row_factory = sqlite3.Row
+			rows = [dict(zip(row.keys(),row)) for row in connection.execute(sql,arguments)]
+		for row in rows:
+			if "seed" in row:
+				row["seed"] = int(row["seed"])
+			for name in ["mean","std","sizes"]:
+				if name in row:
+					row[name] = _from_text(row[name])
+		return rows
+
+	def _connect(self):
+		return _Connection(sqlite3.connect(self._filename,timeout=60))
+
+
+class _Connection:
+	"""Context manager that commits and closes an SQLite connection"""
+	def __init__(self,connection):
+		self._connection = connection
+
+	def __enter__(self):
+		return self._connection
+
+	def __exit__(self,error,value,traceback):
+		if error is None:
+			self._connection.commit()
+		self._connection.close()
+
+
+def _flatten(parameters):
+	"""Yields (name, numeric value, text value) of every parameter, with one entry per environment parameter"""
+	for (name,value) in sorted(parameters.items()):
+		if name == "environments":
+			for (i,env) in enumerate(value):
+				for (key,param) in zip(["R","P","A","B","O"],env):
+					yield key+str(i+1), float(param), None
+		elif isinstance(value,(bool,int,float)):
+			yield name, float(value), None
+		else:
+			yield name, None, json.dumps(value)
+
+
+def _to_text(array):
+	return None if array is None else json.dumps(np.asarray(array,dtype=np.float64).tolist())
+
+
+def _from_text(text):
+	return None if text is None else np.array(json.loads(text))
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	run_population.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Runs single populations from start to end, and
+#	distributes independent populations over a pool
+#	of worker processes
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import multiprocessing
+from timeit import default_timer as timer
+import os
+
+import animal
+import random_streams
+from animal import Animal
+from population import Population, GENE_NAMES
+from array_population import ArrayPopulation
+from batch_population import BatchPopulation
+from constants import model_constants
+from iterate_population import iterate_population, iterate_batch
+from output_population import population_statistics
+from checkpoint import load_checkpoint, checkpoint_output
+from output_store import open_output
+from plot_worker import Plotter
+from convergence import write_stop, read_stop
+from run_index import RunIndex, run_key
+
+
+def run_constant_population(k,environments,path,seed,resume=False,constants=None):
+	"""
+	Runs population k with CONSTANT population size. Inputs:
+		k: population counter,  environments: Environment instances to be operated on,
+		path: path to the output files,  seed: base seed of the random streams,
+		resume: continue from the checkpoint of an interrupted run in path, if there is one,
+		constants: ModelConstants of the run (default: model_constants)
+	Returns the final gene means and standard deviations, whether the population
+	died out and had to be repeated, and the final number of animals in each environment.
+	"""
+	if constants is None:
+		constants = model_constants
+	rng = seed_random(seed,k)
+	nE = len(environments)
+	error_occured = False
+	start = timer()
+
+	checkpoint_file, final_file = path+"pop"+str(k+1)+"_checkpoint.npz", path+"pop"+str(k+1)+"_final.npz"
+
+	if resume and os.path.isfile(final_file): # population was completed before the interruption
+		pop_sizes, pop_mean, pop_std = population_statistics(load_checkpoint(final_file,constants=constants)[0],constants)
+		print("\n\tPopulation {0} already done!\n".format(k+1))
+		return pop_mean, pop_std, False, pop_sizes
+
+	# populations that were run before are taken from the run index
+	index = open_index(constants)
+	if constants["cache"] == "reuse":
+		cached = cached_population(index,k,path,seed,constants)
+		if cached is not None:
+			return cached
+
+	# plots are rendered while the simulation continues
+	plotter = Plotter(constants["plot_mode"],path)
+
+	# in case a population dies out, it is repeated
+	repeat = True
+	while repeat:
+		if resume and os.path.isfile(checkpoint_file):
+			# continue exactly where the checkpoint was written, discarding all later output
+			population, start_generation, t, stored = load_checkpoint(checkpoint_file,constants=constants)
+			if not np.allclose(stored,[[env.R,env.P,env.A,env.B,env.O] for env in environments]):
+				raise ValueError("Checkpoint {0} was written with different environments!".format(checkpoint_file))
+			print("\n\tResuming population {0} at generation {1}\n".format(k+1,start_generation))
+			rows = checkpoint_output(checkpoint_file)
+		else:
+			if constants["backend"] == "array":
+				# create a population of population_size animals with random genes
+				population = ArrayPopulation(constants["population_size"],rng=rng,constants=constants)
+			else:
+				# create a population of population_size animals that already have the correct random genes
+				animal_list = [Animal(constants=constants) for _ in range(constants["population_size"])]
+				# create a Population from animal_list
+				population = Population(constants["population_size"],animal_list,rng,constants)
+			start_generation, t, rows = 0, 0, []
+
+		# initial output, or continuation of the output written before the checkpoint
+		output = population_output(path,k,environments,constants,start_generation)
+		if rows:
+			output.restore(rows)
+		resume = False # a repeated population starts from scratch
+
+		end = timer()
+		if constants["verbose"]:
+			print("Set-up time: {0:.2e}s\n".format(end-start))
+		start = timer()
+
+		# iterate on the population and create outputs
+		try:
+			pop_mean, pop_std, _, pop_sizes = iterate_population(k,population,environments,output,path,t,False,start_generation,plotter,constants)
+			repeat = False
+		except RuntimeError:
+			output.close()
+			error_occured = True
+			# the repeat starts from scratch, so an interruption must not resume the failed attempt
+			if os.path.isfile(checkpoint_file):
+				os.remove(checkpoint_file)
+
+	plotter.close()
+	if index is not None:
+		index.record(run_key(constants,seed,k),k,constants,seed,path,pop_mean,pop_std,error_occured,pop_sizes,\
+			read_stop(path+"pop"+str(k+1)+"_stop.json"))
+	end = timer()
+	if constants["verbose"]:
+		print("\n---------------------------------------")
+		print(" Population {0} done! Total time: {1:.2f} min".format(k+1,(end-start)/60))
+		print("---------------------------------------\n")
+	else:
+		print("\n\tDone! Total time: {0:.2f} min\n".format((end-start)/60))
+
+	return pop_mean, pop_std, error_occured, pop_sizes
+
+
+def run_variable_population(k,environments,path,seed,mean_genes,std_genes,sizes,t,checkpoint=None,constants=None):
+	"""
+	Runs population k with VARIABLE population size. Inputs:
+		k: population counter,  environments: Environment instances to be operated on,
+		path: path to the output files,  seed: base seed of the random streams,
+		mean_genes, std_genes: mean and standard deviation of the starting genes in each environment,
+		sizes: number of starting animals in each environment,  t: initial time,
+		checkpoint: checkpoint file to take the starting population from instead (mean_genes, std_genes and sizes are ignored),
+		constants: ModelConstants of the run (default: model_constants)
+	Returns the final gene means (None if the population died out) and the final generation.
+	"""
+	if constants is None:
+		constants = model_constants
+	rng = seed_random(seed,k)
+	nE = len(environments)
+	start = timer()
+
+	if checkpoint is not None:
+		# start from the exact population of the checkpoint, continuing with this population's random stream
+		population = load_checkpoint(checkpoint,rng,constants=constants)[0]
+	else:
+		# create a population of population_size animals that have the correct mean genes
+		genes, positions = start_genes(mean_genes,std_genes,sizes,rng)
+		if constants["backend"] == "array":
+			population = ArrayPopulation(constants["population_size"],genes,positions,rng,constants)
+		else:
+			animals = [Animal(animal_genes,position,constants) for (animal_genes,position) in zip(genes,positions)]
+			population = Population(constants["population_size"],animals,rng,constants)
+
+	output = population_output(path,k,environments,constants)
+	plotter = Plotter(constants["plot_mode"],path)
+	pop_mean, pop_std, final_gen, _ = iterate_population(k,population,environments,output,path,t,True,0,plotter,constants)
+	plotter.close()
+	end = timer()
+
+	if pop_mean is None:
+		if not constants["verbose"]:
+			print("\n\tDied out! Total time: {0:.2f} min\n".format((end-start)/60))
+	else:
+		if not constants["verbose"]:
+			print("\n\tSurvived! Total time: {0:.2f} min\n".format((end-start)/60))
+
+	if constants["verbose"]:
+		print("\n---------------------------------------")
+		print(" Population {0} done! Total time: {1:.2f} min".format(k+1,(end-start)/60))
+		print("---------------------------------------\n")
+
+	return pop_mean, final_gen
+
+
+def run_constant_batch(ks,environments,path,seed,constants=None):
+	"""
+	Runs the populations ks with CONSTANT population size at once, as replicates of a BatchPopulation
+	(other inputs as in run_constant_population). Populations whose mean payoff decreased to 0 are
+	repeated on their own. Returns a list of the results of run_constant_population for every population.
+	"""
+	if constants is None:
+		constants = model_constants
+	if (constants["checkpoint_every"] > 0) or constants["resume"]:
+		raise ValueError("Checkpoints are not supported for batches of populations!")
+	index = open_index(constants)
+	if constants["cache"] == "reuse":
+		cached = [cached_population(index,k,path,seed,constants) for k in ks]
+		if all(result is not None for result in cached):
+			return cached
+
+	rng = seed_batch(seed,ks)
+	start = timer()
+
+	population = BatchPopulation(len(ks),rng=rng,constants=constants)
+	outputs = [population_output(path,k,environments,constants) for k in ks]
+	plotter = Plotter(constants["plot_mode"],path)
+	pop_mean, pop_std, _, pop_sizes = iterate_batch(ks,population,environments,outputs,path,0,False,plotter,constants)
+	plotter.close()
+
+	end = timer()
+	print("\n\tPopulations {0} to {1} done! Total time: {2:.2f} min\n".format(ks[0]+1,ks[-1]+1,(end-start)/60))
+
+	results = []
+	for (r,k) in enumerate(ks):
+		if pop_mean[r] is None: # in case a population dies out, it is repeated
+			repeated_mean, repeated_std, _, repeated_sizes = run_constant_population(k,environments,path,seed,constants=constants)
+			results.append((repeated_mean,repeated_std,True,repeated_sizes))
+		else:
+			results.append((pop_mean[r],pop_std[r],False,pop_sizes[r]))
+		if index is not None:
+			index.record(run_key(constants,seed,k),k,constants,seed,path,*results[-1],\
+				stop=read_stop(path+"pop"+str(k+1)+"_stop.json"))
+	return results
+
+
+def run_variable_batch(ks,environments,path,seed,mean_genes,std_genes,sizes,t,checkpoint=None,constants=None):
+	"""
+	Runs the populations ks with VARIABLE population size at once, as replicates of a BatchPopulation
+	(other inputs as in run_variable_population). Returns a list of the final gene means (None if the
+	population died out) and the final generation of every population.
+	"""
+	if constants is None:
+		constants = model_constants
+	rng = seed_batch(seed,ks)
+	start = timer()
+
+	if checkpoint is not None:
+		# every replicate starts from the exact population of the checkpoint
+		state = load_checkpoint(checkpoint,rng,constants=constants)[0].state()
+		population = BatchPopulation.tiled(state,len(ks),rng,constants)
+	else:
+		starts = [start_genes(mean_genes,std_genes,sizes,rng) for _ in ks]
+		population = BatchPopulation(len(ks),np.concatenate([genes for (genes,_) in starts]),\
+					np.concatenate([positions for (_,positions) in starts]),\
+					np.repeat(np.arange(len(ks)),[len(positions) for (_,positions) in starts]),rng,constants)
+
+	outputs = [population_output(path,k,environments,constants) for k in ks]
+	plotter = Plotter(constants["plot_mode"],path)
+	pop_mean, _, final_gen, _ = iterate_batch(ks,population,environments,outputs,path,t,True,plotter,constants)
+	plotter.close()
+
+	end = timer()
+	print("\n\tPopulations {0} to {1} done! Total time: {2:.2f} min\n".format(ks[0]+1,ks[-1]+1,(end-start)/60))
+
+	return [(pop_mean[r],final_gen[r]) for r in range(len(ks))]
+
+
+def start_genes(mean_genes,std_genes,sizes,rng):
+	"""Returns the genes (shape (size,9)) and positions of animals with normally distributed genes, given their
+	mean and standard deviation in each environment (as read from the output files) and the number of animals
+	in each environment"""
+	all_genes, all_positions = [], []
+	for i in range(len(sizes)):
+		if sizes[i] == 0:
+			continue
+		genes = []
+		# the genes are written in alphabetical order (after the environment column), not in the order used here
+		gene_order = [6,9,3,1,2,4,5,7,8]
+		for j in gene_order:
+			if (std_genes[i,j] > 0):
+				genes.append(rng.normal(size=sizes[i],loc=mean_genes[i,j],scale=std_genes[i,j]))
+			else:
+				genes.append(mean_genes[i,j]*np.ones(sizes[i]))
+		all_genes.append(np.transpose(genes))
+		all_positions.append(i*np.ones(sizes[i],dtype=int))
+	return np.concatenate(all_genes), np.concatenate(all_positions)
+
+
+def map_populations(function,jobs,workers=1):
+	"""Calls function with every tuple of arguments in jobs, using a pool of worker processes if workers > 1.
+	Returns the results in the order of jobs."""
+	if (workers > 1) & (len(jobs) > 1):
+		pool = multiprocessing.Pool(min(workers,len(jobs)))
+		try:
+			results = pool.map(_call,[(function,args) for args in jobs],chunksize=1)
+		finally:
+			pool.close()
+			pool.join()
+		return results
+	else:
+		return [function(*args) for args in jobs]
+
+
+def population_output(path,k,environments,constants,start_generation=0):
+	"""Returns the writer of the gene statistics of population k in path, in the format and with the decimation
+	given by constants (see output_store.open_output)"""
+	return open_output(path,k,environments,GENE_NAMES,constants["output_format"],constants["generations"],\
+			start_generation,constants["output_every"],constants["output_spacing"],constants["output_buffer"])
+
+
+def open_index(constants):
+	"""Returns the RunIndex of populations with constant size, or None if it is not used"""
+	if constants["cache"] not in ["off","record","reuse"]:
+		raise ValueError("Unknown cache mode {0}!".format(constants["cache"]))
+	return RunIndex() if constants["cache"] != "off" else None
+
+
+def cached_population(index,k,path,seed,constants):
+	"""Returns the results of population k as returned by run_constant_population if it is in the run index,
+	otherwise None. Its stop generation and reason are written to path, as after a run."""
+	run = index.lookup(run_key(constants,seed,k))
+	if run is None:
+		return None
+	print("\n\tPopulation {0} taken from the run index, with outputs in {1}\n".format(k+1,run["path"]))
+	if run["stop_reason"] is not None:
+		write_stop(path+"pop"+str(k+1)+"_stop.json",run["stop_generation"],run["stop_reason"])
+	return run["mean"], run["std"], bool(run["repeated"]), run["sizes"].astype(np.int64)
+
+
+def seed_random(seed,k):
+	"""Sets the base seed of the random streams in this process, seeds the animal module for population k
+	and returns the random stream of population k. Results thus do not depend on the process a population runs in."""
+	random_streams.set_seed(seed)
+	animal.seed(random_streams.stream_key(random_streams.ANIMAL,k))
+	return random_streams.stream(random_streams.POPULATION,k)
+
+
+def seed_batch(seed,ks):
+	"""Sets the base seed of the random streams in this process and returns the random stream
+	of the batch of populations ks"""
+	random_streams.set_seed(seed)
+	return random_streams.stream(random_streams.BATCH,ks[0],len(ks))
+
+
+def _call(job):
+	"""Helper for map_populations, since Pool.starmap is not available in Python 2"""
+	function, args = job
+	return function(*args)
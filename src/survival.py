@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	survival.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Confidence interval of the survival probability of
+#	populations with variable size, which tells when
+#	enough populations have been run
+#
+#	Usage:
+#		lower, upper = wilson_interval(survived,n,0.95)
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import math
+
+
+def wilson_interval(survived,n,confidence=0.95):
+	"""Returns the Wilson score interval of the survival probability, given the number of
+	populations that survived out of n. Without any population, the interval is [0,1]."""
+	if n == 0:
+		return 0., 1.
+	z = normal_quantile(0.5+confidence/2.)
+	p = float(survived)/n
+	center = (p + z**2/(2.*n)) / (1. + z**2/n)
+	half = z/(1. + z**2/n) * math.sqrt(p*(1.-p)/n + z**2/(4.*n**2))
+	return max(0.,center-half), min(1.,center+half)
+
+
+def normal_quantile(p):
+	"""Returns the p-quantile of the standard normal distribution, by bisection of its cumulative distribution"""
+	if not 0 < p < 1:
+		raise ValueError("Quantile must be in (0,1), got {0}!".format(p))
+	lower, upper = -40., 40.
+	for _ in range(100):
+		middle = (lower+upper)/2.
+		if 0.5*(1.+math.erf(middle/math.sqrt(2.))) < p:
+			lower = middle
+		else:
+			upper = middle
+	return (lower+upper)/2.
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	sweep.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Runs populations with constant population size for
+#	many parameter sets, distributing every (parameter
+#	set, replicate) job over a pool of worker processes,
+#	and collects their final genes in a result table.
+#	Tipping points along one parameter are searched by
+#	refining the interval the final genes change in
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import multiprocessing
+import itertools
+import csv
+import os
+
+from constants import model_constants
+from environment import Environment
+from population import GENE_NAMES
+from run_population import run_constant_population
+from convergence import read_stop
+import random_streams
+
+# Parameters that are set for all environments at once
+ENVIRONMENT_PARAMETERS = ["R","P","A","B","O"]
+
+
+def parameter_grid(axes):
+	"""Returns all combinations of parameter values as a list of dicts, given a list of
+	(name, values) pairs, e.g. [("R",[1,10]),("kd",[0.01,0.02])]"""
+	names = [name for (name,_) in axes]
+	return [dict(zip(names,values)) for values in itertools.product(*[values for (_,values) in axes])]
+
+
+def parse_axes(specs,constants=None):
+	"""Converts the --sweep arguments (lists of a parameter name followed by its values) to (name, values) pairs"""
+	return [(spec[0],[parse_value(spec[0],value,constants) for value in spec[1:]]) for spec in specs]
+
+
+def read_parameter_sets(filename,constants=None):
+	"""Reads a csv file with one parameter set per row and the parameter names as header"""
+	with open(filename) as f:
+		rows = list(csv.DictReader(f))
+	return [dict((name,parse_value(name,value,constants)) for (name,value) in row.items()) for row in rows]
+
+
+def parse_value(name,value,constants=None):
+	"""Converts value to the type of parameter name in constants (default: model_constants).
+	Only scalar parameters (numbers, strings and flags) can be swept."""
+	if constants is None:
+		constants = model_constants
+	if name in ENVIRONMENT_PARAMETERS:
+		return float(value)
+	if name not in constants:
+		raise KeyError("Key {0} is not a valid model constant identifier!".format(name))
+	kind = type(constants[name])
+	if kind is bool:
+		if str(value).lower() in ["true","1"]:
+			return True
+		if str(value).lower() in ["false","0"]:
+			return False
+		raise ValueError("Parameter {0} is true or false, got {1}!".format(name,value))
+	if kind not in [int,float,str]:
+		raise ValueError("Parameter {0} is not a scalar and cannot be swept!".format(name))
+	return kind(value)
+
+
+def apply_parameters(parameters,constants):
+	"""Changes constants to the given parameter set, environment parameters are changed in all environments"""
+	for (name,value) in parameters.items():
+		if name in ENVIRONMENT_PARAMETERS:
+			index = ENVIRONMENT_PARAMETERS.index(name)
+			for env in constants["environments"]:
+				env[index] = value
+		else:
+			constants.change_constant(name,value)
+
+
+def run_sweep(parameter_sets,path,seed,replicates=1,workers=1,constants=None):
+	"""
+	Runs replicates populations for every parameter set. Inputs:
+		parameter_sets: list of dicts of parameters that differ from the current model constants,
+		path: output path (each parameter set gets a sub folder),  seed: base seed of the random streams,
+		replicates: number of populations per parameter set,  workers: number of worker processes,
+		constants: ModelConstants the parameter sets are applied to (default: model_constants)
+	Replicate r of every parameter set uses the same random streams. The final gene means and sizes, and the
+	generation every population stopped at and why, are written to the result table sweep_results.csv as soon
+	as a job is done. Returns the rows of the result table.
+	"""
+	base = (constants if constants is not None else model_constants).copy()
+	if (workers > 1) and (base["threads"] == 0):
+		base.change_constant("threads",1) # all cores are used by the worker processes already
+
+	jobs = [(index,parameters,replicate,path,seed,base) for (index,parameters) in enumerate(parameter_sets)\
+			for replicate in range(replicates)]
+	names = sorted(set(name for parameters in parameter_sets for name in parameters))
+	order = [GENE_NAMES.index(gene) for gene in sorted(GENE_NAMES)]
+
+	rows = []
+	with open(path+"sweep_results.csv","w") as f:
+		writer = csv.writer(f)
+		writer.writerow(result_columns(names))
+
+		if (workers > 1) & (len(jobs) > 1):
+			pool = multiprocessing.Pool(min(workers,len(jobs)))
+			results = pool.imap_unordered(_run_job,jobs)
+		else:
+			pool = None
+			results = (_run_job(job) for job in jobs)
+
+		try:
+			for (index,replicate,mean,sizes,repeated,stop) in results:
+				parameters = parameter_sets[index]
+				for i in range(len(sizes)):
+					row = [index+1,replicate+1]+[parameters.get(name,"") for name in names]+\
+						[i+1]+mean[i,order].tolist()+[int(sizes[i]),int(repeated)]+list(stop)
+					writer.writerow(row)
+					rows.append(row)
+				f.flush()
+		finally:
+			if pool is not None:
+				pool.close()
+				pool.join()
+
+	return rows
+
+
+def result_columns(names):
+	"""Returns the columns of the result table of a sweep over the parameters names"""
+	return ["set","replicate"]+list(names)+["environment"]+sorted(GENE_NAMES)+["size","repeated","stop_generation","stop_reason"]
+
+
+def parse_classifier(spec):
+	"""Converts the --classify arguments (gene, above or below, threshold and optionally an environment)
+	to a (gene, sign, threshold, environment) tuple, where environment is None for the whole population"""
+	if (len(spec) not in [3,4]) or (spec[1] not in ["above","below"]):
+		raise ValueError("Classifier must be given as GENE above|below THRESHOLD [ENVIRONMENT], got {0}!".format(" ".join(spec)))
+	if spec[0] not in GENE_NAMES:
+		raise KeyError("Gene {0} does not exist!".format(spec[0]))
+	return spec[0], 1 if spec[1] == "above" else -1, float(spec[2]), int(spec[3]) if len(spec) == 4 else None
+
+
+def classify(rows,names,classifier):
+	"""Returns the share of replicates of every parameter set in the result rows of a sweep over the parameters
+	names whose final mean of a gene is above (below) a threshold, as a dict keyed by the set number. The mean is
+	taken in one environment, or over all animals if classifier (see parse_classifier) has no environment."""
+	gene, sign, threshold, environment = classifier
+	columns = result_columns(names)
+	set_column, replicate_column = columns.index("set"), columns.index("replicate")
+	environment_column, gene_column, size_column = columns.index("environment"), columns.index(gene), columns.index("size")
+
+	total, size = {}, {}
+	for row in rows:
+		key = (row[set_column],row[replicate_column])
+		total.setdefault(key,0.)
+		size.setdefault(key,0)
+		if (row[size_column] > 0) and (environment in [None,row[environment_column]]):
+			# weighted by the number of animals in each environment
+			total[key] += row[gene_column]*row[size_column]
+			size[key] += row[size_column]
+
+	positive, count = {}, {}
+	for key in total:
+		above = (size[key] > 0) and (sign*(total[key]/size[key]-threshold) > 0)
+		positive[key[0]] = positive.get(key[0],0) + int(above)
+		count[key[0]] = count.get(key[0],0) + 1
+	return dict((index,float(positive[index])/count[index]) for index in count)
+
+
+def find_tipping_point(name,low,high,classifier,path,seed,replicates=1,workers=1,tolerance=1E-2,log=False,constants=None):
+	"""
+	Searches the value of parameter name in [low,high] at which the majority of replicates changes its class
+	(see classify). Inputs:
+		name, low, high: parameter and interval to search,  classifier: see parse_classifier,
+		path: output path (every step gets a sub folder),  seed: base seed of the random streams,
+		replicates: number of populations per parameter value,  workers: number of worker processes,
+		tolerance: width of the final interval, relative to the initial one,  log: refine on a logarithmic scale,
+		constants: ModelConstants the parameter values are applied to (default: model_constants)
+	Every step runs max(1,workers/replicates) equidistant values inside the interval at once, and continues with the
+	sub interval whose ends are classified differently. All values use the same random streams, such that
+	the search is not confused by noise between replicates. Every class share is written to tipping_point.csv.
+	Returns the final interval, or None if both ends of the initial interval are in the same class.
+	"""
+	low, high = float(low), float(high)
+	if log and (min(low,high) <= 0):
+		raise ValueError("Parameter {0} can only be searched on a logarithmic scale if it is positive!".format(name))
+	scale = (np.log, np.exp) if log else (lambda x: x, lambda x: x)
+	ends = [low,high]
+	low, high = scale[0](low), scale[0](high)
+	width = tolerance*(high-low)
+	points = max(1,workers//max(replicates,1))
+
+	with open(path+"tipping_point.csv","w") as f:
+		writer = csv.writer(f)
+		writer.writerow(["step",name,"share"])
+
+		def evaluate(step,values):
+			"""Returns whether the majority of replicates is in the class of the classifier for all values"""
+			step_path = path+"step"+str(step)+"/"
+			if not os.path.isdir(step_path):
+				os.makedirs(step_path)
+			parameter_sets = [{name: parse_value(name,value,constants)} for value in values]
+			rows = run_sweep(parameter_sets,step_path,seed,replicates,workers,constants)
+			shares = classify(rows,[name],classifier)
+			for (index,parameters) in enumerate(parameter_sets):
+				writer.writerow([step,parameters[name],shares[index+1]])
+			f.flush()
+			return [shares[index+1] > 0.5 for index in range(len(values))]
+
+		classes = evaluate(0,ends)
+		if classes[0] == classes[1]:
+			return None
+
+		step = 1
+		while high-low > width:
+			values = list(np.linspace(low,high,points+2))
+			classes = [classes[0]] + evaluate(step,[scale[1](value) for value in values[1:-1]]) + [classes[-1]]
+			# the first change of class is refined further
+			i = next(i for i in range(len(classes)-1) if classes[i] != classes[i+1])
+			low, high, classes = values[i], values[i+1], classes[i:i+2]
+			step += 1
+
+	return scale[1](low), scale[1](high)
+
+
+def run_job(index,parameters,replicate,path,seed,base):
+	"""Runs replicate of parameter set index, starting from the ModelConstants base.
+	Returns the final gene means and sizes, whether the population had to be repeated, and the generation
+	it stopped at and why."""
+	constants = base.copy()
+	apply_parameters(parameters,constants)
+
+	job_path = path+"set"+str(index+1)+"/"
+	try:
+		os.makedirs(job_path+"timeseries/")
+	except OSError:
+		if not os.path.isdir(job_path+"timeseries/"):
+			raise
+
+	random_streams.set_seed(seed)
+	environments = [Environment(*param,rng=random_streams.stream(random_streams.ENVIRONMENT,i),constants=constants) \
+			for (i,param) in enumerate(constants["environments"])]
+
+	mean, _, repeated, sizes = run_constant_population(replicate,environments,job_path,seed,constants=constants)
+	stop = read_stop(job_path+"pop"+str(replicate+1)+"_stop.json")
+	return index, replicate, np.asarray(mean), np.asarray(sizes), repeated, stop
+
+
+def _run_job(job):
+	"""Helper for run_sweep, since Pool.starmap is not available in Python 2"""
+	return run_job(*job)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	sweep.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Main controller for parameter sweeps, with constant
+#	population size
+#
+#	Usage:
+#		python sweep.py --sweep R 1 10 100 --sweep kd 0.01 0.02 [options]
+#		python sweep.py --sweep_file parameter_sets.csv [options]
+#		python sweep.py --search R 1 1000 log --classify h above 0.9 [options]
+#
+#	All combinations of the --sweep values are run,
+#	--populations times each (all other options as in
+#	main_constant.py). With --search, the tipping point
+#	of the classifier is located by interval refinement
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import sys
+sys.path.insert(0, './src')
+
+#
+# Import third-party packages
+#
+
+from timeit import default_timer as timer # For timing parts of the script, optimizing run time
+import os # To create directories
+import datetime # To access the current time
+
+#
+# Import other parts of the project
+#
+
+from constants import parse_arguments, print_constants
+from sweep import run_sweep, parameter_grid, parse_axes, read_parameter_sets, parse_classifier, find_tipping_point
+import random_streams
+
+
+
+if __name__ == '__main__':
+	# Get model constants
+	constants = parse_arguments(sweep=True)
+	print_constants(constants)
+
+	parameter_sets = []
+	if constants["sweep"]:
+		parameter_sets += parameter_grid(parse_axes(constants["sweep"],constants))
+	if constants["sweep_file"]:
+		parameter_sets += read_parameter_sets(constants["sweep_file"],constants)
+	if constants["search"]:
+		if (len(constants["search"]) not in [3,4]) or not constants["classify"]:
+			raise ValueError("Tipping point search needs --search NAME LOW HIGH [log] and --classify!")
+		if constants["search"][3:] not in [[],["log"]]:
+			raise ValueError("Unknown scale {0} of the tipping point search, only log may follow the interval!".format(\
+				constants["search"][3]))
+		classifier = parse_classifier(constants["classify"])
+	elif not parameter_sets:
+		raise ValueError("No parameter sets given, use --sweep, --sweep_file or --search!")
+
+	# create output directory
+	now = datetime.datetime.today()
+	path = "./output_sweep/{0:%y}-{0:%m}-{0:%d}_{0:%H}-{0:%M}-{0:%S}/".format(now)
+	try:
+		os.makedirs(path)
+	except OSError:
+		if not os.path.isdir(path):
+			raise
+
+	# plots of single populations are not needed in a sweep, unless asked for
+	if "--plot_mode" not in sys.argv:
+		constants.change_constant("plot_mode","none")
+
+	# all random streams are derived from one base seed, which is written to the parameters
+	seed = random_streams.set_seed(constants["seed"])
+	constants.change_constant("seed",seed)
+
+	# write simulation parameters
+	f = open(path+"parameters.txt","w")
+	for key in constants:
+		f.write("{0}:\t{1}\n".format(key,constants[key]))
+	f.write("\nparameter sets:\n")
+	for (i,parameters) in enumerate(parameter_sets):
+		f.write("{0}:\t{1}\n".format(i+1,parameters))
+	f.close()
+
+	start = timer()
+
+	if constants["search"]:
+		name, low, high = constants["search"][:3]
+		interval = find_tipping_point(name,low,high,classifier,path,seed,constants["populations"],constants["workers"],\
+			constants["search_tolerance"],constants["search"][3:] == ["log"],constants)
+		if interval is None:
+			print("\nNo tipping point of {0} between {1} and {2}!".format(name,low,high))
+		else:
+			print("\nTipping point of {0} between {1:g} and {2:g}! Total time: {3:.2f} min".format(name,interval[0],interval[1],\
+				(timer()-start)/60))
+		print("Results written to {0}tipping_point.csv".format(path))
+	else:
+		rows = run_sweep(parameter_sets,path,seed,constants["populations"],constants["workers"],constants)
+
+		print("\n{0} parameter sets x {1} populations done! Total time: {2:.2f} min".format(len(parameter_sets),\
+			constants["populations"],(timer()-start)/60))
+		print("Results written to {0}sweep_results.csv".format(path))
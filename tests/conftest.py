@@ -0,0 +1,26 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	conftest.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Set-up shared by all tests: import paths of the
+#	project. The cython module has to be built first
+#	by calling setup.py
+#
+#	Usage:
+#		python setup.py build_ext --inplace
+#		python -m pytest tests
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the modules in src come first, since sweep.py is both a script and a module
+sys.path[:0] = [os.path.join(ROOT,"src"), ROOT]
@@ -0,0 +1,48 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	test_batch_population.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Tests that stopped replicates of a BatchPopulation
+#	have no offspring
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+import conftest
+import random_streams
+from constants import ModelConstants
+from batch_population import BatchPopulation
+
+
+def make_constants(**values):
+	constants = ModelConstants()
+	constants.change_constant("population_size",200)
+	constants.change_constant("threads",1)
+	for key in values:
+		constants.change_constant(key,values[key])
+	return constants
+
+
+def test_stopped_replicate_breed_variable():
+	random_streams.set_seed(1)
+	population = BatchPopulation(3,rng=random_streams.stream(random_streams.POPULATION,0),constants=make_constants())
+	population.stop([0])
+	died = population.breed_variable()
+	assert population.sizes()[0] == 0
+	assert np.all(population.sizes()[1:] > 0)
+	assert 0 not in died
+
+
+def test_stopped_replicate_breed_constant():
+	random_streams.set_seed(1)
+	population = BatchPopulation(3,rng=random_streams.stream(random_streams.POPULATION,0),constants=make_constants())
+	population.stop([0])
+	population.breed_constant()
+	assert population.sizes().tolist() == [0,200,200]
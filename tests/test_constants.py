@@ -0,0 +1,26 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	test_constants.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Tests the parsing of the model parameters from the
+#	command line
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import conftest
+from constants import parse_arguments
+
+
+def test_zero_arguments():
+	constants = parse_arguments(["--stop_min","0","--saturation_generations","0","--mu","0","mean.csv"],variable=True)
+	assert (constants["stop_min"],constants["saturation_generations"],constants["mu"]) == (0,0,0)
+
+
+def test_default_arguments():
+	assert parse_arguments([])["stop_min"] == 200
@@ -0,0 +1,53 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	test_environment.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Tests that environment traces are the same however
+#	they are evaluated, and that a cached trace is only
+#	reused for the same parameters and seed
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+import conftest
+import random_streams
+from constants import ModelConstants
+from environment import Environment, TRACE_BLOCK
+
+
+def cached_trace(filename,seed,B=0.5):
+	"""Returns the trace of an environment precomputed with the cache file filename"""
+	random_streams.set_seed(seed)
+	env = Environment(1,1,1,B,0,rng=random_streams.stream(random_streams.ENVIRONMENT,0),constants=ModelConstants())
+	env.precompute(0,50,filename)
+	return np.array(env.evaluate_many(np.arange(50)))
+
+
+def test_cache_reused(tmp_path):
+	filename = str(tmp_path)+"/environment_1.npy"
+	first = cached_trace(filename,3)
+	assert np.array_equal(cached_trace(filename,3),first)
+
+
+def test_cache_recomputed(tmp_path):
+	filename = str(tmp_path)+"/environment_1.npy"
+	cached_trace(filename,3)
+	assert np.array_equal(cached_trace(filename,4),cached_trace(str(tmp_path)+"/seed.npy",4))
+	assert np.array_equal(cached_trace(filename,4,B=0.2),cached_trace(str(tmp_path)+"/B.npy",4,B=0.2))
+
+
+def test_trace_without_cache(tmp_path):
+	t = np.arange(3*TRACE_BLOCK)
+	trace = cached_trace(str(tmp_path)+"/environment_1.npy",3)
+	random_streams.set_seed(3)
+	env = Environment(1,1,1,0.5,0,rng=random_streams.stream(random_streams.ENVIRONMENT,0),constants=ModelConstants())
+	E, C = env.evaluate_many(t[::-1])
+	assert np.array_equal(np.array(env.evaluate_many(t[:50])),trace)
+	assert np.array_equal(E[::-1],env.evaluate_many(t)[0]) and np.array_equal(C[::-1],env.evaluate_many(t)[1])
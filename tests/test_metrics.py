@@ -0,0 +1,72 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	test_metrics.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Tests that the metrics of a failed attempt are closed
+#	and discarded when the population is repeated
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import json
+import pytest
+
+import conftest
+import metrics
+import random_streams
+from constants import parse_arguments
+from environment import Environment
+from array_population import ArrayPopulation
+from population import GENE_NAMES
+from output_store import open_output
+from plot_worker import Plotter
+from iterate_population import iterate_population
+
+
+class FailingPopulation(ArrayPopulation):
+	"""Population whose mean payoff decreased to 0 in every generation"""
+	def breed_constant(self):
+		raise RuntimeError("Mean payoff of population decreased to 0.")
+
+
+def run(path,population,constants):
+	environments = [Environment(*param,rng=random_streams.stream(random_streams.ENVIRONMENT,i),constants=constants) \
+			for (i,param) in enumerate(constants["environments"])]
+	output = open_output(path,0,environments,GENE_NAMES,"csv",constants["generations"])
+	try:
+		return iterate_population(0,population,environments,output,path,0,False,0,Plotter("none"),constants)
+	finally:
+		output.close()
+
+
+def test_failed_attempt(tmp_path):
+	constants = parse_arguments(["--population_size","100","--generations","3","--metrics","time","--threads","1"])
+	random_streams.set_seed(2)
+	path = str(tmp_path)+"/"
+
+	with pytest.raises(RuntimeError):
+		run(path,FailingPopulation(100,rng=random_streams.stream(random_streams.POPULATION,0),constants=constants),constants)
+	assert metrics._active._file is None
+
+	run(path,ArrayPopulation(100,rng=random_streams.stream(random_streams.POPULATION,0),constants=constants),constants)
+	with open(path+"pop1_metrics.jsonl") as f:
+		assert [json.loads(line)["generation"] for line in f] == [0,1,2]
+
+
+def test_truncate(tmp_path):
+	filename = str(tmp_path)+"/metrics.jsonl"
+	recorder = metrics.Metrics(filename)
+	for j in range(5):
+		recorder.end_generation(j,10)
+	recorder.close()
+	with open(filename,"a") as f:
+		f.write('{"generation": 5')
+
+	metrics.Metrics(filename,start_generation=2).close()
+	with open(filename) as f:
+		assert [json.loads(line)["generation"] for line in f] == [0,1]
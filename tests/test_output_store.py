@@ -0,0 +1,61 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	test_output_store.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Tests that decimated output resumed from a checkpoint
+#	equals the output of an uninterrupted run
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+import conftest
+import random_streams
+from constants import ModelConstants
+from environment import Environment
+from array_population import ArrayPopulation
+from population import GENE_NAMES
+from output_store import open_output, read_store
+from checkpoint import save_checkpoint, checkpoint_output
+
+
+def write_rows(output,generations):
+	"""Writes made-up statistics of the given generations"""
+	for j in generations:
+		output.write(j,np.full((3,9),j,dtype=float),np.full((3,9),-j,dtype=float),[j,1,2])
+
+
+def test_resumed_decimated_output(tmp_path):
+	constants = ModelConstants()
+	environments = [Environment(*param,constants=constants) for param in constants["environments"]]
+	population = ArrayPopulation(10,rng=random_streams.stream(random_streams.POPULATION,0),constants=constants)
+	first, second = str(tmp_path)+"/first/", str(tmp_path)+"/second/"
+	for path in [first,second]:
+		tmp_path.joinpath(path).mkdir()
+
+	output = open_output(first,0,environments,GENE_NAMES,"npy",30,0,10,"linear",5)
+	write_rows(output,range(24))
+	output.close()
+
+	# the second run is interrupted after the checkpoint at generation 22 and resumed; both stop soon after it
+	output = open_output(second,0,environments,GENE_NAMES,"npy",30,0,10,"linear",5)
+	write_rows(output,range(22))
+	output.flush()
+	save_checkpoint(second+"checkpoint.npz",population,22,0,environments,output.buffered())
+	write_rows(output,range(22,24))
+	output.flush()
+	output = open_output(second,0,environments,GENE_NAMES,"npy",30,22,10,"linear",5)
+	output.restore(checkpoint_output(second+"checkpoint.npz"))
+	write_rows(output,range(22,24))
+	output.close()
+
+	expected, resumed = read_store(first+"pop1_statistics.npy"), read_store(second+"pop1_statistics.npy")
+	assert expected[0][:,0].tolist() == [0,10,19,20,21,22,23]
+	for (a,b) in zip(expected[:4],resumed[:4]):
+		assert np.array_equal(a,b)
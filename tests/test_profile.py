@@ -0,0 +1,44 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	test_profile.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Tests that the profile of a generation is written
+#	when the population stops in that generation
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import os
+
+import conftest
+import random_streams
+from constants import parse_arguments
+from environment import Environment
+from array_population import ArrayPopulation
+from population import GENE_NAMES
+from output_store import open_output
+from plot_worker import Plotter
+from iterate_population import iterate_population
+from convergence import read_stop
+
+
+def test_profile_of_stopped_generation(tmp_path):
+	constants = parse_arguments(["--population_size","200","--generations","10","--stop_rule","drift","--stop_window","2",\
+			"--stop_tolerance","10","--stop_min","0","--profile_generation","1","--threads","1"])
+	random_streams.set_seed(2)
+	environments = [Environment(*param,rng=random_streams.stream(random_streams.ENVIRONMENT,i),constants=constants) \
+			for (i,param) in enumerate(constants["environments"])]
+	path = str(tmp_path)+"/"
+
+	# any window counts as converged, so the population stops in the profiled generation
+	population = ArrayPopulation(200,rng=random_streams.stream(random_streams.POPULATION,0),constants=constants)
+	output = open_output(path,0,environments,GENE_NAMES,"csv",constants["generations"])
+	iterate_population(0,population,environments,output,path,0,False,0,Plotter("none"),constants)
+
+	assert read_stop(path+"pop1_stop.json") == (1,"converged")
+	assert os.path.isfile(path+"pop1_generation_1.prof")
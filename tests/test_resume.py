@@ -0,0 +1,64 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	test_resume.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Tests that an interrupted run of main_constant.py is
+#	resumed with its own parameters
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+import subprocess
+import shutil
+import time
+import sys
+import os
+
+from conftest import ROOT
+from output_store import read_store
+
+OPTIONS = ["--L","3","--population_size","200","--generations","3000","--checkpoint_every","5",
+	"--output_format","npy","--plot_mode","none","--cache","off","--seed","3"]
+
+
+def test_resume_without_options():
+	output = os.path.join(ROOT,"output")
+	before = set(os.listdir(output)) if os.path.isdir(output) else set()
+	process = subprocess.Popen([sys.executable,"main_constant.py"]+OPTIONS,cwd=ROOT,\
+			stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+	try:
+		# interrupt the run once it wrote its first checkpoint
+		path = None
+		while process.poll() is None:
+			created = set(os.listdir(output)) - before if os.path.isdir(output) else set()
+			if created:
+				path = os.path.join(output,created.pop(),"")
+				if os.path.isfile(path+"pop1_checkpoint.npz"):
+					break
+			time.sleep(0.01)
+		assert process.poll() is None, "run ended before it could be interrupted"
+	finally:
+		process.kill()
+		process.wait()
+
+	try:
+		resumed = subprocess.run([sys.executable,"main_constant.py","--resume",path,"--plot_mode","none"],cwd=ROOT,\
+				stdout=subprocess.PIPE,stderr=subprocess.STDOUT,universal_newlines=True)
+		assert resumed.returncode == 0, resumed.stdout
+		assert "ignoring the values of" in resumed.stdout
+
+		with np.load(path+"pop1_final.npz") as final:
+			assert int(final["generation"]) == 3000
+			assert final["t"].item() == 3000*3
+			assert len(final["genes"]) == 200
+		generation, _, _, sizes, _, _ = read_store(path+"pop1_statistics.npy")
+		assert generation[:,0].max() == 2999
+		assert np.all(np.sum(sizes,axis=1) == 200)
+	finally:
+		shutil.rmtree(path)
@@ -0,0 +1,30 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	test_run_index.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Tests that the key of a run depends on the contents
+#	of its migration matrix file
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import conftest
+from constants import parse_arguments
+from run_index import run_key
+
+
+def test_migration_file_key(tmp_path):
+	filename = str(tmp_path)+"/migration.csv"
+	constants = parse_arguments(["--migration",filename])
+	with open(filename,"w") as f:
+		f.write("0,1,0\n0,0,1\n1,0,0\n")
+	first = run_key(constants,3,0)
+	assert run_key(constants,3,0) == first
+	with open(filename,"w") as f:
+		f.write("0,0,1\n1,0,0\n0,1,0\n")
+	assert run_key(constants,3,0) != first
@@ -0,0 +1,51 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	test_saturation.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Tests that a saturated replicate of a batch with
+#	variable population size stops evolving
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import numpy as np
+
+import conftest
+import random_streams
+from constants import ModelConstants
+from environment import Environment
+from batch_population import BatchPopulation
+from array_population import random_genes
+from population import GENE_NAMES
+from output_store import open_output, read_sizes
+from plot_worker import Plotter
+from iterate_population import iterate_batch
+from convergence import read_stop
+
+
+def test_saturated_replicate_stops(tmp_path):
+	constants = ModelConstants()
+	for (key,value) in [("population_size",200),("generations",4),("saturation_generations",1),("threads",1)]:
+		constants.change_constant(key,value)
+	random_streams.set_seed(2)
+	environments = [Environment(*param,rng=random_streams.stream(random_streams.ENVIRONMENT,i),constants=constants) \
+			for (i,param) in enumerate(constants["environments"])]
+	path = str(tmp_path)+"/"
+
+	# replicate 0 starts saturated, replicate 1 with only 10 animals
+	rng = random_streams.stream(random_streams.POPULATION,0)
+	replica = np.repeat([0,1],[200,10])
+	population = BatchPopulation(2,random_genes(210,rng),rng.integers(3,size=210),replica,rng,constants)
+	outputs = [open_output(path,k,environments,GENE_NAMES,"csv",constants["generations"]) for k in range(2)]
+	_, _, final_gen, _ = iterate_batch([0,1],population,environments,outputs,path,0,True,Plotter("none"),constants)
+
+	assert final_gen[0] == 0
+	assert read_stop(path+"pop1_stop.json") == (0,"saturated")
+	assert population.sizes()[0] == 0
+	assert read_sizes(path+"pop1_mean_genes.csv")[0].tolist() == [0]
+	assert read_stop(path+"pop2_stop.json")[1] != "saturated"
@@ -0,0 +1,34 @@
+# -*- coding: utf8 -*-
+"""
+#########################################################
+#
+#	test_sweep.py
+#	Author: Dion Häfner (dionhaefner@web.de)
+#
+#	Tests the conversion of swept parameter values
+#
+#	Licensed under BSD 2-Clause License
+#
+#########################################################
+"""
+
+import pytest
+
+import conftest
+from constants import ModelConstants
+from sweep import parse_value
+
+
+def test_flags():
+	constants = ModelConstants()
+	assert [parse_value("verbose",value,constants) for value in ["True","false","1","0"]] == [True,False,True,False]
+	with pytest.raises(ValueError):
+		parse_value("verbose","maybe",constants)
+
+
+def test_scalars_only():
+	constants = ModelConstants()
+	assert parse_value("population_size","50",constants) == 50
+	assert parse_value("R","10",constants) == 10.
+	with pytest.raises(ValueError):
+		parse_value("environment_names","ab",constants)